@@ -0,0 +1,482 @@
+#!/usr/bin/env python3
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections.abc import Callable
+from datetime import datetime
+from types import ModuleType
+from typing import Any
+
+import psutil
+
+from dbsync_monitoring.metrics_writer import MetricsWriter
+from dbsync_monitoring.proc_sampler import MB, proc_sampler_available
+from dbsync_monitoring.process_tracker import ProcessTracker
+from dbsync_monitoring.rollup import compact
+from dbsync_monitoring.scheduler import Scheduler, Source, Tick
+from dbsync_monitoring.schema import migrate, version_id
+from dbsync_monitoring.standins import SCRIPTS_DIR, StandInTipSession, start_standin_process
+from dbsync_monitoring.tip import TipProbe
+
+# Spacing of synthetic rows, as the monitor writes them at its default --sample-interval.
+ROW_INTERVAL_MS = 10_000
+BENCH_VERSION = "cardano-db-sync bench bench"
+# Imported by the plotting and analysis tools only; the collector must start without them.
+HEAVY_MODULES = ('pandas', 'plotly', 'matplotlib')
+
+
+def summarize(seconds: list[float]) -> dict[str, float]:
+    """Mean, percentiles and max of durations, in microseconds."""
+    us = sorted(s * 1e6 for s in seconds)
+    if not us:
+        return {}
+
+    def pct(q: float) -> float:
+        return round(us[min(len(us) - 1, int(len(us) * q))], 1)
+
+    return {
+        'n': len(us),
+        'mean_us': round(sum(us) / len(us), 1),
+        'p50_us': pct(0.5),
+        'p95_us': pct(0.95),
+        'p99_us': pct(0.99),
+        'max_us': round(us[-1], 1),
+    }
+
+
+def timed(fn: Callable[[], object], iterations: int) -> list[float]:
+    durations = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - t0)
+    return durations
+
+
+def wait_child(proc: subprocess.Popen[bytes]) -> tuple[int, Any]:
+    """Wait for ``proc`` and return its exit code and its own resource usage."""
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, usage
+
+
+def load_monitor_module() -> ModuleType:
+    """Import db-sync-process-monitor.py, whose file name is not a module name."""
+    spec = importlib.util.spec_from_file_location(
+        "db_sync_process_monitor", os.path.join(SCRIPTS_DIR, "db-sync-process-monitor.py")
+    )
+    if spec is None or spec.loader is None:
+        raise ImportError("db-sync-process-monitor.py not found")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_monitor(args: argparse.Namespace) -> None:
+    """Child process: run the real monitor against the stand-ins and write its measurements as JSON."""
+    module = load_monitor_module()
+    monitor = module.CardanoMonitor(
+        env="bench", db_sync_ver="bench", pg_host="stand-in", pg_port="0", pg_user="bench", pg_dbname="bench",
+        sample_interval=args.sample_interval, tip_interval=args.tip_interval,
+        pg_stats_interval=0, group_interval=0, sampler_backend=args.monitor_child
+    )
+    monitor.pg_session = StandInTipSession(slots_per_s=args.standin_slots_per_s, latency_ms=args.pg_latency_ms)
+    monitor.tip_probe = TipProbe(monitor.pg_session)
+    monitor.process_tracker = ProcessTracker(args.standin_tag)
+
+    lateness: list[float] = []
+    durations: list[float] = []
+    skipped = 0
+
+    def sample_process(tick: Tick) -> None:
+        nonlocal skipped
+        t0 = time.perf_counter()
+        monitor.sample_process(tick)
+        durations.append(time.perf_counter() - t0)
+        lateness.append(max(0.0, tick.lateness))
+        skipped += tick.skipped
+
+    monitor.scheduler = Scheduler([
+        Source('tip', args.tip_interval, monitor.sample_tip),
+        Source('process', args.sample_interval, sample_process),
+    ])
+    monitor.writer.start()
+    monitor.compactor.start()
+    proc = monitor.get_process()
+    if proc is None:
+        raise SystemExit(f"Stand-in process {args.standin_tag} not found")
+
+    timer = threading.Timer(args.duration, monitor.scheduler.stop)
+    timer.start()
+    wall0, cpu0 = time.monotonic(), time.process_time()
+    asyncio.run(monitor.scheduler.run())
+    wall, cpu = time.monotonic() - wall0, time.process_time() - cpu0
+    mem = psutil.Process().memory_full_info()
+
+    latency = {
+        'get_process': summarize(timed(monitor.get_process, args.iterations)),
+        'get_memory_details': summarize(timed(lambda: monitor.get_memory_details(proc), args.iterations)),
+        'get_cpu_details': summarize(timed(lambda: monitor.get_cpu_details(proc), args.iterations)),
+        'get_tip': summarize(timed(monitor.get_tip, args.iterations)),
+    }
+    monitor.close()
+
+    result = {
+        'duration_s': round(wall, 2),
+        'cpu_percent': round(100 * cpu / wall, 2),
+        'rss_mb': round(mem.rss / MB, 1),
+        'uss_mb': round(mem.uss / MB, 1),
+        'sample_process': summarize(durations),
+        'lateness': summarize(lateness),
+        'skipped_ticks': skipped,
+        'latency': latency,
+    }
+    with open(args.child_output, "w") as f:
+        json.dump(result, f)
+
+
+def bench_monitor(backend: str, tag: str, args: argparse.Namespace) -> dict[str, Any]:
+    """Run the monitor with ``backend`` in a fresh process and collect its measurements."""
+    run_dir = os.path.join(args.work_dir, f"monitor-{backend}")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    output = os.path.join(run_dir, "result.json")
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--monitor-child", backend, "--standin-tag", tag,
+         "--child-output", output, "--duration", str(args.duration),
+         "--sample-interval", str(args.sample_interval), "--tip-interval", str(args.tip_interval),
+         "--iterations", str(args.iterations), "--pg-latency-ms", str(args.pg_latency_ms),
+         "--standin-slots-per-s", str(args.standin_slots_per_s)],
+        cwd=run_dir, stdout=subprocess.DEVNULL
+    )
+    code, usage = wait_child(proc)
+    if code != 0:
+        raise RuntimeError(f"Monitor run with the {backend} backend exited with {code}")
+    with open(output) as f:
+        result: dict[str, Any] = json.load(f)
+    result['peak_rss_mb'] = round(usage.ru_maxrss / 1024, 1)
+    return result
+
+
+def bench_inserts(db_file: str, rows: int, batch_size: int) -> dict[str, Any]:
+    """Rows per second ``MetricsWriter`` gets into SQLite, and the cost of one ``write`` call."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.remove(db_file + suffix)
+    migrate(db_file)
+    vid = version_id(db_file, BENCH_VERSION)
+    writer = MetricsWriter(db_file, flush_interval=10.0, batch_size=batch_size)
+    writer.start()
+    t0 = time.perf_counter()
+    for i in range(rows):
+        writer.write('memory_metrics', {
+            'ts_ms': i, 'version_id': vid, 'slot_no': i, 'rss': 2048.0, 'vms': 4096.0,
+            'uss': 2000.0, 'pss': 2010.0, 'swap': 0.0, 'shared': 40.0
+        })
+    enqueued = time.perf_counter() - t0
+    writer.close(timeout=None)
+    elapsed = time.perf_counter() - t0
+    return {
+        'rows': rows,
+        'batch_size': batch_size,
+        'rows_per_s': round(rows / elapsed),
+        'write_call_us': round(enqueued / rows * 1e6, 2),
+    }
+
+
+def unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def bench_startup(runs: int, idle_seconds: float, work_dir: str) -> dict[str, Any]:
+    """Startup time and idle memory of the monitor's real entry point.
+
+    Startup is the wall time of ``--help``, which exits right after the
+    imports. Idle memory is that of a headless monitor after
+    ``idle_seconds`` without a db-sync process or a reachable Postgres.
+    """
+    script = os.path.join(SCRIPTS_DIR, "db-sync-process-monitor.py")
+    walls, peaks = [], []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, script, "--help"], stdout=subprocess.DEVNULL)
+        code, usage = wait_child(proc)
+        if code != 0:
+            raise RuntimeError(f"db-sync-process-monitor.py --help exited with {code}")
+        walls.append(time.perf_counter() - t0)
+        peaks.append(usage.ru_maxrss / 1024)
+
+    imports = subprocess.run([sys.executable, "-X", "importtime", script, "--help"],
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True).stderr
+    loaded = {line.rsplit("|", 1)[1].strip() for line in imports.splitlines()
+              if line.startswith("import time:") and "|" in line}
+
+    run_dir = os.path.join(work_dir, "startup")
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    proc = subprocess.Popen(
+        [sys.executable, script, "--env", "bench", "--db-sync-ver", "bench", "--headless",
+         "--pg-host", "127.0.0.1", "--pg-port", str(unused_port())],
+        cwd=run_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        time.sleep(idle_seconds)
+        mem = psutil.Process(proc.pid).memory_full_info()
+    finally:
+        proc.terminate()
+        proc.wait()
+    return {
+        'runs': runs,
+        'wall_s': round(statistics.median(walls), 3),
+        'wall_min_s': round(min(walls), 3),
+        'peak_rss_mb': round(statistics.median(peaks), 1),
+        'idle_rss_mb': round(mem.rss / MB, 1),
+        'idle_uss_mb': round(mem.uss / MB, 1),
+        'heavy_modules': [m for m in HEAVY_MODULES if m in loaded],
+    }
+
+
+def build_plot_db(db_file: str, rows: int) -> dict[str, Any]:
+    """A metrics database with ``rows`` samples of one version, rolled up like a long-running monitor's.
+
+    Samples are ``ROW_INTERVAL_MS`` apart and end now. Built databases are
+    kept and reused, as building the larger ones takes minutes.
+    """
+    if os.path.exists(db_file):
+        return {'db_mb': round(os.path.getsize(db_file) / MB, 1), 'reused': True}
+    t0 = time.perf_counter()
+    tmp = db_file + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    migrate(tmp)
+    vid = version_id(tmp, BENCH_VERSION)
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - rows * ROW_INTERVAL_MS
+    series = """WITH RECURSIVE s(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM s WHERE i + 1 < :rows)"""
+    params = {'rows': rows, 'vid': vid, 'start': start_ms, 'step': ROW_INTERVAL_MS}
+    with sqlite3.connect(tmp) as conn:
+        conn.execute(f"""INSERT INTO memory_metrics (ts_ms, version_id, slot_no, rss, vms, uss, pss, swap, shared)
+                         {series}
+                         SELECT :start + i * :step, :vid, i * 20, 2000 + i * 0.001 + abs(random() % 100),
+                                4000 + i * 0.001, 1950 + i * 0.001, 1960 + i * 0.001, 0, 40
+                         FROM s""", params)
+        conn.execute(f"""INSERT INTO cpu_metrics (ts_ms, version_id, slot_no, cpu_percent, user_time,
+                                                  system_time, children_user, children_system, iowait,
+                                                  ctx_switches, interrupts)
+                         {series}
+                         SELECT :start + i * :step, :vid, i * 20, 60 + abs(random() % 40),
+                                i * 8.0, i * 1.0, 0, 0, 0, i * 50, 0
+                         FROM s""", params)
+        conn.execute(f"""INSERT INTO db_sync_version (ts_ms, version_id, lateness_ms)
+                         {series}
+                         SELECT :start + i * :step, :vid, 0 FROM s""", params)
+    conn.close()
+    compact(tmp, now_ms=end_ms)
+    with sqlite3.connect(tmp) as conn:
+        conn.execute("VACUUM")
+    conn.close()
+    os.replace(tmp, db_file)
+    return {
+        'db_mb': round(os.path.getsize(db_file) / MB, 1),
+        'reused': False,
+        'build_s': round(time.perf_counter() - t0, 1),
+    }
+
+
+def bench_regenerate_plots(rows: int, work_dir: str) -> dict[str, Any]:
+    """Wall time, CPU time and peak RSS of regenerate-plots.py on a ``rows``-sample database."""
+    db_file = os.path.join(work_dir, f"plots-{rows}.db")
+    result = build_plot_db(db_file, rows)
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(SCRIPTS_DIR, "regenerate-plots.py"), "--sqlite-db", db_file,
+         "--dbname", "bench", "--output-folder", os.path.join(work_dir, "plots")],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL
+    )
+    assert proc.stdin is not None
+    proc.stdin.write(b"1\n")  # the only version in the database
+    proc.stdin.close()
+    code, usage = wait_child(proc)
+    if code != 0:
+        raise RuntimeError(f"regenerate-plots.py exited with {code} on {db_file}")
+    result.update({
+        'wall_s': round(time.perf_counter() - t0, 2),
+        'cpu_s': round(usage.ru_utime + usage.ru_stime, 2),
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+    })
+    return result
+
+
+def wait_for_rss(pid: int, rss_mb: float, timeout: float = 30.0) -> None:
+    """Let the stand-in fill its memory before the monitor is measured."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if psutil.Process(pid).memory_info().rss >= 0.9 * rss_mb * MB:
+            return
+        time.sleep(0.1)
+
+
+def flatten(tree: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(results: dict[str, Any], baseline_file: str) -> None:
+    """Print every measurement that also appears in ``baseline_file`` with its relative change."""
+    with open(baseline_file) as f:
+        baseline = flatten(json.load(f))
+    print(f"Change against {baseline_file}:")
+    for key, value in flatten(results).items():
+        if key.startswith(("config.", "host.")) or key not in baseline:
+            continue
+        before = baseline[key]
+        change = f"{100 * (value - before) / before:+.1f}%" if before else "n/a"
+        print(f"  {key:60s} {before:>12} -> {value:>12}  {change}")
+
+
+def print_summary(results: dict[str, Any]) -> None:
+    if 'startup' in results:
+        r = results['startup']
+        heavy = ", ".join(r['heavy_modules']) or "none"
+        print(f"Monitor startup: {r['wall_s']}s (min {r['wall_min_s']}s, peak RSS {r['peak_rss_mb']}MB) | "
+              f"idle RSS {r['idle_rss_mb']}MB, USS {r['idle_uss_mb']}MB | plotting modules loaded: {heavy}")
+    for backend, r in results['monitor'].items():
+        print(f"Monitor ({backend}): CPU {r['cpu_percent']}% | RSS {r['rss_mb']}MB (peak {r['peak_rss_mb']}MB) | "
+              f"sample p95 {r['sample_process'].get('p95_us')}us | lateness p95 {r['lateness'].get('p95_us')}us | "
+              f"skipped {r['skipped_ticks']}")
+        for name, s in r['latency'].items():
+            print(f"  {name:20s} p50 {s['p50_us']:10.1f}us  p95 {s['p95_us']:10.1f}us  p99 {s['p99_us']:10.1f}us")
+    ins = results['sqlite_insert']
+    print(f"SQLite inserts: {ins['rows_per_s']} rows/s at batch size {ins['batch_size']}, "
+          f"{ins['write_call_us']}us per write()")
+    for rows, r in results['regenerate_plots'].items():
+        print(f"regenerate-plots.py on {rows} rows ({r['db_mb']}MB): {r['wall_s']}s wall, {r['cpu_s']}s CPU, "
+              f"peak RSS {r['peak_rss_mb']}MB")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Measure the monitor's own overhead against a synthetic db-sync and Postgres tip"
+    )
+    parser.add_argument("--backends", default="proc,psutil",
+                        help="Comma-separated sampler backends to measure (proc is skipped where unavailable)")
+    parser.add_argument("--duration", type=float, default=60.0,
+                        help="Seconds the monitor runs per backend")
+    parser.add_argument("--sample-interval", type=float, default=1.0,
+                        help="Monitor --sample-interval during the run")
+    parser.add_argument("--tip-interval", type=float, default=1.0,
+                        help="Monitor --tip-interval during the run")
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="Calls per method when timing get_process/get_memory_details/get_cpu_details/get_tip")
+    parser.add_argument("--pg-latency-ms", type=float, default=1.0,
+                        help="Round trip the Postgres stand-in adds to every query")
+    parser.add_argument("--standin-rss-mb", type=float, default=512.0,
+                        help="Resident memory of the stand-in db-sync process")
+    parser.add_argument("--standin-growth-mb-per-min", type=float, default=0.0,
+                        help="Memory the stand-in adds per minute")
+    parser.add_argument("--standin-cpu", type=float, default=0.5,
+                        help="Fraction of one core the stand-in keeps busy")
+    parser.add_argument("--standin-mappings", type=int, default=2000,
+                        help="Extra memory mappings of the stand-in (smaps length)")
+    parser.add_argument("--standin-slots-per-s", type=float, default=50.0,
+                        help="Sync speed reported by the Postgres stand-in")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="Times the monitor's startup is measured (0 skips the startup and idle memory run)")
+    parser.add_argument("--idle-seconds", type=float, default=10.0,
+                        help="Seconds a headless monitor idles before its memory is measured")
+    parser.add_argument("--insert-rows", type=int, default=200_000,
+                        help="Rows written through the SQLite writer")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="SQLite writer --batch-size")
+    parser.add_argument("--plot-rows", default="1000000,10000000",
+                        help="Comma-separated sample counts of the databases regenerate-plots.py is timed on "
+                             "(empty skips it)")
+    parser.add_argument("--work-dir", default="bench-data",
+                        help="Directory for run databases; generated plot databases are kept there for reuse")
+    parser.add_argument("--output", default="bench-results.json",
+                        help="File the results are written to as JSON")
+    parser.add_argument("--compare",
+                        help="Earlier results file to print relative changes against")
+    parser.add_argument("--monitor-child", help=argparse.SUPPRESS)
+    parser.add_argument("--standin-tag", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.monitor_child:
+        run_monitor(args)
+        return
+
+    args.work_dir = os.path.abspath(args.work_dir)
+    os.makedirs(args.work_dir, exist_ok=True)
+    config = {k: v for k, v in vars(args).items() if k not in ('monitor_child', 'standin_tag', 'child_output')}
+    results: dict[str, Any] = {
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'memory_mb': round(psutil.virtual_memory().total / MB),
+        },
+        'config': config,
+        'monitor': {},
+        'regenerate_plots': {},
+    }
+
+    if args.startup_runs > 0:
+        print(f"Timing the monitor's startup {args.startup_runs} times...")
+        results['startup'] = bench_startup(args.startup_runs, args.idle_seconds, args.work_dir)
+
+    tag = f"db-sync-bench-standin-{os.getpid()}"
+    standin = start_standin_process(tag, args.standin_rss_mb, args.standin_growth_mb_per_min,
+                                    args.standin_cpu, args.standin_mappings)
+    try:
+        wait_for_rss(standin.pid, args.standin_rss_mb)
+        for backend in (b.strip() for b in args.backends.split(",") if b.strip()):
+            if backend == 'proc' and not proc_sampler_available(standin.pid):
+                print("Skipping the proc backend: /proc is not available")
+                continue
+            print(f"Running the monitor with the {backend} backend for {args.duration:.0f}s...")
+            results['monitor'][backend] = bench_monitor(backend, tag, args)
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    print(f"Writing {args.insert_rows} rows through the SQLite writer...")
+    results['sqlite_insert'] = bench_inserts(os.path.join(args.work_dir, "inserts.db"),
+                                             args.insert_rows, args.batch_size)
+
+    for rows in (int(r) for r in args.plot_rows.split(",") if r.strip()):
+        print(f"Timing regenerate-plots.py on {rows} rows...")
+        results['regenerate_plots'][str(rows)] = bench_regenerate_plots(rows, args.work_dir)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
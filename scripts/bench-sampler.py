@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import os
+import statistics
+import time
+from typing import Any
+
+import psutil
+
+from dbsync_monitoring.proc_sampler import ProcSampler, PsutilSampler, Sampler, proc_sampler_available
+
+
+def bench(sampler: Sampler, iterations: int) -> dict[str, Any]:
+    """Time memory()+cpu() per sample, in wall and CPU microseconds."""
+    wall: list[float] = []
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        sampler.memory()
+        sampler.cpu()
+        wall.append((time.perf_counter() - t0) * 1e6)
+    cpu_us = (time.process_time() - cpu_start) * 1e6 / iterations
+    wall.sort()
+    return {
+        'iterations': iterations,
+        'wall_us_mean': round(statistics.fmean(wall), 1),
+        'wall_us_p50': round(wall[len(wall) // 2], 1),
+        'wall_us_p95': round(wall[int(len(wall) * 0.95)], 1),
+        'cpu_us_per_sample': round(cpu_us, 1),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Compare per-sample cost of the /proc and psutil samplers")
+    parser.add_argument("--pid", type=int, default=os.getpid(),
+                        help="Process to sample (e.g. a running cardano-db-sync); defaults to this script")
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="Samples per backend")
+    parser.add_argument("--json", action="store_true",
+                        help="Print results as JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    process = psutil.Process(args.pid)
+    process.cpu_percent(interval=None)
+
+    samplers: dict[str, Sampler] = {'psutil': PsutilSampler(process)}
+    if proc_sampler_available(args.pid):
+        samplers['proc'] = ProcSampler(args.pid)
+
+    results = {
+        'pid': args.pid,
+        'mappings': sum(1 for _ in process.memory_maps(grouped=False)),
+        'backends': {name: bench(s, args.iterations) for name, s in samplers.items()},
+    }
+    for s in samplers.values():
+        s.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"PID {results['pid']} with {results['mappings']} mappings")
+        for name, r in results['backends'].items():
+            print(f"  {name:7s} mean {r['wall_us_mean']:8.1f}us  p50 {r['wall_us_p50']:8.1f}us  "
+                  f"p95 {r['wall_us_p95']:8.1f}us  cpu {r['cpu_us_per_sample']:8.1f}us/sample")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import traceback
+from collections.abc import Callable, Sized
+from functools import partial
+
+from dbsync_monitoring.queries import (
+    load_cpu_time,
+    load_events,
+    load_metrics,
+    load_peak_rss,
+    load_phases,
+    load_rates,
+    load_samples,
+    load_versions,
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUNDLED = sorted(glob.glob(os.path.join(REPO_DIR, "*", "dbsync_*_stats_sqlite.db")))
+
+
+def check(sqlite_file: str) -> bool:
+    """Migrate a copy of ``sqlite_file`` and run every loader the plots use on it."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db = shutil.copy(sqlite_file, tmp)
+        versions = load_versions(db)
+        loaders: dict[str, Callable[[], object]] = {
+            'load_metrics': lambda: load_metrics(db, versions, 2000),
+            'load_cpu_time': lambda: load_cpu_time(db, versions, 2000),
+            'load_peak_rss': lambda: load_peak_rss(db, versions),
+            'load_rates': lambda: load_rates(db, versions, 2000),
+            'load_events': lambda: load_events(db, versions),
+            'load_phases': lambda: load_phases(db, versions),
+        }
+        for version in versions:
+            loaders[f"load_samples({version})"] = partial(load_samples, db, version)
+        print(f"{sqlite_file}: {len(versions)} versions")
+        ok = True
+        for name, loader in loaders.items():
+            try:
+                result = loader()
+            except Exception:
+                print(f"  {name:40s} FAILED")
+                traceback.print_exc()
+                ok = False
+                continue
+            parts = result if isinstance(result, tuple) else (result,)
+            print(f"  {name:40s} ok, {' / '.join(str(len(p)) for p in parts if isinstance(p, Sized))} rows")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that metrics files written by older releases still migrate and load (copies are used)"
+    )
+    parser.add_argument("sqlite_db", nargs="*", default=BUNDLED,
+                        help="Files to check (default: the bundled preprod and preview databases)")
+    args = parser.parse_args()
+    results = [check(f) for f in args.sqlite_db]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 import argparse
 import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 import pandas as pd
@@ -8,17 +10,29 @@ import plotly.graph_objs as go
 import psycopg2
 from plotly.subplots import make_subplots
 
+from dbsync_monitoring.epochs import EpochIndex, attribute
+from dbsync_monitoring.queries import load_phases, load_samples, load_versions, with_phases
+
 
 def ensure_dir(path: str) -> None:
     if not os.path.isdir(path):
         os.makedirs(path, exist_ok=True)
 
+def format_bytes(size: int) -> str:
+    """Human-readable size with the units and rounding of pg_size_pretty."""
+    for unit in ("bytes", "kB", "MB", "GB"):
+        if abs(size) < 10 * 1024:
+            return f"{size} {unit}"
+        size = round(size / 1024)
+    return f"{size} TB"
+
 def fetch_db_and_table_sizes(
     pg_host: str,
     pg_port: int,
     pg_user: str,
     pg_dbname: str,
-) -> dict[str, str]:
+) -> dict[str, int]:
+    """Database size and total size of every table (heap, indexes and TOAST), in bytes."""
     conn = psycopg2.connect(
         host=pg_host, port=pg_port,
         user=pg_user, dbname=pg_dbname
@@ -26,14 +40,14 @@ def fetch_db_and_table_sizes(
     cur = conn.cursor()
 
     # Total database size
-    cur.execute("SELECT pg_size_pretty(pg_database_size(%s));", (pg_dbname,))
-    db_size = cur.fetchone()[0]
+    cur.execute("SELECT pg_database_size(%s);", (pg_dbname,))
+    db_size = int(cur.fetchone()[0])
 
     # Per-table sizes
     cur.execute("""
       SELECT
         pg_namespace.nspname || '.' || pg_class.relname AS table_name,
-        pg_size_pretty(pg_total_relation_size(pg_class.oid)) AS size
+        pg_total_relation_size(pg_class.oid) AS size
       FROM pg_class
       JOIN pg_namespace
         ON pg_namespace.oid = pg_class.relnamespace
@@ -44,14 +58,21 @@ def fetch_db_and_table_sizes(
     rows = cur.fetchall()
     conn.close()
 
-    sizes: dict[str, str] = {"__database__": db_size, **{table_name: size for table_name, size in rows}}
+    sizes: dict[str, int] = {"__database__": db_size, **{table_name: int(size) for table_name, size in rows}}
     return sizes
 
+EPOCH_STATS_COLUMNS = ["epoch_no", "sync_secs", "tx_count", "sum_tx_size", "reward_count", "stake_count"]
+
+# Rewards earned in epoch N are only inserted at the start of epoch N+2, so the
+# last few epochs before the open one are recomputed along with it.
+UNSETTLED_EPOCHS = 2
+
 def fetch_epoch_stats(
     pg_host: str,
     pg_port: int,
     pg_user: str,
     pg_dbname: str,
+    from_epoch: int = 0,
 ) -> pd.DataFrame:
     SQL = """
         SELECT
@@ -71,6 +92,8 @@ def fetch_epoch_stats(
                 0             AS stake_count
             FROM
                 reward
+            WHERE
+                earned_epoch >= %(from_epoch)s
             GROUP BY
                 earned_epoch
 
@@ -85,6 +108,8 @@ def fetch_epoch_stats(
                 COUNT(epoch_stake) AS stake_count
             FROM
                 epoch_stake
+            WHERE
+                epoch_no >= %(from_epoch)s
             GROUP BY
                 epoch_no
 
@@ -101,7 +126,7 @@ def fetch_epoch_stats(
                 block
                 INNER JOIN tx ON tx.block_id = block.id
             WHERE
-                epoch_no IS NOT NULL
+                epoch_no >= %(from_epoch)s
             GROUP BY
                 epoch_no
 
@@ -116,6 +141,8 @@ def fetch_epoch_stats(
                 0             AS stake_count
             FROM
                 epoch_sync_time
+            WHERE
+                no >= %(from_epoch)s
         ) AS derived_table
         GROUP BY
             epoch_no;
@@ -124,10 +151,325 @@ def fetch_epoch_stats(
         host=pg_host, port=pg_port,
         user=pg_user, dbname=pg_dbname
     )
-    df = pd.read_sql_query(SQL, conn)
+    df = pd.read_sql_query(SQL, conn, params={"from_epoch": from_epoch})
+    conn.close()
+    return df
+
+# The branches of the UNION in fetch_epoch_stats, run as independent queries.
+EPOCH_STATS_BRANCHES: dict[str, str] = {
+    "rewards": """
+        SELECT earned_epoch AS epoch_no, COUNT(*) AS reward_count
+        FROM reward
+        WHERE earned_epoch >= %(from_epoch)s
+        GROUP BY earned_epoch
+    """,
+    "stakes": """
+        SELECT epoch_no, COUNT(*) AS stake_count
+        FROM epoch_stake
+        WHERE epoch_no >= %(from_epoch)s
+        GROUP BY epoch_no
+    """,
+    "txs": """
+        SELECT block.epoch_no, COUNT(tx.id) AS tx_count, SUM(tx.size) AS sum_tx_size
+        FROM block
+        INNER JOIN tx ON tx.block_id = block.id
+        WHERE block.epoch_no >= %(from_epoch)s
+        GROUP BY block.epoch_no
+    """,
+    "sync_times": """
+        SELECT no AS epoch_no, MAX(seconds) AS sync_secs
+        FROM epoch_sync_time
+        WHERE no >= %(from_epoch)s
+        GROUP BY no
+    """,
+}
+
+def fetch_epoch_stats_branch(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    sql: str,
+    from_epoch: int = 0,
+) -> pd.DataFrame:
+    conn = psycopg2.connect(
+        host=pg_host, port=pg_port,
+        user=pg_user, dbname=pg_dbname,
+        application_name="create-db-sync-stats"
+    )
+    df = pd.read_sql_query(sql, conn, params={"from_epoch": from_epoch})
+    conn.close()
+    return df.set_index("epoch_no")
+
+def fetch_epoch_stats_parallel(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    from_epoch: int = 0,
+) -> pd.DataFrame:
+    """Same result as fetch_epoch_stats, with each aggregation on its own connection."""
+    with ThreadPoolExecutor(max_workers=len(EPOCH_STATS_BRANCHES)) as pool:
+        futures = [
+            pool.submit(fetch_epoch_stats_branch, pg_host, pg_port, pg_user, pg_dbname, sql, from_epoch)
+            for sql in EPOCH_STATS_BRANCHES.values()
+        ]
+        frames = [f.result() for f in futures]
+
+    df = pd.concat(frames, axis=1, join="outer").fillna(0)
+    df = df.reindex(columns=EPOCH_STATS_COLUMNS[1:], fill_value=0).astype(
+        {"sync_secs": "float64", "tx_count": "int64", "sum_tx_size": "int64",
+         "reward_count": "int64", "stake_count": "int64"}
+    )
+    df.index = df.index.astype("int64")
+    return df.rename_axis("epoch_no").reset_index().sort_values("epoch_no", ignore_index=True)
+
+def fetch_open_epoch(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+) -> int | None:
+    conn = psycopg2.connect(
+        host=pg_host, port=pg_port,
+        user=pg_user, dbname=pg_dbname
+    )
+    cur = conn.cursor()
+    cur.execute("SELECT MAX(epoch_no) FROM block;")
+    row = cur.fetchone()
+    conn.close()
+    return int(row[0]) if row and row[0] is not None else None
+
+def init_epoch_cache(cache_db: str) -> None:
+    cache_dir = os.path.dirname(cache_db)
+    if cache_dir:
+        ensure_dir(cache_dir)
+    with sqlite3.connect(cache_db) as conn:
+        conn.execute("""
+          CREATE TABLE IF NOT EXISTS epoch_stats_cache (
+            dbname       TEXT    NOT NULL,
+            epoch_no     INTEGER NOT NULL,
+            sync_secs    REAL,
+            tx_count     INTEGER,
+            sum_tx_size  INTEGER,
+            reward_count INTEGER,
+            stake_count  INTEGER,
+            PRIMARY KEY (dbname, epoch_no)
+          )
+        """)
+        conn.execute("""
+          CREATE TABLE IF NOT EXISTS epoch_boundaries (
+            dbname     TEXT    NOT NULL,
+            epoch_no   INTEGER NOT NULL,
+            start_slot INTEGER,
+            end_slot   INTEGER,
+            PRIMARY KEY (dbname, epoch_no)
+          )
+        """)
+        conn.execute("""
+          CREATE TABLE IF NOT EXISTS epoch_cache_marks (
+            dbname     TEXT    NOT NULL PRIMARY KEY,
+            epoch_no   INTEGER NOT NULL,
+            db_oid     INTEGER NOT NULL,
+            block_id   INTEGER NOT NULL,
+            block_hash TEXT    NOT NULL
+          )
+        """)
+
+def fetch_epoch_mark(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    epoch_no: int,
+) -> tuple[int, int, str] | None:
+    """Database oid, id and hash of the last block of ``epoch_no``.
+
+    A resync changes at least one of them: a recreated database gets a new
+    oid, a resync in place new block ids and a different chain new hashes.
+    """
+    conn = psycopg2.connect(
+        host=pg_host, port=pg_port,
+        user=pg_user, dbname=pg_dbname
+    )
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT (SELECT oid FROM pg_database WHERE datname = current_database()), id, encode(hash, 'hex')
+        FROM block
+        WHERE epoch_no = %(epoch_no)s
+        ORDER BY id DESC
+        LIMIT 1;
+        """,
+        {"epoch_no": epoch_no}
+    )
+    row = cur.fetchone()
+    conn.close()
+    return (int(row[0]), int(row[1]), str(row[2])) if row else None
+
+def load_epoch_mark(cache_db: str, dbname: str) -> tuple[int, tuple[int, int, str]] | None:
+    with sqlite3.connect(cache_db) as conn:
+        row = conn.execute(
+            "SELECT epoch_no, db_oid, block_id, block_hash FROM epoch_cache_marks WHERE dbname = ?", (dbname,)
+        ).fetchone()
+    return (int(row[0]), (int(row[1]), int(row[2]), str(row[3]))) if row else None
+
+def store_epoch_mark(cache_db: str, dbname: str, epoch_no: int, mark: tuple[int, int, str]) -> None:
+    with sqlite3.connect(cache_db) as conn:
+        conn.execute("INSERT OR REPLACE INTO epoch_cache_marks VALUES (?,?,?,?,?)", (dbname, epoch_no, *mark))
+
+def load_cached_epochs(cache_db: str, dbname: str) -> pd.DataFrame:
+    with sqlite3.connect(cache_db) as conn:
+        return pd.read_sql_query(
+            f"SELECT {', '.join(EPOCH_STATS_COLUMNS)} FROM epoch_stats_cache WHERE dbname = ? ORDER BY epoch_no",
+            conn, params=(dbname,)
+        )
+
+def store_closed_epochs(cache_db: str, dbname: str, df: pd.DataFrame, last_closed_epoch: int) -> None:
+    closed = df[df.epoch_no <= last_closed_epoch]
+    rows = [
+        (dbname, int(r.epoch_no), float(r.sync_secs), int(r.tx_count),
+         int(r.sum_tx_size), int(r.reward_count), int(r.stake_count))
+        for r in closed.itertuples(index=False)
+    ]
+    with sqlite3.connect(cache_db) as conn:
+        conn.executemany("INSERT OR REPLACE INTO epoch_stats_cache VALUES (?,?,?,?,?,?,?)", rows)
+
+def clear_epoch_cache(cache_db: str, dbname: str) -> None:
+    with sqlite3.connect(cache_db) as conn:
+        for table in ("epoch_stats_cache", "epoch_boundaries", "epoch_cache_marks"):
+            conn.execute(f"DELETE FROM {table} WHERE dbname = ?", (dbname,))
+
+def cache_matches(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    cache_db: str,
+) -> bool:
+    """Whether the cached epochs of ``pg_dbname`` were computed from the chain the database holds now."""
+    stored = load_epoch_mark(cache_db, pg_dbname)
+    if stored is None:
+        return False
+    epoch_no, mark = stored
+    return fetch_epoch_mark(pg_host, pg_port, pg_user, pg_dbname, epoch_no) == mark
+
+def fetch_epoch_stats_cached(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    cache_db: str,
+    refresh: bool = False,
+    parallel: bool = False,
+) -> pd.DataFrame:
+    """Return per-epoch stats, aggregating in Postgres only epochs missing from the local cache."""
+    init_epoch_cache(cache_db)
+    open_epoch = fetch_open_epoch(pg_host, pg_port, pg_user, pg_dbname)
+    cached = load_cached_epochs(cache_db, pg_dbname)
+
+    # Also drops the cached epoch boundaries, which fetch_epoch_boundaries_cached reads afterwards.
+    rebuilt = not cached.empty and not cache_matches(pg_host, pg_port, pg_user, pg_dbname, cache_db)
+    if rebuilt:
+        print(f"Epoch stats: cache does not match {pg_dbname} (resynced?), recomputing every epoch")
+    if refresh or rebuilt or open_epoch is None:
+        clear_epoch_cache(cache_db, pg_dbname)
+        cached = cached.iloc[0:0]
+
+    last_closed_epoch = (open_epoch if open_epoch is not None else 0) - UNSETTLED_EPOCHS - 1
+    next_epoch = int(cached.epoch_no.max()) + 1 if not cached.empty else 0
+    from_epoch = max(0, min(next_epoch, last_closed_epoch + 1))
+    cached = cached[cached.epoch_no < from_epoch]
+
+    fetch = fetch_epoch_stats_parallel if parallel else fetch_epoch_stats
+    fresh = fetch(pg_host, pg_port, pg_user, pg_dbname, from_epoch=from_epoch)
+    store_closed_epochs(cache_db, pg_dbname, fresh, last_closed_epoch)
+    closed = [*cached.epoch_no, *fresh.epoch_no[fresh.epoch_no <= last_closed_epoch]]
+    if closed:
+        newest = int(max(closed))
+        mark = fetch_epoch_mark(pg_host, pg_port, pg_user, pg_dbname, newest)
+        if mark is not None:
+            store_epoch_mark(cache_db, pg_dbname, newest, mark)
+    print(f"Epoch stats: {len(cached)} epochs from cache, {len(fresh)} recomputed from epoch {from_epoch}")
+
+    df = pd.concat([cached, fresh[EPOCH_STATS_COLUMNS]], ignore_index=True)
+    return df.sort_values("epoch_no", ignore_index=True)
+
+def fetch_epoch_boundaries(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    from_epoch: int = 0,
+) -> pd.DataFrame:
+    """First and last block slot of every epoch from ``from_epoch`` on."""
+    conn = psycopg2.connect(
+        host=pg_host, port=pg_port,
+        user=pg_user, dbname=pg_dbname
+    )
+    df = pd.read_sql_query(
+        """
+        SELECT epoch_no, MIN(slot_no) AS start_slot, MAX(slot_no) AS end_slot
+        FROM block
+        WHERE epoch_no >= %(from_epoch)s AND slot_no IS NOT NULL
+        GROUP BY epoch_no
+        ORDER BY epoch_no;
+        """,
+        conn, params={"from_epoch": from_epoch}
+    )
     conn.close()
     return df
 
+def fetch_epoch_boundaries_cached(
+    pg_host: str,
+    pg_port: int,
+    pg_user: str,
+    pg_dbname: str,
+    cache_db: str,
+    refresh: bool = False,
+) -> pd.DataFrame:
+    """Slot boundaries of every epoch, scanning ``block`` only for epochs not closed in the local cache."""
+    init_epoch_cache(cache_db)
+    open_epoch = fetch_open_epoch(pg_host, pg_port, pg_user, pg_dbname)
+    with sqlite3.connect(cache_db) as conn:
+        if refresh or open_epoch is None:
+            conn.execute("DELETE FROM epoch_boundaries WHERE dbname = ?", (pg_dbname,))
+        else:
+            conn.execute("DELETE FROM epoch_boundaries WHERE dbname = ? AND epoch_no >= ?", (pg_dbname, open_epoch))
+        cached = pd.read_sql_query(
+            "SELECT epoch_no, start_slot, end_slot FROM epoch_boundaries WHERE dbname = ? ORDER BY epoch_no",
+            conn, params=(pg_dbname,)
+        )
+
+    from_epoch = int(cached.epoch_no.max()) + 1 if not cached.empty else 0
+    fresh = fetch_epoch_boundaries(pg_host, pg_port, pg_user, pg_dbname, from_epoch)
+    closed = fresh[fresh.epoch_no < (open_epoch if open_epoch is not None else 0)]
+    with sqlite3.connect(cache_db) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO epoch_boundaries VALUES (?,?,?,?)",
+            [(pg_dbname, int(r.epoch_no), int(r.start_slot), int(r.end_slot)) for r in closed.itertuples(index=False)]
+        )
+    print(f"Epoch boundaries: {len(cached)} epochs from cache, {len(fresh)} read from epoch {from_epoch}")
+    return pd.concat([cached, fresh], ignore_index=True).sort_values("epoch_no", ignore_index=True)
+
+def write_epoch_resources(
+    df: pd.DataFrame,
+    dbname: str,
+    version: str,
+    outdir: str,
+    top: int = 10,
+) -> str:
+    ensure_dir(outdir)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = os.path.join(outdir, f"{dbname}_epoch_resources_{timestamp}.csv")
+    df.to_csv(filename, index=False)
+    print(f"Wrote per-epoch resources of {version} to {filename}")
+    print("Epochs with the highest CPU cost:")
+    print(df.nlargest(top, "cpu_s")[["epoch_no", "cpu_s", "peak_rss_mb", "sync_secs", "tx_count",
+                                      "reward_count", "cpu_s_per_1k_tx", "cpu_s_per_1k_rewards"]]
+          .to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+    return filename
+
 def plot_epoch_stats(
     df: pd.DataFrame,
     dbname: str,
@@ -174,7 +516,7 @@ def plot_epoch_stats(
     return filename
 
 def write_size_report(
-    sizes: dict[str, str],
+    sizes: dict[str, int],
     dbname: str,
     outdir: str,
 ) -> str:
@@ -183,10 +525,11 @@ def write_size_report(
     filename = os.path.join(outdir, f"{dbname}_db_size_report_{timestamp}.txt")
     with open(filename, "w") as f:
         f.write(f"Database: {dbname}\n")
-        f.write(f"Total size: {sizes.pop('__database__')}\n\n")
+        db_size = sizes.pop('__database__')
+        f.write(f"Total size: {format_bytes(db_size)} ({db_size} bytes)\n\n")
         f.write("Table sizes:\n")
         for tbl, sz in sizes.items():
-            f.write(f"  {tbl:40s} → {sz}\n")
+            f.write(f"  {tbl:40s} → {format_bytes(sz):>10s} {sz:>16d} bytes\n")
     print(f"Wrote size report to {filename}")
     return filename
 
@@ -197,18 +540,52 @@ if __name__ == "__main__":
     parser.add_argument("--pg-user",   default="postgres")
     parser.add_argument("--pg-dbname", required=True)
     parser.add_argument("--outdir",    default="plots")
+    parser.add_argument("--cache-db",  default=os.path.join("stats", "epoch_stats_cache.db"),
+                        help="SQLite file caching stats of closed epochs")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Drop cached epochs for this database and recompute everything")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Run the per-epoch aggregations concurrently on separate connections")
+    parser.add_argument("--metrics-db",
+                        help="SQLite file of db-sync-process-monitor.py; attributes its CPU, RSS and I/O to epochs")
+    parser.add_argument("--metrics-version",
+                        help="Version in --metrics-db to attribute (default: the most recently registered)")
     args = parser.parse_args()
 
     # 1) Epoch stats plot
-    df_epochs = fetch_epoch_stats(
+    df_epochs = fetch_epoch_stats_cached(
         pg_host=args.pg_host,
         pg_port=args.pg_port,
         pg_user=args.pg_user,
-        pg_dbname=args.pg_dbname
+        pg_dbname=args.pg_dbname,
+        cache_db=args.cache_db,
+        refresh=args.refresh_cache,
+        parallel=args.parallel
     )
     plot_epoch_stats(df_epochs, args.pg_dbname, args.outdir)
 
-    # 2) Size report
+    # 2) Resources per epoch
+    if args.metrics_db:
+        versions = load_versions(args.metrics_db)
+        version = args.metrics_version or (versions[0] if versions else None)
+        if version not in versions:
+            print(f"No samples of {version} in {args.metrics_db}, skipping per-epoch resources.")
+        else:
+            boundaries = fetch_epoch_boundaries_cached(
+                pg_host=args.pg_host,
+                pg_port=args.pg_port,
+                pg_user=args.pg_user,
+                pg_dbname=args.pg_dbname,
+                cache_db=args.cache_db,
+                refresh=args.refresh_cache
+            )
+            mem, cpu, io = load_samples(args.metrics_db, version)
+            phases = load_phases(args.metrics_db, [version])
+            mem, cpu, io = (with_phases(df.assign(version=version), phases) for df in (mem, cpu, io))
+            resources = attribute(EpochIndex(boundaries), mem, cpu, io, df_epochs)
+            write_epoch_resources(resources, args.pg_dbname, version, args.outdir)
+
+    # 3) Size report
     sizes = fetch_db_and_table_sizes(
         pg_host=args.pg_host,
         pg_port=args.pg_port,
@@ -1,23 +1,94 @@
 #!/usr/bin/env python3
 import argparse
+import asyncio
+import dataclasses
 import os
-import sqlite3
+import signal
 import time
 from datetime import datetime
-from threading import Thread
-from typing import Any
-
-import pandas as pd
-import plotly.graph_objs as go
-import psutil
-import psycopg2
-from plotly.graph_objs import Figure
-from plotly.subplots import make_subplots
+from threading import Lock, Thread
+from typing import TYPE_CHECKING, Any
+
 from psutil import Process
 
+from dbsync_monitoring.detectors import (
+    DEFAULT_LEAK_MB_PER_HOUR,
+    DEFAULT_STALL_SAMPLES,
+    Event,
+    LeakDetector,
+    StallDetector,
+    ThroughputChangeDetector,
+)
+from dbsync_monitoring.disk_io import CounterDelta, DiskStats
+from dbsync_monitoring.downsample import DEFAULT_MAX_POINTS, Method
+from dbsync_monitoring.exporter import MetricsExporter
+from dbsync_monitoring.metrics_writer import MetricsWriter
+from dbsync_monitoring.pg_session import PgSession, PgUnavailable
+from dbsync_monitoring.pg_stats import DEFAULT_TABLES, PgStatsCollector
+from dbsync_monitoring.phases import PhaseTracker, ProcessIdentity
+from dbsync_monitoring.proc_sampler import Sampler, make_sampler
+from dbsync_monitoring.process_group import ROLES, ProcessGroup
+from dbsync_monitoring.process_tracker import ProcessTracker
+from dbsync_monitoring.profiling import LiveProfiler
+from dbsync_monitoring.rates import DEFAULT_HALFLIFE_S, Rates, RateTracker
+from dbsync_monitoring.relation_sizes import fetch_relation_sizes
+from dbsync_monitoring.ring_buffer import RingBuffer
+from dbsync_monitoring.rollup import DAY_MS, Compactor
+from dbsync_monitoring.scheduler import Scheduler, Source, Tick
+from dbsync_monitoring.schema import known_runs, migrate, version_id
+from dbsync_monitoring.stage_timer import Histogram, StageTimer
+from dbsync_monitoring.tip import Tip, TipProbe
+
+if TYPE_CHECKING:
+    from plotly.graph_objs import Figure
+
+# Columns of the in-memory buffer of recent process samples.
+RECENT_COLUMNS = (
+    'ts', 'up', 'tip_up', 'tip_age_s', 'slot_no', 'block_no', 'sync_percent',
+    'rss', 'uss', 'pss', 'cpu_percent', 'cpu_seconds', 'ctx_switches', 'read_bytes', 'write_bytes',
+    'slots_per_s', 'blocks_per_s', 'tx_per_s', 'cpu_s_per_1k_slots', 'eta_s',
+)
+
+
+def format_rates(rates: Rates) -> str:
+    def fmt(value: float | None, spec: str) -> str:
+        return format(value, spec) if value is not None else 'N/A'
+
+    if rates.eta_s is None:
+        eta = 'N/A'
+    else:
+        hours, rem = divmod(int(rates.eta_s), 3600)
+        eta = f"{hours}h{rem // 60:02d}m"
+    return (f"{fmt(rates.slots_per_s, '.1f')} slots/s | {fmt(rates.blocks_per_s, '.2f')} blocks/s | "
+            f"{fmt(rates.tx_per_s, '.1f')} tx/s | {fmt(rates.cpu_s_per_1k_slots, '.2f')} CPU-s/1k slots | "
+            f"ETA {eta}")
+
+
+def format_stages(interval: float, stages: dict[str, Histogram]) -> str:
+    def ms(value: float | None) -> str:
+        return f"{value * 1000:.1f}ms" if value is not None else 'N/A'
+
+    parts = [f"{name} n={h.count} p95={ms(h.quantile(0.95))} max={ms(h.max)}" for name, h in sorted(stages.items())]
+    return f"Collector stages over {interval:.0f}s: " + " | ".join(parts)
+
 
 class CardanoMonitor:
-    def __init__(self, env: str, db_sync_ver: str, pg_host: str, pg_port: str, pg_user: str, pg_dbname: str) -> None:
+    def __init__(self, env: str, db_sync_ver: str, pg_host: str, pg_port: str, pg_user: str, pg_dbname: str,
+                 sample_interval: float = 10.0, flush_interval: float = 10.0, batch_size: int = 500,
+                 max_points: int = DEFAULT_MAX_POINTS, downsample: Method = 'lttb', webgl: bool = False,
+                 raw_retention_days: float = 7.0, minute_retention_days: float = 90.0,
+                 compact_interval: float = 600.0, sampler_backend: str = 'auto',
+                 tip_interval: float = 10.0, pg_stats_interval: float = 30.0,
+                 pg_stats_tables: tuple[str, ...] = DEFAULT_TABLES,
+                 rate_halflife: float = DEFAULT_HALFLIFE_S, headless: bool = False,
+                 metrics_host: str = '0.0.0.0', metrics_port: int = 0,
+                 recent_samples: int = 8640, group_interval: float = 30.0,
+                 roles: tuple[str, ...] = ROLES, node_pattern: str = 'cardano-node',
+                 pg_app_names: tuple[str, ...] = (), pg_data_dir: str | None = None,
+                 ledger_state_dir: str | None = None, stats_interval: float = 60.0,
+                 profile_seconds: float = 60.0, size_interval: float = 600.0,
+                 stall_samples: int = DEFAULT_STALL_SAMPLES,
+                 leak_mb_per_hour: float = DEFAULT_LEAK_MB_PER_HOUR) -> None:
         self.running: bool = True
         self.env: str = env
         self.db_sync_ver: str = db_sync_ver
@@ -25,203 +96,405 @@ class CardanoMonitor:
         self.pg_port: str = pg_port
         self.pg_user: str = pg_user
         self.pg_dbname: str = pg_dbname
+        self.sample_interval: float = sample_interval
+        self.tip_interval: float = tip_interval
+        self.tip: Tip | None = None
+        self.tip_ts: float | None = None
+        self.tip_up: bool = False
+        self.rate_halflife: float = rate_halflife
+        self.rate_tracker: RateTracker = RateTracker(rate_halflife)
+        self.rates: Rates | None = None
+        self.stall_detector: StallDetector = StallDetector(stall_samples)
+        self.throughput_detector: ThroughputChangeDetector = ThroughputChangeDetector()
+        self.leak_detector: LeakDetector = LeakDetector(leak_mb_per_hour)
+        self.phases: PhaseTracker = PhaseTracker(time.time(), stall_samples)
+        self.run_id: int | None = None
+        # Keeps a phase change and the run it belongs to in order across the tip and process collectors.
+        self._phase_lock: Lock = Lock()
+        self.recent: RingBuffer = RingBuffer(RECENT_COLUMNS, recent_samples)
+        self.max_points: int = max_points
+        self.downsample: Method = downsample
+        self.webgl: bool = webgl
+        self.headless: bool = headless
+        self.stages: StageTimer = StageTimer()
+        self.profiler: LiveProfiler = LiveProfiler(duration=profile_seconds)
 
         self.db_file: str = f"dbsync_{self.env}_stats_sqlite.db"
         self.output_folder: str = 'plots'
         os.makedirs(self.output_folder, exist_ok=True)
 
+        self.pg_session: PgSession = PgSession(
+            host=self.pg_host, port=self.pg_port,
+            user=self.pg_user, dbname=self.pg_dbname
+        )
+        self.tip_probe: TipProbe = TipProbe(self.pg_session)
+        # Separate connection so server stats queries never queue behind the tip probe.
+        self.pg_stats_session: PgSession = PgSession(
+            host=self.pg_host, port=self.pg_port,
+            user=self.pg_user, dbname=self.pg_dbname,
+            application_name='db-sync-monitor-stats'
+        )
+        self.pg_stats: PgStatsCollector = PgStatsCollector(self.pg_stats_session, pg_stats_tables)
+        self.process_tracker: ProcessTracker = ProcessTracker()
+        self.sampler_backend: str = sampler_backend
+        self._sampler: Sampler | None = None
+        self._sampler_proc: Process | None = None
+        self.io_delta: CounterDelta = CounterDelta()
+        disk_paths = {'postgres': pg_data_dir, 'ledger-state': ledger_state_dir}
+        self.disk_stats: DiskStats = DiskStats({label: path for label, path in disk_paths.items() if path})
+        self.process_group: ProcessGroup = ProcessGroup(
+            self.process_tracker, self.pg_stats_session, roles,
+            node_pattern=node_pattern, pg_app_names=pg_app_names, sampler_backend=sampler_backend
+        )
+
+        sources = [
+            Source('tip', self.tip_interval, self.profiler.wrap(self.sample_tip)),
+            Source('process', self.sample_interval, self.profiler.wrap(self.sample_process)),
+        ]
+        if pg_stats_interval > 0:
+            sources.append(Source('pg_stats', pg_stats_interval, self.profiler.wrap(self.sample_pg_stats)))
+        if group_interval > 0 and roles:
+            sources.append(Source('group', group_interval, self.profiler.wrap(self.sample_group)))
+        if size_interval > 0:
+            sources.append(Source('sizes', size_interval, self.profiler.wrap(self.sample_sizes)))
+        if stats_interval > 0:
+            sources.append(Source('stats', stats_interval, self.sample_stats))
+        self.scheduler: Scheduler = Scheduler(sources)
+        self.exporter: MetricsExporter | None = None
+        if metrics_port:
+            self.exporter = MetricsExporter(metrics_host, metrics_port,
+                                            {'env': self.env, 'version': self.db_sync_ver})
+
         self.init_db()
+        self.writer: MetricsWriter = MetricsWriter(self.db_file, flush_interval, batch_size, self.stages)
+        self.compactor: Compactor = Compactor(
+            self.db_file, compact_interval,
+            raw_retention_ms=int(raw_retention_days * DAY_MS),
+            minute_retention_ms=int(minute_retention_days * DAY_MS),
+            stages=self.stages
+        )
 
     def init_db(self) -> None:
-        with sqlite3.connect(self.db_file) as conn:
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS memory_metrics
-                         (slot_no INTEGER, rss REAL, vms REAL, uss REAL,
-                          pss REAL, swap REAL, shared REAL, version TEXT)''')
-            c.execute('''CREATE TABLE IF NOT EXISTS cpu_metrics
-                         (slot_no INTEGER, cpu_percent REAL, user_time REAL,
-                          system_time REAL, children_user REAL, children_system REAL,
-                          iowait REAL, ctx_switches INTEGER, interrupts INTEGER,
-                          version TEXT)''')
-            c.execute('''CREATE TABLE IF NOT EXISTS db_sync_version
-                         (timestamp TEXT, version TEXT)''')
-            conn.commit()
+        migrate(self.db_file)
+        self.version_id: int = version_id(self.db_file, self.get_db_sync_version())
+        # Run ids are numbered per version and registered through the writer, so sampling never waits on SQLite.
+        self.runs, self.last_run_id = known_runs(self.db_file, self.version_id)
 
     def get_process(self) -> Process | None:
-        for proc in psutil.process_iter(['name', 'cmdline']):
-            if 'cardano-db-sync' in ' '.join(proc.info['cmdline'] or []):
-                return proc
-        return None
+        return self.process_tracker.get()
+
+    def get_sampler(self, process: Process) -> Sampler:
+        if self._sampler is None or self._sampler_proc is not process:
+            if self._sampler is not None:
+                self._sampler.close()
+            self._sampler = make_sampler(process, self.sampler_backend)
+            self._sampler_proc = process
+            self.io_delta.reset()
+        return self._sampler
 
     def get_memory_details(self, process: Process) -> dict[str, float] | None:
-        try:
-            mi = process.memory_info()
-            mfi = process.memory_full_info()
-            return {
-                'rss': mi.rss / 1024**2,
-                'vms': mi.vms / 1024**2,
-                'uss': getattr(mfi, 'uss', 0) / 1024**2,
-                'pss': getattr(mfi, 'pss', 0) / 1024**2,
-                'swap': getattr(mfi, 'swap', 0) / 1024**2,
-                'shared': getattr(mi, 'shared', 0) / 1024**2
-            }
-        except Exception:
-            return None
+        return self.get_sampler(process).memory()
 
     def get_cpu_details(self, process: Process) -> dict[str, Any] | None:
-        try:
-            times = process.cpu_times()
-            percent = process.cpu_percent(interval=None)
-            with process.oneshot():
-                ctx = process.num_ctx_switches()
-            return {
-                'cpu_percent': percent,
-                'user_time': times.user,
-                'system_time': times.system,
-                'children_user': getattr(times, 'children_user', 0.0),
-                'children_system': getattr(times, 'children_system', 0.0),
-                'iowait': getattr(times, 'iowait', 0.0),
-                'ctx_switches': ctx.voluntary + ctx.involuntary,
-                'interrupts': None
-            }
-        except Exception:
-            return None
+        return self.get_sampler(process).cpu()
 
-    def get_slot_no(self) -> int | None:
+    def get_tip(self) -> Tip | None:
         try:
-            conn = psycopg2.connect(
-                host=self.pg_host, port=self.pg_port,
-                user=self.pg_user, dbname=self.pg_dbname
-            )
-            cur = conn.cursor()
-            cur.execute("SELECT slot_no FROM block WHERE block_no IS NOT NULL ORDER BY block_no DESC LIMIT 1;")
-            r = cur.fetchone()
-            conn.close()
-            return r[0] if r else None
-        except Exception as e:
-            print("Postgres error:", e)
+            return self.tip_probe.probe()
+        except PgUnavailable:
             return None
-
-    def get_sync_percent(self) -> float | None:
-        sql = """
-          SELECT
-            100 * (
-              EXTRACT(EPOCH FROM (MAX(time) AT TIME ZONE 'UTC'))
-              - EXTRACT(EPOCH FROM (MIN(time) AT TIME ZONE 'UTC'))
-            )
-            / (
-              EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC'))
-              - EXTRACT(EPOCH FROM (MIN(time) AT TIME ZONE 'UTC'))
-            )
-            AS sync_percent
-          FROM block;
-        """
-        try:
-            conn = psycopg2.connect(
-                host=self.pg_host,
-                port=self.pg_port,
-                user=self.pg_user,
-                dbname=self.pg_dbname,
-            )
-            cur = conn.cursor()
-            cur.execute(sql)
-            row = cur.fetchone()
-            conn.close()
-            return float(row[0]) if row and row[0] is not None else None
         except Exception as e:
-            print(f"Error fetching sync percent: {e}")
+            print("Postgres error:", e)
             return None
 
     def get_db_sync_version(self) -> str:
         return f"cardano-db-sync {self.db_sync_ver} {self.env}"
 
-    def log_metrics(self) -> None:
-        proc = self.get_process()
-        if proc:
-            proc.cpu_percent(interval=None)
-        while self.running:
-            slot = self.get_slot_no()
-            if slot is None:
-                time.sleep(10)
-                continue
+    def sample_tip(self, tick: Tick) -> None:
+        with self.stages.stage('tip_query'):
+            tip = self.get_tip()
+        self.tip_up = tip is not None and tip.slot_no is not None
+        if tip is not None and tip.slot_no is not None:
+            self.tip, self.tip_ts = tip, tick.ts
+            self.rate_tracker.update_chain(tick.ts, tip.slot_no, tip.block_no, tip.tx_id)
+            self.writer.write('sync_progress', {
+                'ts_ms': tick.ts_ms, 'version_id': self.version_id,
+                'slot_no': tip.slot_no, 'block_no': tip.block_no, 'tx_id': tip.tx_id,
+                'tip_time_ms': int(tip.tip_time * 1000), 'sync_percent': tip.sync_percent,
+                'run_id': self.run_id, 'phase': self.phases.phase
+            })
+            with self._phase_lock:
+                if self.phases.update_tip(tip.slot_no):
+                    self.record_phase(tick, tip.slot_no)
+            with self.stages.stage('detect'):
+                events = (self.stall_detector.update(tick.ts, tip.slot_no)
+                          + self.throughput_detector.update(tick.ts, tip.slot_no))
+            self.record_events(events)
+
+    def sample_process(self, tick: Tick) -> None:
+        tip = self.tip
+        stages = self.stages
+        if tip is None or tip.slot_no is None:
+            # No slot to key samples on yet, but /metrics still reports whether db-sync is up.
+            with stages.stage('process_scan'):
+                proc = self.get_process()
+            self.recent.append({'ts': tick.ts, 'up': proc is not None, 'tip_up': self.tip_up})
+            if self.exporter:
+                self.exporter.publish(self.recent, stages.snapshot())
+            return
+        slot = tip.slot_no
 
+        with stages.stage('process_scan'):
             proc = self.get_process()
+        with self._phase_lock:
+            # From the returned process, not the tracker: the group source may rescan it meanwhile.
+            new_run, changed = self.phases.update_process(
+                (proc.pid, proc.create_time()) if proc is not None else None
+            )
+            if new_run and self.phases.run is not None:
+                self.start_run(tick, slot, self.phases.run)
+            if new_run or changed:
+                self.record_phase(tick, slot)
+        with stages.stage('memory'):
             mem = self.get_memory_details(proc) if proc else None
+        with stages.stage('cpu'):
             cpu = self.get_cpu_details(proc) if proc else None
-            ver = self.get_db_sync_version()
-            sync_progress = self.get_sync_percent()
-
-            if mem:
-                with sqlite3.connect(self.db_file) as conn:
-                    conn.execute(
-                        "INSERT INTO memory_metrics VALUES (?,?,?,?,?,?,?,?)",
-                        (slot, mem['rss'], mem['vms'], mem['uss'],
-                         mem['pss'], mem['swap'], mem['shared'], ver)
-                    )
-            if cpu:
-                with sqlite3.connect(self.db_file) as conn:
-                    conn.execute(
-                        "INSERT INTO cpu_metrics VALUES (?,?,?,?,?,?,?,?,?,?)",
-                        (slot, cpu['cpu_percent'], cpu['user_time'], cpu['system_time'],
-                         cpu['children_user'], cpu['children_system'],
-                         cpu['iowait'], cpu['ctx_switches'], cpu['interrupts'], ver)
-                    )
-            with sqlite3.connect(self.db_file) as conn:
-                conn.execute(
-                    "INSERT INTO db_sync_version VALUES (?,?)",
-                    (datetime.now().isoformat(), ver)
-                )
-
-            print(f"Slot {slot} | Sync Progress: {sync_progress:.2f}% | "
-                  f"CPU {cpu['cpu_percent'] if cpu else 'N/A'}% | RSS {mem['rss'] if mem else 'N/A'}MB")
-            time.sleep(10)
-
-    def save_plot(self, fig: Figure, versions: list[str]) -> None:
+        with stages.stage('io'):
+            io = self.get_sampler(proc).io() if proc else None
+        sample = {'ts_ms': tick.ts_ms, 'version_id': self.version_id}
+        tags = {'run_id': self.run_id, 'phase': self.phases.phase}
+
+        if mem:
+            self.writer.write('memory_metrics', {**sample, 'slot_no': slot, **mem, **tags})
+            with stages.stage('detect'):
+                events = self.leak_detector.update(tick.ts, slot, mem['rss'])
+            self.record_events(events)
+        if cpu:
+            self.writer.write('cpu_metrics', {**sample, 'slot_no': slot, **cpu, **tags})
+            self.rate_tracker.update_cpu(tick.ts, slot, cpu['user_time'] + cpu['system_time'])
+        io_delta = self.io_delta.update(io) if io else None
+        if io_delta:
+            interval, deltas = io_delta
+            self.writer.write('io_metrics', {**sample, 'slot_no': slot, 'interval_s': interval, **deltas, **tags})
+        with stages.stage('disk'):
+            disk_rows = self.disk_stats.collect()
+        for row in disk_rows:
+            self.writer.write('disk_metrics', {**sample, 'slot_no': slot, **row})
+        self.writer.write('db_sync_version', {**sample, 'lateness_ms': tick.lateness_ms})
+        self.rates = rates = self.rate_tracker.rates(tick.ts, tip.tip_time)
+        self.recent.append({
+            **(mem or {}), **(cpu or {}), **(io or {}), **dataclasses.asdict(rates),
+            'ts': tick.ts, 'up': proc is not None,
+            'tip_up': self.tip_up, 'tip_age_s': tick.ts - self.tip_ts if self.tip_ts is not None else None,
+            'slot_no': slot, 'block_no': tip.block_no, 'sync_percent': tip.sync_percent,
+            'cpu_seconds': cpu['user_time'] + cpu['system_time'] if cpu else None,
+        })
+        if self.exporter:
+            self.exporter.publish(self.recent, stages.snapshot())
+
+        sync_progress = f"{tip.sync_percent:.2f}" if tip.sync_percent is not None else 'N/A'
+        print(f"Slot {slot} | Sync Progress: {sync_progress}% | {self.phases.phase} | "
+              f"CPU {cpu['cpu_percent'] if cpu else 'N/A'}% | RSS {mem['rss'] if mem else 'N/A'}MB | "
+              f"{format_rates(rates)}")
+        if tick.skipped:
+            print(f"Sampling fell behind: skipped {tick.skipped} tick(s), {tick.lateness_ms}ms late")
+
+    def start_run(self, tick: Tick, slot: int, process: ProcessIdentity) -> None:
+        """Register a new db-sync process as a run; a run after the first is a restart."""
+        pid, create_time = process
+        restart = self.run_id is not None
+        key = (pid, int(create_time * 1000))
+        if key not in self.runs:
+            self.last_run_id += 1
+            self.runs[key] = self.last_run_id
+            self.writer.write('runs', {'id': self.last_run_id, 'version_id': self.version_id, 'pid': pid,
+                                       'create_time_ms': key[1], 'first_ts_ms': tick.ts_ms})
+        self.run_id = self.runs[key]
+        if restart:
+            self.record_events([Event('restart', tick.ts, slot, float(pid),
+                                      f"db-sync restarted as pid {pid} (run {self.run_id}) at slot {slot}")])
+        else:
+            print(f"Following db-sync pid {pid} (run {self.run_id})")
+
+    def record_phase(self, tick: Tick, slot: int) -> None:
+        phase = self.phases.phase
+        self.writer.write('phases', {'ts_ms': tick.ts_ms, 'version_id': self.version_id, 'run_id': self.run_id,
+                                     'phase': phase, 'slot_no': slot})
+        print(f"Phase {phase} (run {self.run_id}) from slot {slot}")
+
+    def record_events(self, events: list[Event]) -> None:
+        for event in events:
+            self.writer.write('events', {
+                'ts_ms': int(event.ts * 1000), 'version_id': self.version_id, 'slot_no': event.slot_no,
+                'kind': event.kind, 'value': event.value, 'message': event.message
+            })
+            print(f"Event {event.kind}: {event.message}")
+
+    def sample_pg_stats(self, tick: Tick) -> None:
+        tip = self.tip
+        try:
+            with self.stages.stage('pg_stats_query'):
+                delta = self.pg_stats.collect()
+        except PgUnavailable:
+            return
+        except Exception as e:
+            print("Postgres stats error:", e)
+            return
+        if delta is None or tip is None:
+            return
+        sample = {'ts_ms': tick.ts_ms, 'version_id': self.version_id,
+                  'slot_no': tip.slot_no, 'interval_s': delta.interval_s}
+        self.writer.write('pg_server_metrics', {**sample, **delta.server})
+        for relname, inserts in delta.table_inserts.items():
+            self.writer.write('pg_table_inserts', {**sample, 'relname': relname, 'inserts': inserts})
+
+    def sample_group(self, tick: Tick) -> None:
+        tip = self.tip
+        with self.stages.stage('group'):
+            interval, rows = self.process_group.sample()
+        if tip is None or interval == 0:
+            return
+        sample = {'ts_ms': tick.ts_ms, 'version_id': self.version_id,
+                  'slot_no': tip.slot_no, 'interval_s': interval}
+        for row in rows:
+            self.writer.write('role_metrics', {**sample, **dataclasses.asdict(row)})
+
+    def sample_sizes(self, tick: Tick, exact: bool = False) -> None:
+        tip = self.tip
+        if tip is None:
+            return
+        try:
+            with self.stages.stage('size_query'):
+                sizes = fetch_relation_sizes(self.pg_stats_session, exact)
+        except PgUnavailable:
+            return
+        except Exception as e:
+            print("Postgres size query error:", e)
+            return
+        sample = {'ts_ms': tick.ts_ms, 'version_id': self.version_id, 'slot_no': tip.slot_no,
+                  'epoch_no': tip.epoch_no, 'tx_id': tip.tx_id, 'exact': exact}
+        for size in sizes:
+            self.writer.write('relation_sizes', {**sample, **dataclasses.asdict(size)})
+        if exact:
+            print(f"Exact sizes recorded: {sum(s.bytes for s in sizes) / 1024**3:.2f} GB in {len(sizes)} relations")
+
+    def request_exact_sizes(self) -> None:
+        """Record exact relation sizes now, outside the signal handler and the schedule."""
+        Thread(target=self.sample_sizes, args=(Tick(time.time(), 0.0, 0), True), daemon=True).start()
+
+    def sample_stats(self, tick: Tick) -> None:
+        interval, stages = self.stages.take_interval()
+        if not stages:
+            return
+        for name, hist in stages.items():
+            p50, p95, p99 = (hist.quantile(q) for q in (0.5, 0.95, 0.99))
+            self.writer.write('collector_stats', {
+                'ts_ms': tick.ts_ms, 'version_id': self.version_id, 'interval_s': interval, 'stage': name,
+                'count': hist.count, 'total_ms': hist.total * 1000, 'max_ms': hist.max * 1000,
+                'p50_ms': p50 * 1000 if p50 is not None else None,
+                'p95_ms': p95 * 1000 if p95 is not None else None,
+                'p99_ms': p99 * 1000 if p99 is not None else None,
+            })
+        print(format_stages(interval, stages))
+
+    def log_metrics(self) -> None:
+        self.get_process()  # first lookup primes cpu_percent
+        asyncio.run(self.scheduler.run())
+
+    def save_plot(self, fig: 'Figure', versions: list[str]) -> None:
         ts = datetime.now().strftime("%Y%m%d_%H%M%S")
         fn = os.path.join(self.output_folder, f"comparison_{self.pg_dbname}_{ts}.html")
         fig.write_html(fn)
         print("Saved:", fn)
 
     def plot_metrics(self, versions: list[str]) -> None:
-        placeholders = ",".join("?" * len(versions))
-        qm = f"SELECT slot_no, rss, version FROM memory_metrics WHERE version IN ({placeholders}) ORDER BY slot_no"
-        qc = f"SELECT slot_no, cpu_percent, version FROM cpu_metrics WHERE version IN ({placeholders}) ORDER BY slot_no"
+        # pandas and plotly take most of the monitor's startup time and memory; only interactive runs need them.
+        from plotly.subplots import make_subplots
+
+        from dbsync_monitoring.plotting import annotate_events, line_trace
+        from dbsync_monitoring.queries import load_events, load_metrics, load_phases, load_rates, with_phases
 
-        with sqlite3.connect(self.db_file) as conn:
-            mem_df = pd.read_sql_query(qm, conn, params=versions)
-            cpu_df = pd.read_sql_query(qc, conn, params=versions)
+        mem_df, cpu_df = load_metrics(self.db_file, versions, self.max_points)
+        # Slots synced again after a restart or rollback would draw over the first pass.
+        phases_df = load_phases(self.db_file, versions)
+        mem_df = with_phases(mem_df, phases_df).query("phase != 'replay'")
+        cpu_df = with_phases(cpu_df, phases_df).query("phase != 'replay'")
+        rates_df, cost_df = load_rates(self.db_file, versions, self.max_points, self.rate_halflife)
+        rates_df, cost_df = rates_df.query("phase != 'replay'"), cost_df.query("phase != 'replay'")
 
-        fig = make_subplots(rows=2, cols=1, shared_xaxes=True,
-                            subplot_titles=["Memory (RSS)", "CPU (%)"])
+        fig = make_subplots(rows=4, cols=1, shared_xaxes=True,
+                            subplot_titles=["Memory (RSS)", "CPU (%)", "Sync Throughput", "CPU Cost"])
         for v in versions:
             dfm = mem_df[mem_df.version == v]
-            fig.add_trace(go.Scatter(x=dfm.slot_no, y=dfm.rss,
-                                     mode='lines', name=f"Mem-{v}"),
+            fig.add_trace(line_trace(dfm.slot_no, dfm.rss, f"Mem-{v}",
+                                     self.max_points, self.downsample, self.webgl),
                           row=1, col=1)
             dfc = cpu_df[cpu_df.version == v]
-            fig.add_trace(go.Scatter(x=dfc.slot_no, y=dfc.cpu_percent,
-                                     mode='lines', name=f"CPU-{v}"),
+            fig.add_trace(line_trace(dfc.slot_no, dfc.cpu_percent, f"CPU-{v}",
+                                     self.max_points, self.downsample, self.webgl),
                           row=2, col=1)
+            dfr = rates_df[rates_df.version == v]
+            fig.add_trace(line_trace(dfr.slot_no, dfr.slots_per_s, f"Slots/s-{v}",
+                                     self.max_points, self.downsample, self.webgl),
+                          row=3, col=1)
+            dfk = cost_df[cost_df.version == v]
+            fig.add_trace(line_trace(dfk.slot_no, dfk.cpu_s_per_1k_slots, f"CPU-s/1k-{v}",
+                                     self.max_points, self.downsample, self.webgl),
+                          row=4, col=1)
+        events_df = load_events(self.db_file, versions)
+        if not events_df.empty:
+            annotate_events(fig, events_df)
 
         fig.update_layout(
             title=f"{self.env} {self.db_sync_ver} Metrics",
             xaxis_title="Slot Number", yaxis_title="RSS (MB)",
-            xaxis2_title="Slot Number", yaxis2_title="CPU Usage (%)"
+            xaxis2_title="Slot Number", yaxis2_title="CPU Usage (%)",
+            xaxis3_title="Slot Number", yaxis3_title="Slots/s",
+            xaxis4_title="Slot Number", yaxis4_title="CPU-s per 1000 slots",
+            height=1200
         )
         fig.show()
         self.save_plot(fig, versions)
 
+    def close(self) -> None:
+        self.running = False
+        self.compactor.stop()
+        self.writer.close()
+        self.process_group.close()
+        self.disk_stats.close()
+        if self.exporter:
+            self.exporter.close()
+        self.pg_session.close()
+        self.pg_stats_session.close()
+
+    def run_headless(self) -> None:
+        """Collect in the foreground until SIGINT/SIGTERM, without prompts or plots."""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self.scheduler.stop())
+        try:
+            self.log_metrics()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
     def run(self) -> None:
+        self.profiler.install()
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_exact_sizes())
+        self.writer.start()
+        self.compactor.start()
+        if self.exporter:
+            self.exporter.start()
+        if self.headless:
+            self.run_headless()
+            return
+        from dbsync_monitoring.queries import load_versions
+
         t = Thread(target=self.log_metrics, daemon=True)
         t.start()
         try:
             while True:
-                with sqlite3.connect(self.db_file) as conn:
-                    vers_df = pd.read_sql_query(
-                        "SELECT DISTINCT version FROM db_sync_version ORDER BY timestamp DESC",
-                        conn
-                    )
-                vers = vers_df["version"].tolist()
+                vers = load_versions(self.db_file)
 
                 if not vers:
                     print("waiting for versions…")
@@ -235,7 +508,9 @@ class CardanoMonitor:
                 self.plot_metrics(chosen)
                 time.sleep(60)
         except KeyboardInterrupt:
-            self.running = False
+            self.scheduler.stop()
+            t.join(timeout=self.sample_interval)
+            self.close()
 
 
 def parse_args() -> argparse.Namespace:
@@ -257,6 +532,93 @@ def parse_args() -> argparse.Namespace:
                         help="Postgres user")
     parser.add_argument("--pg-dbname",
                         help="Postgres database name (defaults to <env>_<db-sync-ver>_metrics)")
+    parser.add_argument("--sample-interval",
+                        default=10.0, type=float,
+                        help="Seconds between process samples")
+    parser.add_argument("--tip-interval",
+                        default=10.0, type=float,
+                        help="Seconds between Postgres tip probes")
+    parser.add_argument("--pg-stats-interval",
+                        default=30.0, type=float,
+                        help="Seconds between Postgres server stats snapshots (0 disables them)")
+    parser.add_argument("--pg-stats-tables",
+                        default=",".join(DEFAULT_TABLES),
+                        help="Comma-separated tables whose insert counters are recorded")
+    parser.add_argument("--flush-interval",
+                        default=10.0, type=float,
+                        help="Max seconds samples are buffered before being written to SQLite")
+    parser.add_argument("--batch-size",
+                        default=500, type=int,
+                        help="Buffered samples that trigger an early SQLite flush")
+    parser.add_argument("--max-points",
+                        default=DEFAULT_MAX_POINTS, type=int,
+                        help="Max points per plotted trace after downsampling (0 keeps every sample)")
+    parser.add_argument("--downsample",
+                        choices=["lttb", "minmax"], default="lttb",
+                        help="Downsampling method: LTTB or per-bucket min/max envelope")
+    parser.add_argument("--webgl",
+                        action="store_true",
+                        help="Render plot traces with WebGL (Scattergl)")
+    parser.add_argument("--raw-retention-days",
+                        default=7.0, type=float,
+                        help="Days of raw samples kept before only rollups remain (0 keeps all)")
+    parser.add_argument("--minute-retention-days",
+                        default=90.0, type=float,
+                        help="Days of per-minute rollups kept before only hourly ones remain (0 keeps all)")
+    parser.add_argument("--compact-interval",
+                        default=600.0, type=float,
+                        help="Seconds between rollup/retention passes")
+    parser.add_argument("--sampler",
+                        choices=["auto", "proc", "psutil"], default="auto",
+                        help="Process stats backend: direct /proc reads (Linux) or psutil")
+    parser.add_argument("--rate-halflife",
+                        default=DEFAULT_HALFLIFE_S, type=float,
+                        help="Half-life in seconds of the EWMA smoothing sync rates and the ETA")
+    parser.add_argument("--headless",
+                        action="store_true",
+                        help="Only collect: no version prompt and no plots (e.g. under systemd)")
+    parser.add_argument("--metrics-host",
+                        default="0.0.0.0",
+                        help="Address the /metrics endpoint listens on")
+    parser.add_argument("--metrics-port",
+                        default=0, type=int,
+                        help="Serve Prometheus metrics on this port (0 disables the endpoint)")
+    parser.add_argument("--recent-samples",
+                        default=8640, type=int,
+                        help="Process samples kept in memory for the metrics endpoint (8640 = 24h at 10s)")
+    parser.add_argument("--group-interval",
+                        default=30.0, type=float,
+                        help="Seconds between samples of all processes in --roles (0 disables them)")
+    parser.add_argument("--roles",
+                        default=",".join(ROLES),
+                        help="Comma-separated process roles to account for")
+    parser.add_argument("--node-pattern",
+                        default="cardano-node",
+                        help="Process name of cardano-node")
+    parser.add_argument("--pg-app-names",
+                        default="",
+                        help="application_name values of db-sync's Postgres connections "
+                             "(default: match by client port, which misses Unix-socket connections)")
+    parser.add_argument("--pg-data-dir",
+                        help="Postgres data directory; I/O of its block device is recorded")
+    parser.add_argument("--ledger-state-dir",
+                        help="db-sync --state-dir; I/O of its block device is recorded")
+    parser.add_argument("--stats-interval",
+                        default=60.0, type=float,
+                        help="Seconds between stage latency summaries in the log and collector_stats (0 disables them)")
+    parser.add_argument("--size-interval",
+                        default=600.0, type=float,
+                        help="Seconds between estimated table/index/TOAST sizes (0 disables them); "
+                             "SIGHUP records exact sizes")
+    parser.add_argument("--profile-seconds",
+                        default=60.0, type=float,
+                        help="How long collectors are profiled after SIGUSR1")
+    parser.add_argument("--stall-samples",
+                        default=DEFAULT_STALL_SAMPLES, type=int,
+                        help="Tip samples without slot progress reported as a sync stall (0 disables it)")
+    parser.add_argument("--leak-mb-per-hour",
+                        default=DEFAULT_LEAK_MB_PER_HOUR, type=float,
+                        help="Sustained RSS growth in MB/h reported as a memory leak (0 disables it)")
     return parser.parse_args()
 
 
@@ -271,7 +633,36 @@ if __name__ == "__main__":
         pg_host=args.pg_host,
         pg_port=args.pg_port,
         pg_user=args.pg_user,
-        pg_dbname=pg_dbname
+        pg_dbname=pg_dbname,
+        sample_interval=args.sample_interval,
+        flush_interval=args.flush_interval,
+        batch_size=args.batch_size,
+        max_points=args.max_points,
+        downsample=args.downsample,
+        webgl=args.webgl,
+        raw_retention_days=args.raw_retention_days,
+        minute_retention_days=args.minute_retention_days,
+        compact_interval=args.compact_interval,
+        sampler_backend=args.sampler,
+        tip_interval=args.tip_interval,
+        pg_stats_interval=args.pg_stats_interval,
+        pg_stats_tables=tuple(t.strip() for t in args.pg_stats_tables.split(",") if t.strip()),
+        rate_halflife=args.rate_halflife,
+        headless=args.headless,
+        metrics_host=args.metrics_host,
+        metrics_port=args.metrics_port,
+        recent_samples=args.recent_samples,
+        group_interval=args.group_interval,
+        roles=tuple(r.strip() for r in args.roles.split(",") if r.strip()),
+        node_pattern=args.node_pattern,
+        pg_app_names=tuple(n.strip() for n in args.pg_app_names.split(",") if n.strip()),
+        pg_data_dir=args.pg_data_dir,
+        ledger_state_dir=args.ledger_state_dir,
+        stats_interval=args.stats_interval,
+        profile_seconds=args.profile_seconds,
+        size_interval=args.size_interval,
+        stall_samples=args.stall_samples,
+        leak_mb_per_hour=args.leak_mb_per_hour
     )
     monitor.run()
 
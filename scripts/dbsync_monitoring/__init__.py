@@ -0,0 +1,5 @@
+"""Shared building blocks for the db-sync monitoring scripts.
+
+Submodules are imported explicitly by the scripts that need them so the
+collector does not pay for plotting or analysis imports it never uses.
+"""
@@ -0,0 +1,187 @@
+"""Slot-aligned comparison of db-sync versions: common slot grid, per-range deltas and summary tables."""
+import json
+import os
+from collections.abc import Sequence
+
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from pandas import DataFrame
+
+FloatArray = npt.NDArray[np.float64]
+
+DEFAULT_GRID_POINTS = 2000
+DEFAULT_SLOT_RANGES = 10
+# Slots per epoch since Shelley on mainnet, preprod and preview.
+EPOCH_SLOTS = 432_000
+
+
+def _series(df: DataFrame, column: str) -> tuple[FloatArray, FloatArray]:
+    """Slots in increasing order and ``column`` averaged over repeated slots, missing values dropped."""
+    x = df["slot_no"].to_numpy(np.float64)
+    y = df[column].to_numpy(np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order]
+    slots, start, counts = np.unique(x, return_index=True, return_counts=True)
+    if len(slots) == len(x):
+        return x, y
+    return slots, np.add.reduceat(y, start) / counts
+
+
+def slot_grid(df: DataFrame, n_points: int = DEFAULT_GRID_POINTS) -> FloatArray:
+    """Evenly spaced slots over the range every version of ``df`` covers; empty when they do not overlap."""
+    bounds = df.dropna(subset=["slot_no"]).groupby("version", sort=False)["slot_no"].agg(["min", "max"])
+    if bounds.empty:
+        return np.empty(0)
+    lo, hi = float(bounds["min"].max()), float(bounds["max"].min())
+    if hi < lo:
+        return np.empty(0)
+    return np.linspace(lo, hi, n_points) if hi > lo else np.array([lo])
+
+
+def align(df: DataFrame, column: str, grid: FloatArray) -> DataFrame:
+    """``column`` of every version linearly interpolated at the slots of ``grid``.
+
+    Returns one row per grid slot, a ``slot_no`` column and one column per
+    version; slots outside a version's samples are NaN.
+    """
+    aligned = {"slot_no": grid}
+    for version, g in df.groupby("version", sort=False):
+        x, y = _series(g, column)
+        aligned[str(version)] = (np.interp(grid, x, y, left=np.nan, right=np.nan) if len(x)
+                                 else np.full(len(grid), np.nan))
+    return pd.DataFrame(aligned)
+
+
+def deltas(aligned: DataFrame, baseline: str) -> DataFrame:
+    """Difference of every other version to ``baseline`` at each grid slot, long format ``slot_no, delta, version``."""
+    others = [c for c in aligned.columns if c not in ("slot_no", baseline)]
+    diff = aligned[others].sub(aligned[baseline], axis=0).assign(slot_no=aligned["slot_no"])
+    return diff.melt(id_vars="slot_no", var_name="version", value_name="delta")
+
+
+def range_deltas(aligned: dict[str, DataFrame], baseline: str,
+                 n_ranges: int = DEFAULT_SLOT_RANGES) -> DataFrame:
+    """Mean of every metric per version over ``n_ranges`` equal slot ranges, with its delta to ``baseline``.
+
+    ``aligned`` maps metric names to ``align`` output on the same grid;
+    metrics without samples of ``baseline`` are left out.
+    """
+    columns = ["slot_from", "slot_to", "metric", "version", "mean", "delta", "delta_percent"]
+    frames = []
+    for metric, df in aligned.items():
+        if df.empty:
+            continue
+        grid = df["slot_no"].to_numpy(np.float64)
+        edges = np.linspace(grid[0], grid[-1], n_ranges + 1)
+        bins = np.clip(np.searchsorted(edges, grid, side="right") - 1, 0, n_ranges - 1)
+        means = df.drop(columns="slot_no").groupby(bins).mean()
+        if baseline not in means:
+            continue
+        base = means[baseline]
+        long = means.assign(slot_from=edges[means.index], slot_to=edges[means.index + 1]).melt(
+            id_vars=["slot_from", "slot_to"], var_name="version", value_name="mean")
+        base_long = np.tile(base.to_numpy(np.float64), len(means.columns))
+        frames.append(long.assign(
+            metric=metric,
+            delta=long["mean"] - base_long,
+            delta_percent=100.0 * (long["mean"] - base_long) / np.where(base_long != 0, base_long, np.nan),
+        )[columns])
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _consumed(cumulative: FloatArray) -> float:
+    """Total increase of a cumulative counter that restarts from zero when the process restarts."""
+    d = np.diff(cumulative)
+    return float(np.where(d >= 0, d, cumulative[1:]).sum())
+
+
+def time_to_slots(df: DataFrame, slots: Sequence[int]) -> dict[int, float | None]:
+    """Seconds from the first sample of ``df`` until ``slot_no`` first reached each of ``slots``."""
+    df = df.dropna(subset=["ts_ms", "slot_no"]).sort_values("ts_ms")
+    if df.empty:
+        return {s: None for s in slots}
+    ts = df["ts_ms"].to_numpy(np.float64)
+    reached = np.maximum.accumulate(df["slot_no"].to_numpy(np.float64))
+    idx = np.searchsorted(reached, np.asarray(slots, dtype=np.float64), side="left")
+    return {s: (ts[i] - ts[0]) / 1000.0 if i < len(ts) else None for s, i in zip(slots, idx)}
+
+
+def summarize(mem_df: DataFrame, cpu_df: DataFrame, cpu_time_df: DataFrame, peaks: dict[str, float],
+              milestones: Sequence[int] = (), epoch_slots: int = EPOCH_SLOTS,
+              replay_peaks: dict[str, float] | None = None) -> DataFrame:
+    """One row of headline numbers per version.
+
+    ``peaks`` holds the peak RSS per version (from the ``max`` of the rollup
+    tiers, so it survives downsampling), ``replay_peaks`` the same during
+    replay; CPU percentiles come from the loaded samples. CPU seconds per epoch are user+system seconds spent per
+    ``epoch_slots`` slots synced. ``reach_<slot>_s`` columns hold the seconds
+    from the first sample until the version first reached each milestone slot.
+    Versions without memory samples get no row.
+    """
+    columns = ["version", "peak_rss_mb", "replay_peak_rss_mb", "cpu_p50_percent", "cpu_p95_percent", "cpu_s_per_epoch",
+               "slot_min", "slot_max", "duration_s", *(f"reach_{slot}_s" for slot in milestones)]
+    cpu_groups = dict(tuple(cpu_df.groupby("version", sort=False)))
+    time_groups = dict(tuple(cpu_time_df.groupby("version", sort=False)))
+    rows = []
+    for version, mem in mem_df.groupby("version", sort=False):
+        row: dict[str, object] = {"version": version, "peak_rss_mb": peaks.get(str(version)),
+                                  "replay_peak_rss_mb": (replay_peaks or {}).get(str(version))}
+        cpu = cpu_groups.get(version)
+        percentiles = (cpu["cpu_percent"].quantile([0.5, 0.95]).tolist() if cpu is not None
+                       else [np.nan, np.nan])
+        row["cpu_p50_percent"], row["cpu_p95_percent"] = percentiles
+        times = time_groups.get(version)
+        row["cpu_s_per_epoch"] = None
+        if times is not None and len(times) > 1:
+            times = times.dropna(subset=["cpu_s", "slot_no"]).sort_values("ts_ms")
+            slots = times["slot_no"].to_numpy(np.float64)
+            if len(slots) > 1 and slots.max() > slots[0]:
+                cpu_s = _consumed(times["cpu_s"].to_numpy(np.float64))
+                row["cpu_s_per_epoch"] = cpu_s * epoch_slots / (slots.max() - slots[0])
+        row["slot_min"], row["slot_max"] = mem["slot_no"].min(), mem["slot_no"].max()
+        ts = mem["ts_ms"].dropna()
+        row["duration_s"] = (ts.max() - ts.min()) / 1000.0 if len(ts) else None
+        for slot, seconds in time_to_slots(mem, milestones).items():
+            row[f"reach_{slot}_s"] = seconds
+        rows.append(row)
+    return pd.DataFrame(rows, columns=columns)
+
+
+def phase_seconds(phases: DataFrame, ends: dict[str, float]) -> DataFrame:
+    """Runs and seconds spent in every phase per version, from ``queries.load_phases`` output.
+
+    Each phase lasts until the next change of its version, the last one
+    until ``ends[version]`` (ms).
+    """
+    if phases.empty:
+        return pd.DataFrame(columns=["version", "runs"])
+    phases = phases.sort_values("ts_ms")
+    end = phases.groupby("version")["ts_ms"].shift(-1).fillna(phases["version"].map(ends))
+    seconds = phases.assign(seconds=(end - phases["ts_ms"]).clip(lower=0) / 1000.0)
+    table = seconds.pivot_table(index="version", columns="phase", values="seconds", aggfunc="sum", fill_value=0.0)
+    table.columns = [f"{phase}_s" for phase in table.columns]
+    runs = phases.groupby("version")["run_id"].nunique().rename("runs")
+    return table.join(runs).reset_index()
+
+
+def _records(df: DataFrame) -> list[dict[str, object]]:
+    """Rows of ``df`` with NaN as ``None`` so they serialize to valid JSON."""
+    return [{k: (None if isinstance(v, float) and np.isnan(v) else v) for k, v in row.items()}
+            for row in df.astype(object).to_dict("records")]
+
+
+def write_reports(stem: str, baseline: str, summary: DataFrame, ranges: DataFrame) -> list[str]:
+    """Write ``<stem>_summary.csv``, ``<stem>_slot_ranges.csv`` and both tables in ``<stem>_summary.json``."""
+    os.makedirs(os.path.dirname(stem) or ".", exist_ok=True)
+    paths = [f"{stem}_summary.csv", f"{stem}_slot_ranges.csv", f"{stem}_summary.json"]
+    summary.to_csv(paths[0], index=False)
+    ranges.to_csv(paths[1], index=False)
+    with open(paths[2], "w") as f:
+        json.dump({"baseline": baseline, "summary": _records(summary), "slot_ranges": _records(ranges)},
+                  f, indent=2, default=lambda o: o.item())
+    return paths
@@ -0,0 +1,176 @@
+"""Online detection of memory leaks, sync stalls, rollbacks and throughput changes, O(1) per sample."""
+import math
+from dataclasses import dataclass
+
+DEFAULT_STALL_SAMPLES = 30
+DEFAULT_LEAK_MB_PER_HOUR = 100.0
+# Half-life of the RSS regressions: older samples weigh less, so a fit follows the last few hours.
+LEAK_HALFLIFE_S = 3 * 3600.0
+LEAK_MIN_R2 = 0.8
+
+
+@dataclass(frozen=True)
+class Event:
+    """Something the collector noticed; ``value`` is in the unit ``kind`` implies (MB/h, slots, seconds)."""
+    kind: str
+    ts: float
+    slot_no: int
+    value: float
+    message: str
+
+
+class StallDetector:
+    """Tip samples where the slot stops moving or moves backwards.
+
+    Emits ``stall`` once the slot stayed the same for ``samples`` tip
+    samples, ``stall_end`` (with the stall's seconds) when it moves again and
+    ``rollback`` (with the depth in slots) whenever it decreases.
+    """
+
+    def __init__(self, samples: int = DEFAULT_STALL_SAMPLES) -> None:
+        self.samples = samples
+        self._slot: int | None = None
+        self._since = 0.0
+        self._flat = 0
+        self._stalled = False
+
+    def update(self, ts: float, slot: int) -> list[Event]:
+        events = []
+        last, self._slot = self._slot, slot
+        if last is None or slot != last:
+            if self._stalled:
+                events.append(Event('stall_end', ts, slot, ts - self._since,
+                                    f"Sync resumed at slot {slot} after {ts - self._since:.0f}s"))
+            if last is not None and slot < last:
+                events.append(Event('rollback', ts, slot, last - slot,
+                                    f"Rollback from slot {last} to {slot} ({last - slot} slots)"))
+            self._since, self._flat, self._stalled = ts, 0, False
+            return events
+        self._flat += 1
+        if not self._stalled and self.samples > 0 and self._flat >= self.samples:
+            self._stalled = True
+            events.append(Event('stall', ts, slot, ts - self._since,
+                                f"Sync stalled at slot {slot} for {ts - self._since:.0f}s"))
+        return events
+
+
+class ThroughputChangeDetector:
+    """Two-sided CUSUM on slots/s between tip samples, standardized by its EWMA mean and deviation.
+
+    Emits ``throughput_drop`` or ``throughput_rise`` (with the new slots/s)
+    when the cumulative deviation exceeds ``threshold`` deviations, then
+    re-baselines on the new level. ``drift`` deviations per sample are
+    tolerated as noise.
+    """
+
+    def __init__(self, threshold: float = 8.0, drift: float = 0.5, halflife: float = 30.0,
+                 warmup: int = 20) -> None:
+        self.threshold = threshold
+        self.drift = drift
+        self.alpha = 1.0 - 0.5 ** (1.0 / halflife)
+        self.warmup = warmup
+        self._last: tuple[float, int] | None = None
+        self._mean = 0.0
+        self._var = 0.0
+        self._n = 0
+        self._high = 0.0
+        self._low = 0.0
+
+    def update(self, ts: float, slot: int) -> list[Event]:
+        last, self._last = self._last, (ts, slot)
+        if last is None or ts <= last[0] or slot < last[1]:
+            return []
+        rate = (slot - last[1]) / (ts - last[0])
+        self._n += 1
+        if self._n == 1:
+            self._mean = rate
+            return []
+        std = max(math.sqrt(self._var), 0.01 * abs(self._mean), 1e-6)
+        z = (rate - self._mean) / std
+        diff = rate - self._mean
+        self._mean += self.alpha * diff
+        self._var = (1.0 - self.alpha) * (self._var + self.alpha * diff * diff)
+        if self._n < self.warmup:
+            return []
+        self._high = max(0.0, self._high + z - self.drift)
+        self._low = max(0.0, self._low - z - self.drift)
+        if self._high <= self.threshold and self._low <= self.threshold:
+            return []
+        kind = 'throughput_rise' if self._high > self.threshold else 'throughput_drop'
+        before = self._mean
+        self._high = self._low = 0.0
+        self._mean, self._var, self._n = rate, 0.0, 1
+        return [Event(kind, ts, slot, rate, f"Sync throughput changed from {before:.1f} to {rate:.1f} slots/s")]
+
+
+class _Regression:
+    """Exponentially weighted least squares of y on x, from decayed sums."""
+
+    __slots__ = ('halflife', 'sw', 'sx', 'sxx', 'sxy', 'sy', 'syy')
+
+    def __init__(self, halflife: float) -> None:
+        self.halflife = halflife
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = self.syy = 0.0
+
+    def update(self, x: float, y: float, dt: float) -> None:
+        decay = 0.5 ** (dt / self.halflife)
+        self.sw = self.sw * decay + 1.0
+        self.sx = self.sx * decay + x
+        self.sy = self.sy * decay + y
+        self.sxx = self.sxx * decay + x * x
+        self.sxy = self.sxy * decay + x * y
+        self.syy = self.syy * decay + y * y
+
+    def fit(self) -> tuple[float, float] | None:
+        """Slope and r², ``None`` while x or y has no spread."""
+        var_x = self.sw * self.sxx - self.sx * self.sx
+        var_y = self.sw * self.syy - self.sy * self.sy
+        cov = self.sw * self.sxy - self.sx * self.sy
+        if var_x <= 1e-12 or var_y <= 1e-12:
+            return None
+        return cov / var_x, cov * cov / (var_x * var_y)
+
+
+class LeakDetector:
+    """Sustained RSS growth, from weighted regressions of RSS on time and on slot.
+
+    Emits ``leak`` (with MB/hour) once RSS has grown faster than
+    ``mb_per_hour`` with r² of at least ``LEAK_MIN_R2`` over at least one
+    half-life, and again only after the growth fell below half the limit.
+    Time is in hours and slots in millions since the first sample, which
+    keeps the sums well conditioned.
+    """
+
+    def __init__(self, mb_per_hour: float = DEFAULT_LEAK_MB_PER_HOUR,
+                 halflife_s: float = LEAK_HALFLIFE_S) -> None:
+        self.mb_per_hour = mb_per_hour
+        self.halflife_s = halflife_s
+        self._by_time = _Regression(halflife_s / 3600.0)
+        self._by_slot = _Regression(halflife_s / 3600.0)
+        self._origin: tuple[float, int] | None = None
+        self._last_ts = 0.0
+        self._alarm = False
+
+    def update(self, ts: float, slot: int, rss: float) -> list[Event]:
+        if self._origin is None:
+            self._origin = (ts, slot)
+            self._last_ts = ts
+        dt_h = max(ts - self._last_ts, 0.0) / 3600.0
+        self._last_ts = ts
+        hours = (ts - self._origin[0]) / 3600.0
+        self._by_time.update(hours, rss, dt_h)
+        self._by_slot.update((slot - self._origin[1]) / 1e6, rss, dt_h)
+        fit = self._by_time.fit()
+        if self.mb_per_hour <= 0 or fit is None or ts - self._origin[0] < self.halflife_s:
+            return []
+        slope, r2 = fit
+        if self._alarm:
+            self._alarm = slope >= self.mb_per_hour / 2
+            return []
+        if slope < self.mb_per_hour or r2 < LEAK_MIN_R2:
+            return []
+        self._alarm = True
+        by_slot = self._by_slot.fit()
+        per_slots = f", {by_slot[0]:.1f} MB per 1M slots" if by_slot is not None else ""
+        return [Event('leak', ts, slot, slope,
+                      f"RSS growing {slope:.1f} MB/h (r²={r2:.2f}{per_slots}), now {rss:.0f} MB")]
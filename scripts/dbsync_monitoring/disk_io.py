@@ -0,0 +1,99 @@
+"""Block-device I/O from ``/proc/diskstats`` and per-interval counter deltas."""
+import os
+import time
+from collections.abc import Mapping
+
+from dbsync_monitoring.proc_sampler import ProcFile
+
+SECTOR_SIZE = 512  # diskstats always counts 512-byte sectors
+
+
+def device_for_path(path: str) -> str | None:
+    """Name in ``/proc/diskstats`` of the block device holding ``path`` (e.g. ``nvme0n1p2``, ``dm-0``)."""
+    try:
+        dev = os.stat(path).st_dev
+        link = os.readlink(f'/sys/dev/block/{os.major(dev)}:{os.minor(dev)}')
+    except OSError:
+        # Network, overlay and btrfs subvolume mounts have no block device of their own.
+        return None
+    return os.path.basename(link)
+
+
+class CounterDelta:
+    """Difference of cumulative counters between consecutive calls.
+
+    The first call only records a baseline. A counter that went backwards
+    (process restart, device reset) yields ``None`` for that interval.
+    """
+
+    def __init__(self) -> None:
+        self._last: tuple[float, Mapping[str, int]] | None = None
+
+    def reset(self) -> None:
+        self._last = None
+
+    def update(self, counters: Mapping[str, int]) -> tuple[float, dict[str, int | None]] | None:
+        now = time.monotonic()
+        last, self._last = self._last, (now, counters)
+        if last is None:
+            return None
+        then, previous = last
+        deltas: dict[str, int | None] = {}
+        for name, value in counters.items():
+            prev = previous.get(name)
+            deltas[name] = value - prev if prev is not None and value >= prev else None
+        return now - then, deltas
+
+
+class DiskStats:
+    """Per-interval reads, writes, bytes and busy time of selected devices.
+
+    ``devices`` maps labels (e.g. ``postgres``, ``ledger-state``) to the
+    directories they live in; labels sharing a device are reported once,
+    joined with a comma.
+    """
+
+    def __init__(self, devices: Mapping[str, str]) -> None:
+        by_device: dict[str, list[str]] = {}
+        for label, path in devices.items():
+            device = device_for_path(path)
+            if device is None:
+                print(f"No block device found for {label} ({path}); its disk I/O is not recorded")
+                continue
+            by_device.setdefault(device, []).append(label)
+        self.labels = {device: ','.join(labels) for device, labels in by_device.items()}
+        self._file = ProcFile('/proc/diskstats', 8192) if self.labels else None
+        self._deltas = {device: CounterDelta() for device in self.labels}
+
+    def _read(self, file: ProcFile) -> dict[str, dict[str, int]]:
+        counters = {}
+        for line in file.read().split(b'\n'):
+            fields = line.split()
+            if len(fields) < 14:
+                continue
+            device = fields[2].decode()
+            if device in self.labels:
+                counters[device] = {
+                    'reads': int(fields[3]),
+                    'read_bytes': int(fields[5]) * SECTOR_SIZE,
+                    'writes': int(fields[7]),
+                    'write_bytes': int(fields[9]) * SECTOR_SIZE,
+                    'busy_ms': int(fields[12]),
+                }
+        return counters
+
+    def collect(self) -> list[dict[str, object]]:
+        """One row per device with ``interval_s`` and counter deltas; empty on the first call."""
+        if self._file is None:
+            return []
+        rows: list[dict[str, object]] = []
+        for device, counters in self._read(self._file).items():
+            delta = self._deltas[device].update(counters)
+            if delta is not None:
+                interval, values = delta
+                rows.append({'device': device, 'label': self.labels[device], 'interval_s': interval, **values})
+        return rows
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
@@ -0,0 +1,70 @@
+"""Shape-preserving downsampling of long metric series."""
+from typing import Literal
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+IndexArray = npt.NDArray[np.intp]
+Method = Literal["lttb", "minmax"]
+
+DEFAULT_MAX_POINTS = 5000
+
+
+def lttb_indices(x: FloatArray, y: FloatArray, n_out: int) -> IndexArray:
+    """Largest-Triangle-Three-Buckets: pick the point per bucket spanning the largest triangle."""
+    size = len(x)
+    if n_out >= size or n_out < 3:
+        return np.arange(size)
+
+    idx = np.empty(n_out, dtype=np.intp)
+    idx[0], idx[-1] = 0, size - 1
+    # n_out - 2 buckets over the interior points; first and last points are always kept.
+    edges = np.linspace(1, size - 1, n_out - 1).astype(np.intp)
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+
+def minmax_indices(y: FloatArray, n_out: int) -> IndexArray:
+    """Keep the minimum and maximum of each bucket so no spike is lost."""
+    size = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_out >= size or n_buckets < 1:
+        return np.arange(size)
+
+    bucket = np.arange(size) * n_buckets // size
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, np.diff(bucket[order]) != 0])
+    ends = np.r_[starts[1:], size] - 1
+    keep = np.concatenate(([0, size - 1], order[starts], order[ends]))
+    return np.unique(keep)
+
+
+def downsample(x: npt.ArrayLike, y: npt.ArrayLike, max_points: int = DEFAULT_MAX_POINTS,
+               method: Method = "lttb") -> tuple[FloatArray, FloatArray]:
+    """Reduce a series to at most ``max_points`` points; ``max_points <= 0`` disables it.
+
+    Samples with a missing x or y value are dropped first.
+    """
+    xs = np.asarray(x, dtype=np.float64)
+    ys = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(xs) & np.isfinite(ys)
+    if not finite.all():
+        xs, ys = xs[finite], ys[finite]
+    if max_points <= 0 or len(xs) <= max_points:
+        return xs, ys
+    idx = lttb_indices(xs, ys, max_points) if method == "lttb" else minmax_indices(ys, max_points)
+    return xs[idx], ys[idx]
@@ -0,0 +1,100 @@
+"""Slot to epoch mapping and per-epoch attribution of the monitor's resource samples."""
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+from pandas import DataFrame
+
+FloatArray = npt.NDArray[np.float64]
+IntArray = npt.NDArray[np.int64]
+
+# Rewards earned in epoch N are inserted while db-sync crosses into epoch N+2.
+REWARD_INSERT_LAG = 2
+
+ATTRIBUTION_COLUMNS = [
+    "epoch_no", "samples", "monitor_s", "cpu_s", "mean_rss_mb", "peak_rss_mb", "read_mb", "write_mb",
+    "sync_secs", "tx_count", "reward_count", "cpu_s_per_1k_tx", "sync_s_per_1k_tx",
+    "cpu_s_per_1k_rewards", "sync_s_per_1k_rewards",
+]
+
+
+class EpochIndex:
+    """Epoch of any slot, from the first and last block slot of every epoch.
+
+    Slots between the last block of one epoch and the first of the next
+    belong to the earlier epoch; slots before the first known epoch map to -1.
+    """
+
+    def __init__(self, boundaries: DataFrame) -> None:
+        b = boundaries.dropna(subset=["start_slot"]).sort_values("start_slot")
+        self.epochs: IntArray = b["epoch_no"].to_numpy(np.int64)
+        self.start_slots: FloatArray = b["start_slot"].to_numpy(np.float64)
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def epoch_of(self, slots: npt.ArrayLike) -> IntArray:
+        i = np.searchsorted(self.start_slots, np.asarray(slots, dtype=np.float64), side="right") - 1
+        return np.where(i >= 0, self.epochs[np.clip(i, 0, None)], -1)
+
+
+def increments(cumulative: FloatArray) -> FloatArray:
+    """Per-sample increase of a cumulative counter; a drop means a restart from zero."""
+    d = np.diff(cumulative, prepend=np.nan)
+    return np.where(np.isnan(d), 0.0, np.where(d >= 0, d, cumulative))
+
+
+def _per_sample(df: DataFrame, index: EpochIndex) -> DataFrame:
+    df = df.dropna(subset=["ts_ms", "slot_no"]).sort_values("ts_ms", ignore_index=True)
+    return df.assign(epoch_no=index.epoch_of(df["slot_no"]))
+
+
+def _steady(df: DataFrame) -> DataFrame:
+    return df[df["phase"] != "replay"] if "phase" in df else df
+
+
+def _per_1k(value: pd.Series, count: pd.Series) -> pd.Series:
+    return (1000.0 * value / count).where(count > 0)
+
+
+def attribute(index: EpochIndex, mem: DataFrame, cpu: DataFrame, io: DataFrame,
+              epoch_stats: DataFrame) -> DataFrame:
+    """Resources spent by db-sync while its tip was in each epoch, next to that epoch's chain stats.
+
+    ``mem`` has ``ts_ms, slot_no, rss, rss_max``, ``cpu`` ``ts_ms, slot_no,
+    cpu_s`` (cumulative user+system seconds) and ``io`` ``ts_ms, slot_no,
+    read_bytes, write_bytes`` per interval. The time and CPU between two
+    samples count towards the epoch of the later one. ``epoch_stats`` are
+    the per-epoch counts of create-db-sync-stats; cost per 1000 rewards
+    uses the rewards earned ``REWARD_INSERT_LAG`` epochs earlier, which are
+    the ones inserted during the epoch. Rows tagged with the ``replay``
+    phase (``queries.with_phases``) are left out, so slots synced again
+    after a restart or rollback are not counted twice.
+    """
+    frames = []
+    if not mem.empty:
+        m = _per_sample(mem, index)
+        m = _steady(m.assign(monitor_s=np.diff(m["ts_ms"].to_numpy(np.float64), prepend=np.nan) / 1000.0))
+        frames.append(m.groupby("epoch_no").agg(samples=("rss", "size"), monitor_s=("monitor_s", "sum"),
+                                                mean_rss_mb=("rss", "mean"), peak_rss_mb=("rss_max", "max")))
+    if not cpu.empty:
+        c = _per_sample(cpu, index)
+        c = _steady(c.assign(cpu_s=increments(c["cpu_s"].to_numpy(np.float64))))
+        frames.append(c.groupby("epoch_no").agg(cpu_s=("cpu_s", "sum")))
+    if not io.empty:
+        i = _steady(_per_sample(io, index))
+        frames.append(i.groupby("epoch_no").agg(read_mb=("read_bytes", "sum"), write_mb=("write_bytes", "sum"))
+                      / 1048576.0)
+    if not frames:
+        return pd.DataFrame(columns=ATTRIBUTION_COLUMNS)
+
+    stats = epoch_stats.set_index("epoch_no")
+    rewards = stats["reward_count"].rename(lambda e: e + REWARD_INSERT_LAG)
+    df = pd.concat(frames, axis=1).drop(index=-1, errors="ignore")
+    df = df.join(stats[["sync_secs", "tx_count"]]).join(rewards)
+    df = df.assign(
+        cpu_s_per_1k_tx=_per_1k(df["cpu_s"], df["tx_count"]) if "cpu_s" in df else np.nan,
+        sync_s_per_1k_tx=_per_1k(df["sync_secs"], df["tx_count"]),
+        cpu_s_per_1k_rewards=_per_1k(df["cpu_s"], df["reward_count"]) if "cpu_s" in df else np.nan,
+        sync_s_per_1k_rewards=_per_1k(df["sync_secs"], df["reward_count"]),
+    )
+    return df.rename_axis("epoch_no").reset_index().reindex(columns=ATTRIBUTION_COLUMNS)
@@ -0,0 +1,154 @@
+"""Prometheus text-format ``/metrics`` endpoint served from in-memory state."""
+import math
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dbsync_monitoring.proc_sampler import MB
+from dbsync_monitoring.ring_buffer import FloatArray, RingBuffer
+from dbsync_monitoring.stage_timer import BUCKETS, Histogram
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@dataclass(frozen=True)
+class Metric:
+    """An exported value: ``column`` of the recent-samples buffer times ``scale``."""
+    name: str
+    kind: str
+    help: str
+    column: str
+    scale: float = 1.0
+
+
+METRICS = (
+    Metric('dbsync_process_up', 'gauge', 'Whether a cardano-db-sync process was found at the last sample', 'up'),
+    Metric('dbsync_process_rss_bytes', 'gauge', 'Resident set size of cardano-db-sync', 'rss', MB),
+    Metric('dbsync_process_uss_bytes', 'gauge', 'Unique set size of cardano-db-sync', 'uss', MB),
+    Metric('dbsync_process_pss_bytes', 'gauge', 'Proportional set size of cardano-db-sync', 'pss', MB),
+    Metric('dbsync_process_cpu_percent', 'gauge', 'CPU usage of cardano-db-sync over the last sample interval',
+           'cpu_percent'),
+    Metric('dbsync_process_cpu_seconds_total', 'counter', 'User plus system CPU time of cardano-db-sync',
+           'cpu_seconds'),
+    Metric('dbsync_process_context_switches_total', 'counter', 'Voluntary plus involuntary context switches',
+           'ctx_switches'),
+    Metric('dbsync_process_read_bytes_total', 'counter', 'Bytes cardano-db-sync caused to be read from storage',
+           'read_bytes'),
+    Metric('dbsync_process_write_bytes_total', 'counter', 'Bytes cardano-db-sync caused to be written to storage',
+           'write_bytes'),
+    Metric('dbsync_tip_up', 'gauge', 'Whether the last tip query of the db-sync database succeeded', 'tip_up'),
+    Metric('dbsync_tip_age_seconds', 'gauge', 'Seconds since the tip was last read, at the last sample', 'tip_age_s'),
+    Metric('dbsync_tip_slot', 'gauge', 'Slot of the newest block in the db-sync database', 'slot_no'),
+    Metric('dbsync_tip_block', 'gauge', 'Block number of the newest block in the db-sync database', 'block_no'),
+    Metric('dbsync_sync_percent', 'gauge', 'Sync progress of the db-sync database', 'sync_percent'),
+    Metric('dbsync_sync_slots_per_second', 'gauge', 'EWMA of slots synced per second', 'slots_per_s'),
+    Metric('dbsync_sync_blocks_per_second', 'gauge', 'EWMA of blocks synced per second', 'blocks_per_s'),
+    Metric('dbsync_sync_tx_per_second', 'gauge', 'EWMA of transactions synced per second', 'tx_per_s'),
+    Metric('dbsync_sync_cpu_seconds_per_1k_slots', 'gauge', 'EWMA of CPU seconds spent per 1000 slots',
+           'cpu_s_per_1k_slots'),
+    Metric('dbsync_sync_eta_seconds', 'gauge', 'Estimated seconds until the tip reaches the current time', 'eta_s'),
+    Metric('dbsync_monitor_last_sample_timestamp_seconds', 'gauge', 'Unix time of the last process sample', 'ts'),
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def render(row: FloatArray, columns: Mapping[str, int], labels: Mapping[str, str]) -> bytes:
+    """Exposition text for every metric in ``METRICS`` whose column in ``row`` is set."""
+    label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    lines = []
+    for m in METRICS:
+        i = columns.get(m.column)
+        if i is None or math.isnan(row[i]):
+            continue
+        lines += [
+            f'# HELP {m.name} {m.help}',
+            f'# TYPE {m.name} {m.kind}',
+            f'{m.name}{{{label_str}}} {_format(float(row[i]) * m.scale)}',
+        ]
+    return ('\n'.join(lines) + '\n').encode() if lines else b''
+
+
+def render_stages(stages: Mapping[str, Histogram], labels: Mapping[str, str]) -> bytes:
+    """Exposition text of the collector's per-stage duration histograms."""
+    if not stages:
+        return b''
+    name = 'dbsync_monitor_stage_duration_seconds'
+    lines = [f'# HELP {name} Duration of each collection stage of the monitor', f'# TYPE {name} histogram']
+    for stage, hist in sorted(stages.items()):
+        label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in {**labels, 'stage': stage}.items())
+        cumulative = 0
+        for bound, n in zip((*BUCKETS, math.inf), hist.counts, strict=True):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{label_str},le="{_format(bound)}"}} {cumulative}')
+        lines += [
+            f'{name}_sum{{{label_str}}} {_format(hist.total)}',
+            f'{name}_count{{{label_str}}} {hist.count}',
+        ]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: '_Server'
+    protocol_version = 'HTTP/1.1'
+    # Buffer headers and body into one send; separate small writes stall on Nagle + delayed ACK.
+    wbufsize = -1
+
+    def do_GET(self) -> None:
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.exporter.page
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    exporter: 'MetricsExporter'
+
+
+class MetricsExporter:
+    """Serve the newest sample of a recent-samples buffer at ``/metrics``.
+
+    The collector calls ``publish()`` after appending a sample and the page
+    is rendered there, so a scrape only writes out a prebuilt byte string
+    and never touches SQLite or Postgres.
+    """
+
+    def __init__(self, host: str, port: int, labels: Mapping[str, str]) -> None:
+        self.labels = dict(labels)
+        self.page = b''
+        self.server = _Server((host, port), _Handler)
+        self.server.exporter = self
+        self._thread = threading.Thread(target=self.server.serve_forever, name='metrics-exporter', daemon=True)
+
+    def publish(self, recent: RingBuffer, stages: Mapping[str, Histogram] | None = None) -> None:
+        row = recent.latest()
+        if row is not None:
+            self.page = render(row, recent.positions, self.labels) + render_stages(stages or {}, self.labels)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self.server.shutdown()
+        self.server.server_close()
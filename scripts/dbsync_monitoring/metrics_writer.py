@@ -0,0 +1,126 @@
+"""Queue-fed SQLite writer that batches samples into few transactions."""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from typing import Any
+
+from dbsync_monitoring.stage_timer import StageTimer
+
+Row = dict[str, Any]
+Statement = tuple[str, tuple[str, ...]]
+
+# Flushes a batch is retried while the database stays locked before it is dropped.
+MAX_RETRIES = 5
+
+
+def is_transient(e: sqlite3.Error) -> bool:
+    """Whether ``e`` is a locked or busy database, which goes away by itself."""
+    message = str(e).lower()
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def open_db(db_file: str) -> sqlite3.Connection:
+    """Open the metrics database in WAL mode with relaxed fsync."""
+    conn = sqlite3.connect(db_file, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # NORMAL only fsyncs at checkpoints in WAL mode; a crash loses at most the last batch.
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class MetricsWriter(threading.Thread):
+    """Background thread that owns the only write connection to the metrics DB.
+
+    Producers call ``write`` with a table name and a column->value row; rows are flushed
+    with ``executemany`` in a single transaction once ``batch_size`` rows are
+    pending or ``flush_interval`` seconds have passed, whichever comes first.
+    ``close`` drains the queue and flushes what is left. With ``stages``,
+    every flush is timed as the ``sqlite_insert`` stage.
+
+    A batch hitting a locked database is kept and retried at the next
+    ``flush_interval``, at most ``MAX_RETRIES`` times. Any other error (e.g.
+    a missing table or column) drops only the rows of the failing statement.
+    """
+
+    def __init__(self, db_file: str, flush_interval: float = 10.0, batch_size: int = 500,
+                 stages: StageTimer | None = None) -> None:
+        super().__init__(name="metrics-writer", daemon=True)
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.stages = stages
+        self._queue: queue.Queue[tuple[str, Row] | None] = queue.Queue()
+        self._retries = 0
+
+    def write(self, table: str, row: Row) -> None:
+        self._queue.put((table, row))
+
+    def close(self, timeout: float | None = 30.0) -> None:
+        self._queue.put(None)
+        self.join(timeout)
+
+    def run(self) -> None:
+        conn = open_db(self.db_file)
+        pending: list[tuple[str, Row]] = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    pass
+                else:
+                    if item is None:
+                        break
+                    pending.append(item)
+                full = len(pending) >= self.batch_size and not self._retries
+                if full or time.monotonic() >= deadline:
+                    pending = self._flush(conn, pending)
+                    deadline = time.monotonic() + self.flush_interval
+            self._flush(conn, pending)
+        finally:
+            conn.close()
+
+    def _flush(self, conn: sqlite3.Connection, pending: list[tuple[str, Row]]) -> list[tuple[str, Row]]:
+        """Write pending rows and return the ones that must be retried."""
+        if not pending:
+            return pending
+        by_statement: dict[Statement, list[tuple[Any, ...]]] = {}
+        for table, row in pending:
+            by_statement.setdefault((table, tuple(row)), []).append(tuple(row.values()))
+        try:
+            with self.stages.stage('sqlite_insert') if self.stages else nullcontext(), conn:
+                for statement, rows in by_statement.items():
+                    self._insert(conn, statement, rows)
+        except sqlite3.Error as e:
+            if not is_transient(e):
+                self._retries = 0
+                self._flush_each(conn, by_statement)
+                return []
+            if self._retries < MAX_RETRIES:
+                self._retries += 1
+                print(f"SQLite write deferred ({self._retries}/{MAX_RETRIES}): {e}")
+                return pending
+            print(f"SQLite write failed, dropping {len(pending)} rows: {e}")
+        self._retries = 0
+        return []
+
+    def _flush_each(self, conn: sqlite3.Connection, by_statement: dict[Statement, list[tuple[Any, ...]]]) -> None:
+        """Write every statement in its own transaction, so one bad statement does not cost the others' rows."""
+        for statement, rows in by_statement.items():
+            self._insert_alone(conn, statement, rows)
+
+    def _insert_alone(self, conn: sqlite3.Connection, statement: Statement, rows: list[tuple[Any, ...]]) -> None:
+        try:
+            with conn:
+                self._insert(conn, statement, rows)
+        except sqlite3.Error as e:
+            print(f"SQLite write failed, dropping {len(rows)} rows of {statement[0]}: {e}")
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, statement: Statement, rows: list[tuple[Any, ...]]) -> None:
+        table, columns = statement
+        placeholders = ",".join("?" * len(columns))
+        conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
@@ -0,0 +1,94 @@
+"""Long-lived Postgres session with reconnect and exponential backoff."""
+import threading
+import time
+from typing import Any
+
+import psycopg2
+from psycopg2.extensions import connection as PgConnection
+
+
+class PgUnavailable(Exception):
+    """Raised while the session is backing off after a failed connect."""
+
+
+class PgSession:
+    """One persistent, autocommit connection shared by the monitor's queries.
+
+    A broken connection is dropped and re-established on the next query.
+    Failed connects are retried with exponential backoff so a restarting
+    Postgres is not hammered with a handshake every tick.
+    """
+
+    def __init__(self, host: str, port: str | int, user: str, dbname: str,
+                 application_name: str = 'db-sync-monitor',
+                 statement_timeout_ms: int = 10_000,
+                 min_backoff: float = 1.0, max_backoff: float = 60.0) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.dbname = dbname
+        self.application_name = application_name
+        self.statement_timeout_ms = statement_timeout_ms
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+
+        self._conn: PgConnection | None = None
+        self._lock = threading.Lock()
+        self._backoff = min_backoff
+        self._retry_at = 0.0
+
+    def _connection(self) -> PgConnection:
+        if self._conn is not None and not self._conn.closed:
+            return self._conn
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise PgUnavailable(f"Postgres unavailable, retrying in {self._retry_at - now:.0f}s")
+        try:
+            conn = psycopg2.connect(
+                host=self.host, port=self.port,
+                user=self.user, dbname=self.dbname,
+                application_name=self.application_name,
+                connect_timeout=10,
+                options=f"-c statement_timeout={self.statement_timeout_ms}",
+            )
+        except psycopg2.OperationalError:
+            self._retry_at = now + self._backoff
+            self._backoff = min(self._backoff * 2, self.max_backoff)
+            raise
+        # Autocommit keeps read-only probes from leaving the backend idle in transaction.
+        conn.autocommit = True
+        self._conn = conn
+        self._backoff = self.min_backoff
+        self._retry_at = 0.0
+        return conn
+
+    def _execute(self, sql: str, params: Any, fetch_all: bool) -> Any:
+        with self._lock:
+            conn = self._connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    return cur.fetchall() if fetch_all else cur.fetchone()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self._drop()
+                raise
+
+    def fetchone(self, sql: str, params: Any = None) -> tuple[Any, ...] | None:
+        row: tuple[Any, ...] | None = self._execute(sql, params, fetch_all=False)
+        return row
+
+    def fetchall(self, sql: str, params: Any = None) -> list[tuple[Any, ...]]:
+        rows: list[tuple[Any, ...]] = self._execute(sql, params, fetch_all=True)
+        return rows
+
+    def _drop(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except psycopg2.Error:
+                pass
+        self._conn = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._drop()
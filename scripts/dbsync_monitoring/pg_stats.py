@@ -0,0 +1,109 @@
+"""Postgres server-side activity, sampled as deltas between snapshots."""
+import time
+from dataclasses import dataclass
+from typing import Any
+
+from dbsync_monitoring.pg_session import PgSession
+
+# Tables db-sync inserts into the most while syncing.
+DEFAULT_TABLES = (
+    'block', 'tx', 'tx_in', 'tx_out', 'ma_tx_out', 'ma_tx_mint', 'multi_asset',
+    'datum', 'redeemer', 'tx_metadata', 'reward', 'epoch_stake',
+)
+
+# Cumulative counters; everything else in a snapshot is a gauge.
+COUNTERS = (
+    'xact_commit', 'blks_read', 'blks_hit', 'tup_inserted', 'tup_updated', 'tup_deleted',
+    'temp_bytes', 'wal_bytes', 'checkpoints', 'buffers_checkpoint', 'buffers_backend',
+    'io_read_bytes', 'io_write_bytes',
+)
+GAUGES = ('lock_waits',)
+
+
+def _server_sql(server_version: int) -> str:
+    """One-row snapshot query for the given server_version_num."""
+    if server_version >= 170000:
+        # PG 17 moved checkpoint counters to pg_stat_checkpointer and dropped buffers_backend.
+        checkpoints = "(SELECT num_timed + num_requested FROM pg_stat_checkpointer)"
+        buffers_checkpoint = "(SELECT buffers_written FROM pg_stat_checkpointer)"
+        buffers_backend = "(SELECT SUM(writes) FROM pg_stat_io WHERE backend_type = 'client backend')"
+    else:
+        checkpoints = "(SELECT checkpoints_timed + checkpoints_req FROM pg_stat_bgwriter)"
+        buffers_checkpoint = "(SELECT buffers_checkpoint FROM pg_stat_bgwriter)"
+        buffers_backend = "(SELECT buffers_backend FROM pg_stat_bgwriter)"
+    if server_version >= 160000:
+        io_read = "(SELECT SUM(reads) * current_setting('block_size')::bigint FROM pg_stat_io)"
+        io_write = "(SELECT SUM(writes + COALESCE(extends, 0)) * current_setting('block_size')::bigint FROM pg_stat_io)"
+    else:
+        io_read = io_write = "NULL"
+    return f"""
+      SELECT
+        d.xact_commit, d.blks_read, d.blks_hit,
+        d.tup_inserted, d.tup_updated, d.tup_deleted, d.temp_bytes,
+        pg_wal_lsn_diff(pg_current_wal_lsn(), '0/0') AS wal_bytes,
+        {checkpoints} AS checkpoints,
+        {buffers_checkpoint} AS buffers_checkpoint,
+        {buffers_backend} AS buffers_backend,
+        {io_read} AS io_read_bytes,
+        {io_write} AS io_write_bytes,
+        (SELECT COUNT(*) FROM pg_stat_activity WHERE wait_event_type = 'Lock') AS lock_waits
+      FROM pg_stat_database d
+      WHERE d.datname = current_database();
+    """
+
+
+TABLES_SQL = "SELECT relname, n_tup_ins FROM pg_stat_user_tables WHERE relname = ANY(%s);"
+
+
+@dataclass(frozen=True)
+class PgStatsDelta:
+    interval_s: float
+    server: dict[str, Any]
+    table_inserts: dict[str, int]
+
+
+class PgStatsCollector:
+    """Snapshot server and per-table counters and return the change since the last call.
+
+    The first call only records a baseline. A counter that went backwards
+    (stats reset, server restart) yields ``None`` for that interval.
+    """
+
+    def __init__(self, session: PgSession, tables: tuple[str, ...] = DEFAULT_TABLES) -> None:
+        self.session = session
+        self.tables = list(tables)
+        self._sql: str | None = None
+        self._last: tuple[float, dict[str, Any], dict[str, int]] | None = None
+
+    def _snapshot(self) -> tuple[float, dict[str, Any], dict[str, int]]:
+        if self._sql is None:
+            row = self.session.fetchone("SELECT current_setting('server_version_num')::int;")
+            self._sql = _server_sql(int(row[0]) if row else 0)
+        now = time.monotonic()
+        row = self.session.fetchone(self._sql)
+        server = dict(zip((*COUNTERS, *GAUGES), row or (), strict=False))
+        tables = {name: int(n) for name, n in self.session.fetchall(TABLES_SQL, (self.tables,))}
+        return now, server, tables
+
+    def collect(self) -> PgStatsDelta | None:
+        now, server, tables = self._snapshot()
+        last, self._last = self._last, (now, server, tables)
+        if last is None:
+            return None
+        then, last_server, last_tables = last
+
+        deltas: dict[str, Any] = {}
+        for name in COUNTERS:
+            cur, prev = server.get(name), last_server.get(name)
+            if cur is None or prev is None or cur < prev:
+                deltas[name] = None
+            else:
+                deltas[name] = int(cur - prev)
+        for name in GAUGES:
+            deltas[name] = server.get(name)
+        inserts = {
+            name: n - last_tables[name]
+            for name, n in tables.items()
+            if name in last_tables and n >= last_tables[name]
+        }
+        return PgStatsDelta(interval_s=now - then, server=deltas, table_inserts=inserts)
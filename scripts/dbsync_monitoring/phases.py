@@ -0,0 +1,78 @@
+"""Run and phase of db-sync (steady sync, ledger replay, stall, down) from its process identity and tip slot."""
+import threading
+
+from dbsync_monitoring.detectors import DEFAULT_STALL_SAMPLES
+
+PHASES = ('sync', 'replay', 'stall', 'down')
+
+# A process started this long before the monitor was already syncing when it was first seen.
+ATTACH_GRACE_S = 60.0
+
+ProcessIdentity = tuple[int, float]
+
+
+class PhaseTracker:
+    """Current phase of db-sync, O(1) per sample; the tip and process collectors may feed it from different threads.
+
+    - ``down``: no db-sync process;
+    - ``replay``: after db-sync (re)started or the tip slot went backwards,
+      until the slot passes the highest slot reached before; the same slots
+      are synced again, usually after replaying the ledger state;
+    - ``stall``: the slot did not move for ``stall_samples`` tip samples;
+    - ``sync``: otherwise.
+
+    A new process (PID plus create time) starts a new run. A process that
+    was already running when the monitor started is taken as syncing.
+    """
+
+    def __init__(self, started: float, stall_samples: int = DEFAULT_STALL_SAMPLES) -> None:
+        self.started = started
+        self.stall_samples = stall_samples
+        self.process: ProcessIdentity | None = None
+        self.run: ProcessIdentity | None = None
+        self.phase = 'sync'
+        self._checked = False
+        self._slot: int | None = None
+        self._high_water: int | None = None
+        self._replay_until: int | None = None
+        self._flat = 0
+        self._lock = threading.Lock()
+
+    def _phase(self) -> str:
+        if self.process is None and self._checked:
+            return 'down'
+        if self._replay_until is not None:
+            return 'replay'
+        if self.stall_samples > 0 and self._flat >= self.stall_samples:
+            return 'stall'
+        return 'sync'
+
+    def _set_phase(self) -> bool:
+        phase = self._phase()
+        changed, self.phase = phase != self.phase, phase
+        return changed
+
+    def update_process(self, identity: ProcessIdentity | None) -> tuple[bool, bool]:
+        """Feed the identity of the matched process; returns (new run, phase changed)."""
+        with self._lock:
+            new_run = identity is not None and identity != self.run
+            if new_run and identity is not None:
+                if self.run is not None or identity[1] > self.started - ATTACH_GRACE_S:
+                    self._replay_until = max(self._high_water or 0, self._slot or 0)
+                self._flat = 0
+                self.run = identity
+            self._checked = True
+            self.process = identity
+            return new_run, self._set_phase()
+
+    def update_tip(self, slot: int) -> bool:
+        """Feed the tip slot of one probe; returns whether the phase changed."""
+        with self._lock:
+            last, self._slot = self._slot, slot
+            if last is not None and slot < last:
+                self._replay_until = max(self._replay_until or 0, self._high_water or last)
+            self._flat = self._flat + 1 if slot == last else 0
+            if self._replay_until is not None and slot > self._replay_until:
+                self._replay_until = None
+            self._high_water = slot if self._high_water is None else max(self._high_water, slot)
+            return self._set_phase()
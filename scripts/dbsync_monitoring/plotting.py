@@ -0,0 +1,35 @@
+"""Plotly helpers shared by the monitor and regenerate-plots."""
+import numpy.typing as npt
+import plotly.graph_objs as go
+from pandas import DataFrame
+
+from dbsync_monitoring.downsample import DEFAULT_MAX_POINTS, Method, downsample
+
+
+def line_trace(x: npt.ArrayLike, y: npt.ArrayLike, name: str,
+               max_points: int = DEFAULT_MAX_POINTS, method: Method = "lttb",
+               webgl: bool = False) -> go.Scatter | go.Scattergl:
+    """Downsampled line trace, rendered with WebGL when ``webgl`` is set."""
+    xs, ys = downsample(x, y, max_points, method)
+    trace_cls = go.Scattergl if webgl else go.Scatter
+    return trace_cls(x=xs, y=ys, mode="lines", name=name)
+
+
+EVENT_COLORS = {
+    'leak': "crimson", 'stall': "orange", 'stall_end': "green", 'rollback': "purple",
+    'throughput_drop': "orange", 'throughput_rise': "green", 'restart': "black",
+}
+
+
+def annotate_events(fig: go.Figure, events: DataFrame) -> None:
+    """Dotted vertical line in every subplot at the slot of each event, labelled in the top one.
+
+    ``events`` has ``slot_no``, ``kind``, ``message`` and ``version`` columns
+    (``queries.load_events``); the message is shown on hover.
+    """
+    for e in events.itertuples(index=False):
+        color = EVENT_COLORS.get(e.kind, "gray")
+        fig.add_vline(x=e.slot_no, line_width=1, line_dash="dot", line_color=color, row="all", col=1)
+        fig.add_annotation(x=e.slot_no, y=1, xref="x", yref="y domain", text=e.kind,
+                           hovertext=f"{e.version}: {e.message}", showarrow=False, textangle=-90,
+                           xanchor="left", yanchor="top", font={"size": 9, "color": color})
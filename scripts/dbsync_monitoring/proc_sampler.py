@@ -0,0 +1,220 @@
+"""Per-process CPU and memory samplers.
+
+``ProcSampler`` reads ``/proc/<pid>/{stat,statm,status,smaps_rollup,io}``
+directly: each file is opened once and re-read with ``preadv`` into a
+preallocated buffer. ``smaps_rollup`` gives USS/PSS/swap without walking
+every mapping the way ``memory_full_info()`` parses ``smaps``.
+``PsutilSampler`` is the portable psutil path used everywhere else.
+Both return the same dicts, with memory in MB and I/O as cumulative counters.
+"""
+import os
+import sys
+import time
+from typing import Any, Protocol
+
+import psutil
+from psutil import Process
+
+MB = 1024**2
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+class Sampler(Protocol):
+    pid: int
+
+    def memory(self) -> dict[str, float] | None: ...
+
+    def cpu(self) -> dict[str, Any] | None: ...
+
+    def io(self) -> dict[str, int] | None: ...
+
+    def close(self) -> None: ...
+
+
+class PsutilSampler:
+    def __init__(self, process: Process) -> None:
+        self.process = process
+        self.pid = process.pid
+
+    def memory(self) -> dict[str, float] | None:
+        try:
+            mi = self.process.memory_info()
+        except Exception:
+            return None
+        memory = {'rss': mi.rss / MB, 'vms': mi.vms / MB, 'shared': getattr(mi, 'shared', 0) / MB}
+        try:
+            mfi = self.process.memory_full_info()
+        except psutil.AccessDenied:
+            # smaps of another user's process (e.g. postgres backends) needs extra privileges.
+            return memory
+        except Exception:
+            return None
+        return {
+            **memory,
+            'uss': getattr(mfi, 'uss', 0) / MB,
+            'pss': getattr(mfi, 'pss', 0) / MB,
+            'swap': getattr(mfi, 'swap', 0) / MB,
+        }
+
+    def cpu(self) -> dict[str, Any] | None:
+        try:
+            times = self.process.cpu_times()
+            percent = self.process.cpu_percent(interval=None)
+            with self.process.oneshot():
+                ctx = self.process.num_ctx_switches()
+            return {
+                'cpu_percent': percent,
+                'user_time': times.user,
+                'system_time': times.system,
+                'children_user': getattr(times, 'children_user', 0.0),
+                'children_system': getattr(times, 'children_system', 0.0),
+                'iowait': getattr(times, 'iowait', 0.0),
+                'ctx_switches': ctx.voluntary + ctx.involuntary,
+                'interrupts': None
+            }
+        except Exception:
+            return None
+
+    def io(self) -> dict[str, int] | None:
+        try:
+            counters = self.process.io_counters()
+        except Exception:
+            return None
+        return {name: getattr(counters, name) for name in IO_FIELDS if hasattr(counters, name)}
+
+    def close(self) -> None:
+        pass
+
+
+class ProcFile:
+    """A /proc file kept open and re-read from offset 0 into a reused buffer."""
+
+    def __init__(self, path: str, size: int = 4096) -> None:
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buf = bytearray(size)
+
+    def read(self) -> bytes:
+        while True:
+            n = os.preadv(self.fd, [self.buf], 0)
+            if n < len(self.buf):
+                return bytes(memoryview(self.buf)[:n])
+            self.buf = bytearray(len(self.buf) * 2)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def _kb_fields(data: bytes, wanted: frozenset[bytes] | dict[bytes, str]) -> dict[bytes, int]:
+    """Parse ``Key:   123 kB`` lines of status/smaps_rollup/io for the wanted keys."""
+    fields: dict[bytes, int] = {}
+    for line in data.split(b'\n'):
+        key, _, rest = line.partition(b':')
+        if key in wanted:
+            fields[key] = int(rest.split()[0])
+    return fields
+
+
+SMAPS_KEYS = frozenset((b'Pss', b'Private_Clean', b'Private_Dirty', b'Private_Hugetlb', b'Swap'))
+STATUS_KEYS = frozenset((b'voluntary_ctxt_switches', b'nonvoluntary_ctxt_switches'))
+# psutil io_counters() names of the /proc/<pid>/io fields.
+IO_KEYS = {b'syscr': 'read_count', b'syscw': 'write_count', b'read_bytes': 'read_bytes',
+           b'write_bytes': 'write_bytes', b'rchar': 'read_chars', b'wchar': 'write_chars'}
+IO_FIELDS = tuple(IO_KEYS.values())
+
+
+class ProcSampler:
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        base = f'/proc/{pid}'
+        self._stat = ProcFile(f'{base}/stat', 1024)
+        self._statm = ProcFile(f'{base}/statm', 256)
+        self._status = ProcFile(f'{base}/status', 4096)
+        self._smaps = ProcFile(f'{base}/smaps_rollup', 2048)
+        # Opened on first use: unlike the others it is only readable by the owner or root.
+        self._io: ProcFile | None = None
+        self._io_denied = False
+        # Baseline for cpu_percent, like psutil's first cpu_percent(interval=None) call.
+        self._last_ticks = self._cpu_ticks(self._stat_fields())
+        self._last_wall = time.monotonic()
+
+    def _stat_fields(self) -> list[bytes]:
+        data = self._stat.read()
+        # comm may contain spaces and parentheses; fields resume after the last ')'.
+        return data[data.rindex(b')') + 2:].split()
+
+    @staticmethod
+    def _cpu_ticks(fields: list[bytes]) -> int:
+        return int(fields[11]) + int(fields[12])
+
+    def memory(self) -> dict[str, float] | None:
+        try:
+            statm = self._statm.read().split()
+            smaps = _kb_fields(self._smaps.read(), SMAPS_KEYS)
+        except OSError:
+            return None
+        uss_kb = smaps.get(b'Private_Clean', 0) + smaps.get(b'Private_Dirty', 0) + smaps.get(b'Private_Hugetlb', 0)
+        return {
+            'rss': int(statm[1]) * PAGE_SIZE / MB,
+            'vms': int(statm[0]) * PAGE_SIZE / MB,
+            'uss': uss_kb / 1024,
+            'pss': smaps.get(b'Pss', 0) / 1024,
+            'swap': smaps.get(b'Swap', 0) / 1024,
+            'shared': int(statm[2]) * PAGE_SIZE / MB
+        }
+
+    def cpu(self) -> dict[str, Any] | None:
+        try:
+            # /proc/<pid>/stat fields 14.. (utime) are at index 11.. after the comm field.
+            fields = self._stat_fields()
+            status = _kb_fields(self._status.read(), STATUS_KEYS)
+        except OSError:
+            return None
+        now = time.monotonic()
+        ticks = self._cpu_ticks(fields)
+        elapsed = now - self._last_wall
+        percent = 100.0 * (ticks - self._last_ticks) / CLK_TCK / elapsed if elapsed > 0 else 0.0
+        self._last_ticks, self._last_wall = ticks, now
+        return {
+            'cpu_percent': round(percent, 1),
+            'user_time': int(fields[11]) / CLK_TCK,
+            'system_time': int(fields[12]) / CLK_TCK,
+            'children_user': int(fields[13]) / CLK_TCK,
+            'children_system': int(fields[14]) / CLK_TCK,
+            'iowait': int(fields[39]) / CLK_TCK if len(fields) > 39 else 0.0,
+            'ctx_switches': status.get(b'voluntary_ctxt_switches', 0) + status.get(b'nonvoluntary_ctxt_switches', 0),
+            'interrupts': None
+        }
+
+    def io(self) -> dict[str, int] | None:
+        if self._io_denied:
+            return None
+        try:
+            if self._io is None:
+                self._io = ProcFile(f'/proc/{self.pid}/io', 512)
+            fields = _kb_fields(self._io.read(), IO_KEYS)
+        except PermissionError:
+            self._io_denied = True
+            return None
+        except OSError:
+            return None
+        return {IO_KEYS[key]: value for key, value in fields.items()}
+
+    def close(self) -> None:
+        for f in (self._stat, self._statm, self._status, self._smaps, self._io):
+            if f is not None:
+                f.close()
+
+
+def proc_sampler_available(pid: int) -> bool:
+    return sys.platform.startswith('linux') and os.path.exists(f'/proc/{pid}/smaps_rollup')
+
+
+def make_sampler(process: Process, backend: str = 'auto') -> Sampler:
+    """Pick the /proc backend on Linux (``auto`` or ``proc``) and psutil otherwise."""
+    if backend != 'psutil' and proc_sampler_available(process.pid):
+        try:
+            return ProcSampler(process.pid)
+        except OSError:
+            pass
+    return PsutilSampler(process)
@@ -0,0 +1,227 @@
+"""Resource accounting across db-sync, its children, its Postgres backends and cardano-node."""
+import time
+from dataclasses import dataclass, field
+
+import psutil
+from psutil import Process
+
+from dbsync_monitoring.pg_session import PgSession, PgUnavailable
+from dbsync_monitoring.proc_sampler import Sampler, make_sampler
+from dbsync_monitoring.process_tracker import ProcessTracker
+
+ROLES = ('db-sync', 'db-sync-children', 'postgres', 'postgres-aux', 'cardano-node')
+TOTAL = 'total'
+
+# Hosts that reach a Postgres server on this machine; an empty host or a directory is a Unix socket.
+LOCAL_PG_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+# Backends of the monitored database plus server-wide background processes
+# (checkpointer, WAL writer, autovacuum, ...), without the monitor's own sessions.
+PG_PROCESSES_SQL = """
+  SELECT pid, backend_type, application_name, client_port
+  FROM pg_stat_activity
+  WHERE pid <> pg_backend_pid()
+    AND application_name NOT LIKE 'db-sync-monitor%'
+    AND (backend_type <> 'client backend' OR datname = current_database());
+"""
+
+
+@dataclass
+class RoleSample:
+    """Sum over the processes of one role during one interval.
+
+    Memory and CPU percent are current values; ``cpu_time``, ``read_bytes``
+    and ``write_bytes`` are deltas since the previous pass. ``None`` means
+    no process of the role reported the value (e.g. missing privileges).
+    """
+    role: str
+    n_procs: int = 0
+    cpu_percent: float = 0.0
+    cpu_time: float = 0.0
+    rss: float | None = None
+    uss: float | None = None
+    pss: float | None = None
+    read_bytes: int | None = None
+    write_bytes: int | None = None
+
+    def add(self, other: 'RoleSample') -> None:
+        self.n_procs += other.n_procs
+        self.cpu_percent += other.cpu_percent
+        self.cpu_time += other.cpu_time
+        for name in ('rss', 'uss', 'pss', 'read_bytes', 'write_bytes'):
+            value = getattr(other, name)
+            if value is not None:
+                current = getattr(self, name)
+                setattr(self, name, value if current is None else current + value)
+
+
+def _postgres_process(pid: int) -> Process | None:
+    """The local process ``pid`` if it is a Postgres server process."""
+    try:
+        proc = Process(pid)
+        cmdline = proc.cmdline()
+        # Backends retitle themselves, e.g. "postgres: 16/main: cexplorer dbsync [local] idle".
+        if proc.name() == 'postgres' or (cmdline and cmdline[0].startswith('postgres')):
+            return proc
+    except psutil.Error:
+        pass
+    return None
+
+
+@dataclass
+class _Member:
+    sampler: Sampler
+    cpu_time: float | None = None
+    io: dict[str, int] = field(default_factory=dict)
+
+
+class ProcessGroup:
+    """Sample every process of the configured roles in one pass.
+
+    Postgres client backends belong to db-sync when their
+    ``application_name`` is one of ``pg_app_names`` or, without names, when
+    they connect from one of db-sync's TCP ports. Backends connected over a
+    Unix socket carry no client port, so they are only matched by name.
+    Postgres processes are only collected when the session's host is this
+    machine. A process is counted in the first role that claims it.
+    """
+
+    def __init__(self, dbsync: ProcessTracker, session: PgSession | None, roles: tuple[str, ...] = ROLES,
+                 node_pattern: str = 'cardano-node', pg_app_names: tuple[str, ...] = (),
+                 sampler_backend: str = 'auto') -> None:
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise ValueError(f"Unknown roles: {', '.join(sorted(unknown))}")
+        self.dbsync = dbsync
+        self.session = session
+        self.roles = roles
+        self.node = ProcessTracker(node_pattern, by_name=True)
+        self.pg_app_names = set(pg_app_names)
+        self.local_pg = session is not None and (session.host.startswith('/') or session.host in LOCAL_PG_HOSTS)
+        if session is not None and not self.local_pg and {'postgres', 'postgres-aux'} & set(roles):
+            print(f"Postgres at {session.host} is not on this host; the postgres roles stay empty")
+        self._socket_hint = bool(pg_app_names)
+        self.sampler_backend = sampler_backend
+        self._members: dict[tuple[int, float], _Member] = {}
+        self._last_pass: float | None = None
+
+    def _pg_pids(self, dbsync: Process | None) -> tuple[list[int], list[int]]:
+        """PIDs of db-sync's client backends and of Postgres background processes."""
+        if self.session is None or not self.local_pg or not ({'postgres', 'postgres-aux'} & set(self.roles)):
+            return [], []
+        try:
+            rows = self.session.fetchall(PG_PROCESSES_SQL)
+        except PgUnavailable:
+            return [], []
+        ports: set[int] = set()
+        if dbsync is not None and not self.pg_app_names:
+            try:
+                ports = {c.laddr.port for c in dbsync.net_connections(kind='tcp') if c.laddr}
+            except psutil.Error:
+                pass
+        clients, aux = [], []
+        for pid, backend_type, app_name, client_port in rows:
+            if backend_type != 'client backend':
+                aux.append(pid)
+            elif self.pg_app_names:
+                if app_name in self.pg_app_names:
+                    clients.append(pid)
+            elif client_port in ports:
+                clients.append(pid)
+            elif (client_port is None or client_port == -1) and not self._socket_hint:
+                print("Postgres backends connected over a Unix socket are only counted as db-sync's "
+                      "with --pg-app-names")
+                self._socket_hint = True
+        return clients, aux
+
+    def members(self) -> dict[str, list[Process]]:
+        """Current processes of every configured role."""
+        dbsync = self.dbsync.get()
+        found: dict[str, list[Process]] = {role: [] for role in self.roles}
+        if dbsync is not None:
+            if 'db-sync' in found:
+                found['db-sync'].append(dbsync)
+            if 'db-sync-children' in found:
+                try:
+                    found['db-sync-children'] = dbsync.children(recursive=True)
+                except psutil.Error:
+                    pass
+        clients, aux = self._pg_pids(dbsync)
+        for role, pids in (('postgres', clients), ('postgres-aux', aux)):
+            if role not in found:
+                continue
+            found[role] = [p for p in map(_postgres_process, pids) if p is not None]
+        if 'cardano-node' in found:
+            node = self.node.get()
+            if node is not None:
+                found['cardano-node'].append(node)
+        return found
+
+    def _sample_member(self, proc: Process, role: str) -> RoleSample | None:
+        try:
+            key = (proc.pid, proc.create_time())
+        except psutil.Error:
+            return None
+        member = self._members.get(key)
+        if member is None:
+            try:
+                # A separate Process object so psutil's cpu_percent baseline is not shared with other samplers.
+                member = _Member(make_sampler(Process(proc.pid), self.sampler_backend))
+            except psutil.Error:
+                return None
+            self._members[key] = member
+        mem = member.sampler.memory()
+        cpu = member.sampler.cpu()
+        io = member.sampler.io()
+        if mem is None and cpu is None:
+            return None
+
+        sample = RoleSample(role, n_procs=1)
+        if mem:
+            sample.rss, sample.uss, sample.pss = mem['rss'], mem.get('uss'), mem.get('pss')
+        if cpu:
+            cpu_time = cpu['user_time'] + cpu['system_time']
+            sample.cpu_percent = cpu['cpu_percent']
+            # A process first seen in this pass contributes from its next pass on.
+            sample.cpu_time = cpu_time - member.cpu_time if member.cpu_time is not None else 0.0
+            member.cpu_time = cpu_time
+        if io:
+            last = member.io or io
+            sample.read_bytes = io.get('read_bytes', 0) - last.get('read_bytes', 0)
+            sample.write_bytes = io.get('write_bytes', 0) - last.get('write_bytes', 0)
+            member.io = io
+        return sample
+
+    def sample(self) -> tuple[float, list[RoleSample]]:
+        """Seconds since the previous pass and one row per role plus a ``total`` row."""
+        now = time.monotonic()
+        interval = now - self._last_pass if self._last_pass is not None else 0.0
+        self._last_pass = now
+
+        rows = {role: RoleSample(role) for role in self.roles}
+        seen: set[tuple[int, float]] = set()
+        for role, procs in self.members().items():
+            for proc in procs:
+                try:
+                    key = (proc.pid, proc.create_time())
+                except psutil.Error:
+                    continue
+                if key in seen:
+                    continue
+                seen.add(key)
+                sample = self._sample_member(proc, role)
+                if sample is not None:
+                    rows[role].add(sample)
+
+        for key in self._members.keys() - seen:
+            self._members.pop(key).sampler.close()
+
+        total = RoleSample(TOTAL)
+        for row in rows.values():
+            total.add(row)
+        return interval, [*rows.values(), total]
+
+    def close(self) -> None:
+        for member in self._members.values():
+            member.sampler.close()
+        self._members.clear()
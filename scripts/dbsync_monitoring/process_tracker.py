@@ -0,0 +1,73 @@
+"""Cached discovery of the monitored process."""
+import os
+import threading
+
+import psutil
+from psutil import Process
+
+
+class ProcessTracker:
+    """Remember the matched process and only rescan when it goes away.
+
+    The process is identified by PID plus create_time, so a recycled PID is
+    not mistaken for the original process. Reusing the same ``Process``
+    object keeps psutil's ``cpu_percent`` baseline between ticks.
+
+    ``pattern`` is matched anywhere in the command line, or against the
+    process name only with ``by_name`` (db-sync's arguments often contain
+    paths like ``.../cardano-node/node.socket``).
+
+    ``get`` is safe to call from several threads; the monitor's process
+    and group sources share one tracker.
+    """
+
+    def __init__(self, pattern: str = 'cardano-db-sync', by_name: bool = False) -> None:
+        self.pattern = pattern
+        self.by_name = by_name
+        self.pid: int | None = None
+        self.create_time: float | None = None
+        self._proc: Process | None = None
+        self._lock = threading.Lock()
+
+    def _alive(self, proc: Process) -> bool:
+        try:
+            # is_running() compares the current create_time with the cached one.
+            return bool(proc.is_running() and proc.status() != psutil.STATUS_ZOMBIE)
+        except psutil.Error:
+            return False
+
+    def _scan(self) -> Process | None:
+        own_pid = os.getpid()
+        for proc in psutil.process_iter(['name', 'cmdline']):
+            if proc.pid == own_pid:
+                continue
+            if self.by_name:
+                matched = proc.info['name'] == self.pattern
+            else:
+                matched = self.pattern in ' '.join(proc.info['cmdline'] or [])
+            if matched:
+                return proc
+        return None
+
+    def get(self) -> Process | None:
+        with self._lock:
+            return self._get()
+
+    def _get(self) -> Process | None:
+        if self._proc is not None and self._alive(self._proc):
+            return self._proc
+
+        proc = self._scan()
+        self._proc = proc
+        if proc is None:
+            self.pid = None
+            self.create_time = None
+            return None
+        try:
+            self.pid = proc.pid
+            self.create_time = proc.create_time()
+            proc.cpu_percent(interval=None)  # prime the baseline for the next tick
+        except psutil.Error:
+            self._proc = None
+            return None
+        return proc
@@ -0,0 +1,103 @@
+"""On-demand cProfile and tracemalloc snapshots of a running monitor, triggered by signals."""
+import cProfile
+import io
+import os
+import pstats
+import signal
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import datetime
+from types import FrameType
+from typing import TypeVar
+
+T = TypeVar('T')
+
+
+class LiveProfiler:
+    """Profile a live collector without restarting it.
+
+    ``SIGUSR1`` profiles every collector run for the next ``duration``
+    seconds, then writes the merged ``.prof`` file (for ``pstats`` or
+    snakeviz) and prints the top functions. cProfile only sees the thread
+    it runs in, so each wrapped call gets its own profiler and the results
+    are merged at the end; only one profiler may be active per process, so
+    collectors run one at a time while the window is open.
+
+    ``SIGUSR2`` starts tracemalloc; the next ``SIGUSR2`` writes a snapshot,
+    prints the allocation sites that grew most since the first signal and
+    stops tracing again.
+    """
+
+    def __init__(self, output_folder: str = 'profiles', duration: float = 60.0, top: int = 15) -> None:
+        self.output_folder = output_folder
+        self.duration = duration
+        self.top = top
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._until: float | None = None
+        self._profiles: list[cProfile.Profile] = []
+        self._baseline: tracemalloc.Snapshot | None = None
+
+    def install(self) -> None:
+        """Register the signal handlers; must be called from the main thread."""
+        if not hasattr(signal, 'SIGUSR1'):
+            return
+        signal.signal(signal.SIGUSR1, self._on_profile_signal)
+        signal.signal(signal.SIGUSR2, self._on_tracemalloc_signal)
+
+    def _path(self, kind: str, suffix: str) -> str:
+        os.makedirs(self.output_folder, exist_ok=True)
+        return os.path.join(self.output_folder, f"{kind}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}")
+
+    def _on_profile_signal(self, signum: int, frame: FrameType | None) -> None:
+        with self._lock:
+            if self._until is None:
+                self._until = time.monotonic() + self.duration
+                print(f"Profiling collectors for {self.duration:.0f}s")
+
+    def wrap(self, fn: Callable[[T], None]) -> Callable[[T], None]:
+        """``fn``, profiled while a profiling window is open."""
+        def call(arg: T) -> None:
+            if self._until is None:
+                fn(arg)
+                return
+            profile = cProfile.Profile()
+            try:
+                with self._run_lock:
+                    profile.runcall(fn, arg)
+            finally:
+                with self._lock:
+                    if self._until is not None:  # else another collector already closed the window
+                        self._profiles.append(profile)
+                self._finish_if_due()
+        return call
+
+    def _finish_if_due(self) -> None:
+        with self._lock:
+            if self._until is None or time.monotonic() < self._until:
+                return
+            profiles, self._profiles, self._until = self._profiles, [], None
+        out = io.StringIO()
+        stats = pstats.Stats(*profiles, stream=out)
+        path = self._path('collector', '.prof')
+        stats.dump_stats(path)
+        stats.sort_stats('cumulative').print_stats(self.top)
+        print(f"Saved profile of {len(profiles)} collector runs to {path}")
+        print(out.getvalue())
+
+    def _on_tracemalloc_signal(self, signum: int, frame: FrameType | None) -> None:
+        if self._baseline is None:
+            tracemalloc.start(10)
+            self._baseline = tracemalloc.take_snapshot()
+            print("tracemalloc started; send the signal again to write a snapshot")
+            return
+        snapshot = tracemalloc.take_snapshot()
+        path = self._path('tracemalloc', '.snapshot')
+        snapshot.dump(path)
+        print(f"Saved tracemalloc snapshot to {path}; largest growth since tracing started:")
+        for diff in snapshot.compare_to(self._baseline, 'lineno')[:self.top]:
+            print(f"  {diff}")
+        self._baseline = None
+        tracemalloc.stop()
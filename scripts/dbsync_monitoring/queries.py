@@ -0,0 +1,449 @@
+"""Read helpers for the process monitor's metrics database."""
+import sqlite3
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from dbsync_monitoring.rates import DEFAULT_HALFLIFE_S, chain_rates, cpu_cost
+from dbsync_monitoring.rollup import TIERS, tier_table
+from dbsync_monitoring.schema import migrate
+
+# Sample interval of the monitor releases that did not record timestamps.
+LEGACY_SAMPLE_INTERVAL_S = 10.0
+
+
+def load_versions(sqlite_file: str) -> list[str]:
+    """Return versions that have samples, most recently registered first."""
+    migrate(sqlite_file)
+    with sqlite3.connect(sqlite_file) as conn:
+        df = pd.read_sql_query(
+            """SELECT v.name AS version FROM versions v
+               WHERE EXISTS (SELECT 1 FROM db_sync_version d WHERE d.version_id = v.id)
+               ORDER BY v.id DESC""",
+            conn
+        )
+    return [str(v) for v in df["version"].tolist()]
+
+
+def _pick_tier(conn: sqlite3.Connection, version_id: int, max_points: int) -> int:
+    """Index in TIERS of the coarsest tier still giving ``max_points`` over the run."""
+    if max_points <= 0:
+        return 0
+    lo, hi = conn.execute(
+        "SELECT MIN(ts_ms), MAX(ts_ms) FROM db_sync_version WHERE version_id = ?", (version_id,)
+    ).fetchone()
+    if lo is None:
+        return 0
+    resolution = (hi - lo) / max_points
+    return max(i for i, (_, width) in enumerate(TIERS) if width <= resolution)
+
+
+def _tier_query(table: str, tier_idx: int, columns: Mapping[str, str]) -> tuple[str, str]:
+    """SELECT of (ts_ms, slot_no, values...) for one tier and the name of its time column.
+
+    ``columns`` maps each metric to the rollup aggregate standing in for it
+    in coarser tiers: ``mean`` for gauges, ``last`` for cumulative counters.
+    """
+    tier, _ = TIERS[tier_idx]
+    if not tier:
+        return f"SELECT ts_ms, slot_no, {', '.join(columns)} FROM {table}", "ts_ms"
+    values = ", ".join(f"{c}_{agg} AS {c}" for c, agg in columns.items())
+    return f"SELECT bucket_ms AS ts_ms, slot_last AS slot_no, {values} FROM {tier_table(table, tier)}", "bucket_ms"
+
+
+def _load_series(conn: sqlite3.Connection, table: str, columns: Mapping[str, str], version_id: int,
+                 chosen: int) -> DataFrame:
+    """Rows of the chosen tier, stitched with coarser tiers for pruned history
+    and finer tiers for the recent tail that is not rolled up yet."""
+    frames = []
+    sql, time_col = _tier_query(table, chosen, columns)
+    frames.append(pd.read_sql_query(f"{sql} WHERE version_id = ?", conn, params=(version_id,)))
+    lo, hi = conn.execute(
+        f"SELECT MIN({time_col}), MAX({time_col}) FROM {tier_table(table, TIERS[chosen][0])} WHERE version_id = ?",
+        (version_id,)
+    ).fetchone()
+    if hi is not None:
+        hi += TIERS[chosen][1]
+
+    for idx in range(chosen + 1, len(TIERS)):
+        sql, time_col = _tier_query(table, idx, columns)
+        width = TIERS[idx][1]
+        if lo is None:
+            frames.insert(0, pd.read_sql_query(f"{sql} WHERE version_id = ?", conn, params=(version_id,)))
+        else:
+            frames.insert(0, pd.read_sql_query(f"{sql} WHERE version_id = ? AND {time_col} + ? <= ?",
+                                               conn, params=(version_id, width, lo)))
+        t_lo, t_hi = conn.execute(
+            f"SELECT MIN({time_col}), MAX({time_col}) FROM {tier_table(table, TIERS[idx][0])} WHERE version_id = ?",
+            (version_id,)
+        ).fetchone()
+        if t_lo is not None:
+            lo = t_lo if lo is None else min(lo, t_lo)
+            hi = t_hi + width if hi is None else max(hi, t_hi + width)
+
+    for idx in range(chosen - 1, -1, -1):
+        sql, time_col = _tier_query(table, idx, columns)
+        if hi is None:
+            frames.append(pd.read_sql_query(f"{sql} WHERE version_id = ?", conn, params=(version_id,)))
+        else:
+            frames.append(pd.read_sql_query(f"{sql} WHERE version_id = ? AND {time_col} >= ?",
+                                            conn, params=(version_id, hi)))
+        t_hi = conn.execute(
+            f"SELECT MAX({time_col}) FROM {tier_table(table, TIERS[idx][0])} WHERE version_id = ?",
+            (version_id,)
+        ).fetchone()[0]
+        if t_hi is not None:
+            hi = t_hi + TIERS[idx][1] if hi is None else max(hi, t_hi + TIERS[idx][1])
+
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=["ts_ms", "slot_no", *columns])
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_metrics(sqlite_file: str, versions: list[str], max_points: int = 0) -> tuple[DataFrame, DataFrame]:
+    """Load memory and CPU metrics for selected versions.
+
+    With ``max_points`` set, each version is read from the coarsest rollup
+    tier that still yields about that many points over its run.
+    """
+    migrate(sqlite_file)
+    mem_frames, cpu_frames = [], []
+    with sqlite3.connect(sqlite_file) as conn:
+        ids = dict(conn.execute(
+            f"SELECT name, id FROM versions WHERE name IN ({','.join('?' for _ in versions)})", versions
+        ).fetchall())
+        for version in versions:
+            if version not in ids:
+                continue
+            chosen = _pick_tier(conn, ids[version], max_points)
+            mem = _load_series(conn, 'memory_metrics', {'rss': 'mean'}, ids[version], chosen)
+            cpu = _load_series(conn, 'cpu_metrics', {'cpu_percent': 'mean'}, ids[version], chosen)
+            mem_frames.append(mem.assign(version=version))
+            cpu_frames.append(cpu.assign(version=version))
+
+    def combine(frames: list[DataFrame], column: str) -> DataFrame:
+        if not frames:
+            return pd.DataFrame(columns=["slot_no", column, "version"])
+        return pd.concat(frames, ignore_index=True).sort_values(["version", "slot_no"], ignore_index=True)
+
+    return combine(mem_frames, "rss"), combine(cpu_frames, "cpu_percent")
+
+
+def load_cpu_time(sqlite_file: str, versions: list[str], max_points: int = 0) -> DataFrame:
+    """Cumulative db-sync user+system CPU seconds (``cpu_s``) per sample for selected versions."""
+    migrate(sqlite_file)
+    frames = []
+    with sqlite3.connect(sqlite_file) as conn:
+        ids = dict(conn.execute(
+            f"SELECT name, id FROM versions WHERE name IN ({','.join('?' for _ in versions)})", versions
+        ).fetchall())
+        for version in versions:
+            if version not in ids:
+                continue
+            chosen = _pick_tier(conn, ids[version], max_points)
+            cpu = _load_series(conn, 'cpu_metrics', {'user_time': 'last', 'system_time': 'last'},
+                               ids[version], chosen)
+            frames.append(cpu.assign(cpu_s=cpu["user_time"] + cpu["system_time"], version=version)
+                          [["ts_ms", "slot_no", "cpu_s", "version"]])
+    if not frames:
+        return pd.DataFrame(columns=["ts_ms", "slot_no", "cpu_s", "version"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_peak_rss(sqlite_file: str, versions: list[str], replay: bool = False) -> dict[str, float]:
+    """Highest RSS (MB) of every selected version over raw samples and the ``max`` of its rollups.
+
+    Only samples taken during replay count when ``replay`` is set, only the
+    others when it is not. Rows without a recorded phase, rollup buckets
+    among them, get the phase in effect at their (bucket) start.
+    """
+    migrate(sqlite_file)
+    tiers = " UNION ALL ".join(
+        f"SELECT {'ts_ms' if not tier else 'bucket_ms'} AS ts_ms, version_id, {'rss' if not tier else 'rss_max'} AS rss,"
+        f" {'phase' if not tier else 'NULL'} AS phase FROM {tier_table('memory_metrics', tier)}"
+        for tier, _ in TIERS
+    )
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT v.name, MAX(m.rss) FROM ({tiers}) m JOIN versions v ON v.id = m.version_id
+      WHERE v.name IN ({placeholders})
+        AND (COALESCE(m.phase, (SELECT p.phase FROM phases p WHERE p.version_id = m.version_id AND p.ts_ms <= m.ts_ms
+                                ORDER BY p.ts_ms DESC LIMIT 1)) IS 'replay') = ?
+      GROUP BY v.name
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return {str(name): float(peak) for name, peak in conn.execute(q, [*versions, replay]) if peak is not None}
+
+
+def load_samples(sqlite_file: str, version: str) -> tuple[DataFrame, DataFrame, DataFrame]:
+    """Full-resolution samples of one version for per-epoch attribution.
+
+    Returns ``mem[ts_ms, slot_no, rss, rss_max]``, ``cpu[ts_ms, slot_no,
+    cpu_s]`` and ``io[ts_ms, slot_no, read_bytes, write_bytes]``; pruned
+    history comes from the finest rollup tier left, with the bucket maximum
+    as ``rss_max``.
+    """
+    migrate(sqlite_file)
+    with sqlite3.connect(sqlite_file) as conn:
+        row = conn.execute("SELECT id FROM versions WHERE name = ?", (version,)).fetchone()
+        if row is None:
+            return (pd.DataFrame(columns=["ts_ms", "slot_no", "rss", "rss_max"]),
+                    pd.DataFrame(columns=["ts_ms", "slot_no", "cpu_s"]),
+                    pd.DataFrame(columns=["ts_ms", "slot_no", "read_bytes", "write_bytes"]))
+        version_id = row[0]
+        mem = _load_series(conn, 'memory_metrics', {'rss': 'mean'}, version_id, 0)
+        peak = _load_series(conn, 'memory_metrics', {'rss': 'max'}, version_id, 0)
+        cpu = _load_series(conn, 'cpu_metrics', {'user_time': 'last', 'system_time': 'last'}, version_id, 0)
+        io = pd.read_sql_query(
+            "SELECT ts_ms, slot_no, read_bytes, write_bytes FROM io_metrics WHERE version_id = ? ORDER BY ts_ms",
+            conn, params=(version_id,)
+        )
+    return (mem.assign(rss_max=peak["rss"]),
+            cpu.assign(cpu_s=cpu["user_time"] + cpu["system_time"])[["ts_ms", "slot_no", "cpu_s"]],
+            io)
+
+
+def load_pg_stats(sqlite_file: str, versions: list[str]) -> DataFrame:
+    """Postgres inserts/s and WAL MB/s per sample for selected versions."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT p.slot_no,
+             p.tup_inserted / p.interval_s AS inserts_per_s,
+             p.wal_bytes / p.interval_s / 1048576.0 AS wal_mb_per_s,
+             v.name AS version
+      FROM pg_server_metrics p JOIN versions v ON v.id = p.version_id
+      WHERE v.name IN ({placeholders}) AND p.interval_s > 0
+      ORDER BY p.version_id, p.slot_no
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=versions)
+
+
+def load_roles(sqlite_file: str, versions: list[str], role: str = "total") -> DataFrame:
+    """CPU %, PSS (MB) and disk MB/s of one process role per sample for selected versions."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT r.slot_no, r.cpu_percent, r.pss,
+             (COALESCE(r.read_bytes, 0) + COALESCE(r.write_bytes, 0)) / r.interval_s / 1048576.0 AS io_mb_per_s,
+             v.name AS version
+      FROM role_metrics r JOIN versions v ON v.id = r.version_id
+      WHERE v.name IN ({placeholders}) AND r.role = ? AND r.interval_s > 0
+      ORDER BY r.version_id, r.slot_no
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=[*versions, role])
+
+
+def load_io(sqlite_file: str, versions: list[str]) -> DataFrame:
+    """db-sync read/write MB/s and read/write syscalls/s per sample for selected versions."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT i.slot_no,
+             i.read_bytes / i.interval_s / 1048576.0 AS read_mb_per_s,
+             i.write_bytes / i.interval_s / 1048576.0 AS write_mb_per_s,
+             i.read_count / i.interval_s AS read_ops_per_s,
+             i.write_count / i.interval_s AS write_ops_per_s,
+             v.name AS version
+      FROM io_metrics i JOIN versions v ON v.id = i.version_id
+      WHERE v.name IN ({placeholders}) AND i.interval_s > 0
+      ORDER BY i.version_id, i.slot_no
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=versions)
+
+
+def load_disks(sqlite_file: str, versions: list[str]) -> DataFrame:
+    """Device MB/s, IOPS and utilisation % per sample for selected versions, one row per device label."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT d.slot_no, d.label,
+             (d.read_bytes + d.write_bytes) / d.interval_s / 1048576.0 AS mb_per_s,
+             (d.reads + d.writes) / d.interval_s AS iops,
+             100.0 * d.busy_ms / 1000.0 / d.interval_s AS util_percent,
+             v.name AS version
+      FROM disk_metrics d JOIN versions v ON v.id = d.version_id
+      WHERE v.name IN ({placeholders}) AND d.interval_s > 0
+      ORDER BY d.version_id, d.slot_no
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=versions)
+
+
+def load_events(sqlite_file: str, versions: list[str]) -> DataFrame:
+    """Events detected by the collector (leaks, stalls, rollbacks, throughput changes) for selected versions."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT e.ts_ms, e.slot_no, e.kind, e.value, e.message, v.name AS version
+      FROM events e JOIN versions v ON v.id = e.version_id
+      WHERE v.name IN ({placeholders})
+      ORDER BY e.version_id, e.ts_ms
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=versions)
+
+
+def load_phases(sqlite_file: str, versions: list[str]) -> DataFrame:
+    """Phase changes (``ts_ms``, ``run_id``, ``phase``, ``slot_no``, ``version``) recorded by the collector."""
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT p.ts_ms, p.run_id, p.phase, p.slot_no, v.name AS version
+      FROM phases p JOIN versions v ON v.id = p.version_id
+      WHERE v.name IN ({placeholders})
+      ORDER BY p.ts_ms
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=versions)
+
+
+def with_phases(df: DataFrame, phases: DataFrame) -> DataFrame:
+    """``df`` with the ``run_id`` and ``phase`` in effect at each row's ``ts_ms``.
+
+    Works for raw rows and rollup buckets alike, since phases are kept as
+    change points. Rows before the first recorded change, or without a
+    timestamp, get no phase.
+    """
+    df = df.drop(columns=["run_id", "phase"], errors="ignore")
+    if phases.empty or df.empty:
+        return df.assign(run_id=np.nan, phase=None)
+    timed = df[df["ts_ms"].notna()]
+    tagged = pd.merge_asof(
+        timed.assign(ts_ms=timed["ts_ms"].astype("int64")).reset_index().sort_values("ts_ms"),
+        phases[["ts_ms", "version", "run_id", "phase"]].astype({"ts_ms": "int64"}).sort_values("ts_ms"),
+        on="ts_ms", by="version", direction="backward",
+    ).set_index("index")
+    return df.assign(run_id=tagged["run_id"], phase=tagged["phase"])
+
+
+def load_sizes(sqlite_file: str, versions: list[str], exact: bool = False) -> DataFrame:
+    """Total bytes (heap + indexes + TOAST) of every table per size snapshot for selected versions.
+
+    Estimated and exact snapshots are kept apart so the two never alternate in one series.
+    """
+    migrate(sqlite_file)
+    placeholders = ",".join("?" for _ in versions)
+    q = f"""
+      SELECT r.ts_ms, r.slot_no, r.epoch_no, r.tx_id, r.table_name,
+             SUM(r.bytes) AS bytes,
+             SUM(CASE WHEN r.kind = 'index' THEN r.bytes ELSE 0 END) AS index_bytes,
+             SUM(CASE WHEN r.kind = 'toast' THEN r.bytes ELSE 0 END) AS toast_bytes,
+             v.name AS version
+      FROM relation_sizes r JOIN versions v ON v.id = r.version_id
+      WHERE v.name IN ({placeholders}) AND r.exact = ?
+      GROUP BY r.version_id, r.ts_ms, r.table_name
+      ORDER BY r.version_id, r.ts_ms
+    """
+    with sqlite3.connect(sqlite_file) as conn:
+        return pd.read_sql_query(q, conn, params=[*versions, int(exact)])
+
+
+def size_growth(sizes: DataFrame) -> DataFrame:
+    """Growth of every table per epoch from ``load_sizes`` output.
+
+    The last snapshot of each epoch is compared with the last one of the
+    previous recorded epoch, giving ``bytes_per_epoch`` and
+    ``bytes_per_1k_tx`` (per 1000 transactions added meanwhile).
+    """
+    columns = ["version", "table_name", "epoch_no", "bytes", "bytes_per_epoch", "bytes_per_1k_tx"]
+    sizes = sizes.dropna(subset=["epoch_no"])
+    if sizes.empty:
+        return pd.DataFrame(columns=columns)
+    last = (sizes.sort_values("ts_ms")
+            .groupby(["version", "table_name", "epoch_no"], as_index=False)
+            .last())
+    grouped = last.groupby(["version", "table_name"])
+    d_bytes = grouped["bytes"].diff()
+    d_epoch = grouped["epoch_no"].diff()
+    d_tx = grouped["tx_id"].diff()
+    return last.assign(
+        bytes_per_epoch=d_bytes / d_epoch,
+        bytes_per_1k_tx=(1000 * d_bytes / d_tx).where(d_tx > 0),
+    )[columns]
+
+
+def _ewm(df: DataFrame, columns: list[str], halflife_s: float) -> DataFrame:
+    """Time-weighted EWMA of ``columns`` over the ``ts_ms`` of each row.
+
+    Rows without ``ts_ms`` (migrated from files that recorded none) are
+    smoothed on their own, per sample, as if ``LEGACY_SAMPLE_INTERVAL_S`` apart.
+    """
+    timed = df["ts_ms"].notna()
+    smoothed = df[columns].astype(np.float64)
+    if timed.any():
+        times = pd.to_datetime(df.loc[timed, "ts_ms"], unit="ms")
+        smoothed.loc[timed] = smoothed[timed].ewm(halflife=pd.Timedelta(seconds=halflife_s), times=times).mean()
+    if not timed.all():
+        halflife = max(1.0, halflife_s / LEGACY_SAMPLE_INTERVAL_S)
+        smoothed.loc[~timed] = smoothed[~timed].ewm(halflife=halflife).mean()
+    return df.assign(**{c: smoothed[c] for c in columns})
+
+
+def _stretches(df: DataFrame) -> list[DataFrame]:
+    """Runs of consecutive rows of ``df`` with the same ``run_id`` and ``phase``."""
+    keys = df[["run_id", "phase"]].astype(object).fillna("")
+    starts = (keys != keys.shift()).any(axis=1).cumsum()
+    return [part for _, part in df.groupby(starts, sort=False)]
+
+
+def load_rates(sqlite_file: str, versions: list[str], max_points: int = 0,
+               halflife_s: float = DEFAULT_HALFLIFE_S) -> tuple[DataFrame, DataFrame]:
+    """EWMA-smoothed sync throughput and CPU cost for selected versions.
+
+    Returns ``(rates_df[slot_no, slots_per_s, blocks_per_s, tx_per_s, phase, version],
+    cost_df[slot_no, cpu_s_per_1k_slots, phase, version])``. Throughput comes from
+    the recorded tip probes, CPU cost from cumulative user+system time. Both
+    are computed and smoothed within each stretch of one run and phase, so a
+    restart or a replay never bleeds into the rates around it.
+    """
+    migrate(sqlite_file)
+    phases = load_phases(sqlite_file, versions)
+    rate_frames, cost_frames = [], []
+    rate_columns = ["slots_per_s", "blocks_per_s", "tx_per_s"]
+    with sqlite3.connect(sqlite_file) as conn:
+        ids = dict(conn.execute(
+            f"SELECT name, id FROM versions WHERE name IN ({','.join('?' for _ in versions)})", versions
+        ).fetchall())
+        for version in versions:
+            if version not in ids:
+                continue
+            tips = pd.read_sql_query(
+                "SELECT ts_ms, slot_no, block_no, tx_id, run_id, phase FROM sync_progress WHERE version_id = ?"
+                " ORDER BY ts_ms",
+                conn, params=(ids[version],)
+            )
+            for part in _stretches(tips):
+                if len(part) < 2:
+                    continue
+                rates = chain_rates(
+                    part["ts_ms"].to_numpy(np.float64) / 1000.0, part["slot_no"].to_numpy(np.float64),
+                    part["block_no"].to_numpy(np.float64), part["tx_id"].to_numpy(np.float64)
+                )
+                df = _ewm(part.assign(**rates), rate_columns, halflife_s)
+                rate_frames.append(df[["slot_no", *rate_columns, "phase"]].assign(version=version))
+
+            chosen = _pick_tier(conn, ids[version], max_points)
+            cpu = _load_series(conn, 'cpu_metrics', {'user_time': 'last', 'system_time': 'last'},
+                               ids[version], chosen)
+            cpu = with_phases(cpu.sort_values("ts_ms", ignore_index=True).assign(version=version), phases)
+            for part in _stretches(cpu):
+                if len(part) < 2:
+                    continue
+                cpu_s = (part["user_time"] + part["system_time"]).to_numpy(np.float64)
+                idx, cost = cpu_cost(part["slot_no"].to_numpy(np.float64), cpu_s)
+                df = _ewm(part.iloc[idx].assign(cpu_s_per_1k_slots=cost), ["cpu_s_per_1k_slots"], halflife_s)
+                cost_frames.append(df[["slot_no", "cpu_s_per_1k_slots", "phase", "version"]])
+
+    def combine(frames: list[DataFrame], columns: list[str]) -> DataFrame:
+        if not frames:
+            return pd.DataFrame(columns=["slot_no", *columns, "phase", "version"])
+        return pd.concat(frames, ignore_index=True)
+
+    return combine(rate_frames, rate_columns), combine(cost_frames, ["cpu_s_per_1k_slots"])
@@ -0,0 +1,137 @@
+"""Sync throughput: slots, blocks and transactions per second, CPU cost per slot and ETA."""
+from dataclasses import dataclass
+
+import numpy as np
+import numpy.typing as npt
+
+DEFAULT_HALFLIFE_S = 600.0
+
+FloatArray = npt.NDArray[np.float64]
+
+
+@dataclass(frozen=True)
+class Rates:
+    """EWMA-smoothed throughput; ``None`` until two usable samples were seen."""
+    slots_per_s: float | None
+    blocks_per_s: float | None
+    tx_per_s: float | None
+    cpu_s_per_1k_slots: float | None
+    eta_s: float | None
+
+
+def sync_eta(slots_per_s: float | None, tip_time: float, now: float) -> float | None:
+    """Seconds until the tip reaches wall-clock time at the current throughput.
+
+    The chain keeps producing one slot per second (Shelley onwards) while
+    db-sync catches up, so only throughput above that closes the gap.
+    """
+    behind = now - tip_time
+    if behind <= 0:
+        return 0.0
+    if slots_per_s is None or slots_per_s <= 1.0:
+        return None
+    return behind / (slots_per_s - 1.0)
+
+
+class _Ewma:
+    """Exponentially weighted mean over irregularly spaced samples."""
+
+    def __init__(self, halflife_s: float) -> None:
+        self.halflife_s = halflife_s
+        self.value: float | None = None
+
+    def update(self, x: float, dt: float) -> None:
+        if self.value is None:
+            self.value = x
+        else:
+            alpha = 1.0 - 0.5 ** (dt / self.halflife_s)
+            self.value += alpha * (x - self.value)
+
+
+class RateTracker:
+    """Incremental rates for the live collector, O(1) per sample.
+
+    Chain rates are fed from tip probes and CPU cost from process samples.
+    A counter going backwards (rollback, db-sync restart) re-anchors that
+    series instead of producing a negative rate.
+    """
+
+    def __init__(self, halflife_s: float = DEFAULT_HALFLIFE_S) -> None:
+        self._slots = _Ewma(halflife_s)
+        self._blocks = _Ewma(halflife_s)
+        self._tx = _Ewma(halflife_s)
+        self._cpu = _Ewma(halflife_s)
+        self._chain: tuple[float, int, int, int | None] | None = None
+        self._cpu_anchor: tuple[float, int, float] | None = None
+
+    def update_chain(self, ts: float, slot: int, block: int, tx: int | None) -> None:
+        last, self._chain = self._chain, (ts, slot, block, tx)
+        if last is None:
+            return
+        t0, slot0, block0, tx0 = last
+        dt = ts - t0
+        if dt <= 0 or slot < slot0 or block < block0:
+            return
+        self._slots.update((slot - slot0) / dt, dt)
+        self._blocks.update((block - block0) / dt, dt)
+        if tx is not None and tx0 is not None and tx >= tx0:
+            self._tx.update((tx - tx0) / dt, dt)
+
+    def update_cpu(self, ts: float, slot: int, cpu_s: float) -> None:
+        anchor = self._cpu_anchor
+        if anchor is None or slot < anchor[1] or cpu_s < anchor[2]:
+            self._cpu_anchor = (ts, slot, cpu_s)
+            return
+        t0, slot0, cpu0 = anchor
+        # The slot only moves when the tip is re-probed; keep accumulating CPU until it does.
+        if slot == slot0:
+            return
+        self._cpu.update(1000.0 * (cpu_s - cpu0) / (slot - slot0), ts - t0)
+        self._cpu_anchor = (ts, slot, cpu_s)
+
+    def rates(self, now: float, tip_time: float | None) -> Rates:
+        slots = self._slots.value
+        return Rates(
+            slots_per_s=slots,
+            blocks_per_s=self._blocks.value,
+            tx_per_s=self._tx.value,
+            cpu_s_per_1k_slots=self._cpu.value,
+            eta_s=sync_eta(slots, tip_time, now) if tip_time is not None else None,
+        )
+
+
+def _per_second(counter: FloatArray, dt: FloatArray) -> FloatArray:
+    delta = np.diff(counter, prepend=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = delta / dt
+    rate[(delta < 0) | ~(dt > 0)] = np.nan
+    return rate
+
+
+def chain_rates(ts_s: FloatArray, slot: FloatArray, block: FloatArray, tx: FloatArray) -> dict[str, FloatArray]:
+    """Per-sample slots/s, blocks/s and tx/s between consecutive tip probes.
+
+    The first sample and intervals where a counter went backwards are NaN.
+    """
+    dt = np.diff(ts_s, prepend=np.nan)
+    return {
+        'slots_per_s': _per_second(slot, dt),
+        'blocks_per_s': _per_second(block, dt),
+        'tx_per_s': _per_second(tx, dt),
+    }
+
+
+def cpu_cost(slot: FloatArray, cpu_s: FloatArray) -> tuple[npt.NDArray[np.intp], FloatArray]:
+    """CPU seconds spent per 1000 slots between samples where the slot moved.
+
+    Returns the indices of those samples and the cost at each, NaN where
+    CPU time or slot went backwards.
+    """
+    idx = np.flatnonzero(np.concatenate(([True], np.diff(slot) != 0)))
+    slot, cpu_s = slot[idx], cpu_s[idx]
+    d_slot = np.diff(slot, prepend=np.nan)
+    d_cpu = np.diff(cpu_s, prepend=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cost = 1000.0 * d_cpu / d_slot
+    cost[(d_slot <= 0) | (d_cpu < 0) | np.isnan(d_slot)] = np.nan
+    return idx, cost
@@ -0,0 +1,59 @@
+"""On-disk size in bytes of every table of the db-sync database, split into heap, indexes and TOAST."""
+from dataclasses import dataclass
+
+from dbsync_monitoring.pg_session import PgSession
+
+# Size expressions per kind of relation: planner estimates from pg_class.relpages, which
+# VACUUM/ANALYZE keep current and which cost nothing to read, or exact sizes from the
+# file system. Exact heap + indexes + TOAST of a table add up to pg_total_relation_size.
+ESTIMATED_BYTES = {
+    'table': "c.relpages::bigint * current_setting('block_size')::bigint",
+    'index': "ic.relpages::bigint * current_setting('block_size')::bigint",
+    'toast': """(tc.relpages + COALESCE((SELECT SUM(x.relpages) FROM pg_index ti
+                                       JOIN pg_class x ON x.oid = ti.indexrelid
+                                       WHERE ti.indrelid = tc.oid), 0))::bigint
+                * current_setting('block_size')::bigint""",
+}
+EXACT_BYTES = {
+    'table': "pg_table_size(c.oid) - COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0)",
+    'index': "pg_table_size(ic.oid)",
+    'toast': "pg_total_relation_size(tc.oid)",
+}
+
+
+def _relations_sql(exact: bool) -> str:
+    size = EXACT_BYTES if exact else ESTIMATED_BYTES
+    return f"""
+      WITH t AS (
+        SELECT c.oid FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'm') AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+      )
+      SELECT c.relname, 'table', c.relname, {size['table']}, c.reltuples::bigint
+      FROM t JOIN pg_class c ON c.oid = t.oid
+      UNION ALL
+      SELECT ic.relname, 'index', c.relname, {size['index']}, ic.reltuples::bigint
+      FROM t JOIN pg_class c ON c.oid = t.oid
+      JOIN pg_index i ON i.indrelid = c.oid JOIN pg_class ic ON ic.oid = i.indexrelid
+      UNION ALL
+      SELECT tc.relname, 'toast', c.relname, {size['toast']}, tc.reltuples::bigint
+      FROM t JOIN pg_class c ON c.oid = t.oid JOIN pg_class tc ON tc.oid = c.reltoastrelid;
+    """
+
+
+@dataclass(frozen=True)
+class RelationSize:
+    """One heap, index or TOAST relation (TOAST including its index) of ``table_name``.
+
+    ``reltuples`` is the planner's row estimate, -1 or 0 for never analyzed relations.
+    """
+    relname: str
+    kind: str
+    table_name: str
+    bytes: int
+    reltuples: int
+
+
+def fetch_relation_sizes(session: PgSession, exact: bool = False) -> list[RelationSize]:
+    """Sizes of all relations of user tables; ``exact`` stats every file instead of using ``relpages``."""
+    return [RelationSize(relname, kind, table_name, int(size or 0), int(reltuples))
+            for relname, kind, table_name, size, reltuples in session.fetchall(_relations_sql(exact))]
@@ -0,0 +1,92 @@
+"""Fixed-capacity in-memory store of recent samples, one NumPy array per column."""
+import threading
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import numpy.typing as npt
+
+FloatArray = npt.NDArray[np.float64]
+
+
+class RingBuffer:
+    """The last ``capacity`` samples of a fixed set of float columns.
+
+    Storage is preallocated once. Every row is written twice, at ``i`` and
+    ``i + capacity``, so the newest ``n`` samples are always a contiguous
+    slice and ``view()``/``column()`` return views instead of copies. A view
+    of ``n`` rows stays valid for the next ``capacity - n`` appends. Missing
+    values are NaN.
+    """
+
+    def __init__(self, columns: Sequence[str], capacity: int) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.positions = {name: i for i, name in enumerate(self.columns)}
+        self._data: FloatArray = np.full((len(self.columns), 2 * capacity), np.nan)
+        self._row = np.empty(len(self.columns))
+        self._head = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, values: Mapping[str, float | None]) -> None:
+        """Add one sample; names not in ``columns`` are ignored."""
+        row = self._row
+        row.fill(np.nan)
+        for name, value in values.items():
+            i = self.positions.get(name)
+            if i is not None and value is not None:
+                row[i] = value
+        with self._lock:
+            self._data[:, self._head] = row
+            self._data[:, self._head + self.capacity] = row
+            self._head = (self._head + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, values: Mapping[str, npt.ArrayLike]) -> None:
+        """Add equally long arrays of samples at once, e.g. history read at startup."""
+        arrays = {name: np.asarray(a, dtype=np.float64) for name, a in values.items() if name in self.positions}
+        n = max((len(a) for a in arrays.values()), default=0)
+        if n == 0:
+            return
+        block = np.full((len(self.columns), n), np.nan)
+        for name, a in arrays.items():
+            block[self.positions[name]] = a
+        block = block[:, -self.capacity:]
+        n = block.shape[1]
+        with self._lock:
+            pos = (self._head + np.arange(n)) % self.capacity
+            self._data[:, pos] = block
+            self._data[:, pos + self.capacity] = block
+            self._head = (self._head + n) % self.capacity
+            self._count = min(self._count + n, self.capacity)
+
+    def view(self, n: int | None = None) -> FloatArray:
+        """The newest ``n`` samples (default all), oldest first, as a ``(columns, n)`` view."""
+        with self._lock:
+            n = self._count if n is None else min(n, self._count)
+            end = self._head + self.capacity
+            window: FloatArray = self._data[:, end - n:end]
+        return window
+
+    def after(self, name: str, value: float) -> FloatArray:
+        """View of the samples whose ``name`` is greater than ``value``; ``name`` must be ascending."""
+        window = self.view()
+        start = int(np.searchsorted(window[self.positions[name]], value, side='right'))
+        newer: FloatArray = window[:, start:]
+        return newer
+
+    def column(self, name: str, n: int | None = None) -> FloatArray:
+        values: FloatArray = self.view(n)[self.positions[name]]
+        return values
+
+    def latest(self) -> FloatArray | None:
+        """The newest sample across all columns, or ``None`` if empty."""
+        if self._count == 0:
+            return None
+        row: FloatArray = self.view(1)[:, 0]
+        return row
@@ -0,0 +1,254 @@
+"""Rollup and retention tiers for the raw metric tables.
+
+Closed minutes of ``memory_metrics``/``cpu_metrics`` are aggregated into
+``<table>_1m`` and closed hours of those into ``<table>_1h``, with min, max,
+mean and last value per metric. Raw rows and minute buckets are deleted once
+they are older than their retention window and have been rolled up; the hour
+tier is kept forever. Rows without a timestamp (recorded before schema
+migrations) cannot be bucketed and are left in the raw tables.
+
+The tiers are keyed on version and bucket only: the ``run_id`` and
+``phase`` of the raw rows are not kept. Readers tag buckets with the phase
+in effect at the bucket's start from the ``phases`` table
+(``queries.with_phases``), so a bucket in which db-sync restarted or left
+replay is attributed to one phase, and its min, max and mean mix both.
+
+The other per-sample tables are merged in place instead, so their readers
+need no tiers: rows older than the raw retention window become one row per
+minute, and rows older than the minute window one row per hour, for every
+version and key (e.g. device or table name).
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+
+from dbsync_monitoring.schema import migrate
+from dbsync_monitoring.stage_timer import StageTimer
+
+# Rolled up per version, without run_id and phase (see above).
+ROLLUP_TABLES = ('memory_metrics', 'cpu_metrics')
+
+# (tier suffix, bucket width in ms), finest first; the raw table is tier "" with width 0.
+TIERS: tuple[tuple[str, int], ...] = (('', 0), ('1m', 60_000), ('1h', 3_600_000))
+
+DAY_MS = 86_400_000
+
+# Tables merged in place: (key columns grouped on besides version_id, column -> aggregate).
+# 'sum' is for per-interval counters, 'mean' for gauges (weighted by interval_s), and
+# 'max'/'last' take the largest or the newest value of the bucket. A merged row's
+# ts_ms is the time of the newest row it replaces.
+MERGED_TABLES: dict[str, tuple[tuple[str, ...], dict[str, str]]] = {
+    'db_sync_version': ((), {'lateness_ms': 'max'}),
+    'pg_server_metrics': ((), {
+        'slot_no': 'last', 'interval_s': 'sum',
+        **dict.fromkeys(('xact_commit', 'blks_read', 'blks_hit', 'tup_inserted', 'tup_updated', 'tup_deleted',
+                         'temp_bytes', 'wal_bytes', 'checkpoints', 'buffers_checkpoint', 'buffers_backend',
+                         'io_read_bytes', 'io_write_bytes', 'lock_waits'), 'sum'),
+    }),
+    'pg_table_inserts': (('relname',), {'slot_no': 'last', 'interval_s': 'sum', 'inserts': 'sum'}),
+    'sync_progress': (('run_id', 'phase'), dict.fromkeys(
+        ('slot_no', 'block_no', 'tx_id', 'tip_time_ms', 'sync_percent'), 'last')),
+    'role_metrics': (('role',), {
+        'slot_no': 'last', 'interval_s': 'sum', 'n_procs': 'max', 'cpu_percent': 'mean', 'cpu_time': 'sum',
+        'rss': 'mean', 'uss': 'mean', 'pss': 'mean', 'read_bytes': 'sum', 'write_bytes': 'sum',
+    }),
+    'io_metrics': (('run_id', 'phase'), {
+        'slot_no': 'last', 'interval_s': 'sum',
+        **dict.fromkeys(('read_bytes', 'write_bytes', 'read_count', 'write_count', 'read_chars', 'write_chars'),
+                        'sum'),
+    }),
+    'disk_metrics': (('device', 'label'), {
+        'slot_no': 'last', 'interval_s': 'sum',
+        **dict.fromkeys(('reads', 'writes', 'read_bytes', 'write_bytes', 'busy_ms'), 'sum'),
+    }),
+    'relation_sizes': (('relname', 'kind', 'exact'), dict.fromkeys(
+        ('slot_no', 'epoch_no', 'tx_id', 'table_name', 'bytes', 'reltuples'), 'last')),
+    'collector_stats': (('stage',), {
+        'interval_s': 'sum', 'count': 'sum', 'total_ms': 'sum',
+        **dict.fromkeys(('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'), 'max'),
+    }),
+}
+
+
+def tier_table(table: str, tier: str) -> str:
+    return f"{table}_{tier}" if tier else table
+
+
+def metric_columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    """Metric names aggregated in the rollup tables of ``table``."""
+    cols = [row[1] for row in conn.execute(f"PRAGMA table_info({table}_1m)")]
+    return [c[:-len('_mean')] for c in cols if c.endswith('_mean')]
+
+
+def _watermark(conn: sqlite3.Connection, table: str, width: int) -> int | None:
+    """End of the newest bucket already rolled up, in ms."""
+    row = conn.execute(f"SELECT MAX(bucket_ms) FROM {table}").fetchone()
+    return int(row[0]) + width if row and row[0] is not None else None
+
+
+def _rollup_raw(conn: sqlite3.Connection, table: str, width: int, until: int) -> None:
+    target = tier_table(table, TIERS[1][0])
+    since = _watermark(conn, target, width) or 0
+    metrics = metric_columns(conn, table)
+    aggregates = ", ".join(
+        f"MIN({m}), MAX({m}), AVG({m}), MAX(CASE WHEN rn = 1 THEN {m} END)" for m in metrics
+    )
+    targets = ", ".join(f"{m}_min, {m}_max, {m}_mean, {m}_last" for m in metrics)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO {target}
+          (bucket_ms, version_id, n, slot_min, slot_max, slot_last, {targets})
+        SELECT bucket_ms, version_id, COUNT(*), MIN(slot_no), MAX(slot_no),
+               MAX(CASE WHEN rn = 1 THEN slot_no END), {aggregates}
+        FROM (
+          SELECT *, ts_ms - ts_ms % {width} AS bucket_ms,
+                 ROW_NUMBER() OVER (PARTITION BY version_id, ts_ms - ts_ms % {width} ORDER BY ts_ms DESC) AS rn
+          FROM {table}
+          WHERE ts_ms >= ? AND ts_ms < ? AND version_id IS NOT NULL
+        )
+        GROUP BY version_id, bucket_ms''', (since, until))
+
+
+def _rollup_tier(conn: sqlite3.Connection, table: str, source_tier: str, target_tier: str,
+                 width: int, until: int) -> None:
+    source = tier_table(table, source_tier)
+    target = tier_table(table, target_tier)
+    since = _watermark(conn, target, width) or 0
+    metrics = metric_columns(conn, table)
+    aggregates = ", ".join(
+        f"MIN({m}_min), MAX({m}_max), "
+        f"SUM({m}_mean * n) / SUM(CASE WHEN {m}_mean IS NOT NULL THEN n END), "
+        f"MAX(CASE WHEN rn = 1 THEN {m}_last END)"
+        for m in metrics
+    )
+    targets = ", ".join(f"{m}_min, {m}_max, {m}_mean, {m}_last" for m in metrics)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO {target}
+          (bucket_ms, version_id, n, slot_min, slot_max, slot_last, {targets})
+        SELECT parent_ms, version_id, SUM(n), MIN(slot_min), MAX(slot_max),
+               MAX(CASE WHEN rn = 1 THEN slot_last END), {aggregates}
+        FROM (
+          SELECT *, bucket_ms - bucket_ms % {width} AS parent_ms,
+                 ROW_NUMBER() OVER (PARTITION BY version_id, bucket_ms - bucket_ms % {width}
+                                    ORDER BY bucket_ms DESC) AS rn
+          FROM {source}
+          WHERE bucket_ms >= ? AND bucket_ms < ?
+        )
+        GROUP BY version_id, parent_ms''', (since, until))
+
+
+def _aggregate(column: str, how: str) -> str:
+    if how == 'sum':
+        return f"SUM({column})"
+    if how == 'mean':
+        return f"SUM({column} * interval_s) / SUM(CASE WHEN {column} IS NOT NULL THEN interval_s END)"
+    if how == 'max':
+        return f"MAX({column})"
+    if how == 'last':
+        return f"MAX(CASE WHEN rn = 1 THEN {column} END)"
+    raise ValueError(f"Unknown aggregate {how!r} for {column}")
+
+
+def _merge(conn: sqlite3.Connection, table: str, tier: str, width: int, until: int) -> None:
+    """Replace the rows of ``table`` before ``until`` not merged yet by one row per ``width`` bucket and key."""
+    row = conn.execute("SELECT until_ms FROM merge_watermarks WHERE table_name = ? AND tier = ?",
+                       (table, tier)).fetchone()
+    since = int(row[0]) if row else 0
+    if until <= since:
+        return
+    keys, aggregates = MERGED_TABLES[table]
+    group = ", ".join(("version_id", *keys))
+    bucket = f"ts_ms - ts_ms % {width}"
+    columns = ", ".join(("ts_ms", "version_id", *keys, *aggregates))
+    merged = ", ".join(f"{_aggregate(c, how)} AS {c}" for c, how in aggregates.items())
+    conn.execute(f'''
+        CREATE TEMP TABLE merged AS
+        SELECT MAX(ts_ms) AS ts_ms, {group}, {merged}
+        FROM (
+          SELECT *, ROW_NUMBER() OVER (PARTITION BY {group}, {bucket} ORDER BY ts_ms DESC) AS rn
+          FROM {table}
+          WHERE ts_ms >= ? AND ts_ms < ?
+        )
+        GROUP BY {group}, {bucket}''', (since, until))
+    conn.execute(f"DELETE FROM {table} WHERE ts_ms >= ? AND ts_ms < ?", (since, until))
+    conn.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM merged")
+    conn.execute("DROP TABLE merged")
+    conn.execute("INSERT OR REPLACE INTO merge_watermarks VALUES (?, ?, ?)", (table, tier, until))
+
+
+def compact(db_file: str, raw_retention_ms: int = 7 * DAY_MS, minute_retention_ms: int = 90 * DAY_MS,
+            grace_ms: int = 300_000, now_ms: int | None = None) -> None:
+    """Roll up closed buckets and prune rows past their retention window.
+
+    ``grace_ms`` delays rolling up a bucket so samples still buffered by the
+    writer land in it first.
+    """
+    now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+    (_, _), (minute, minute_ms), (hour, hour_ms) = TIERS
+    with sqlite3.connect(db_file, timeout=30) as conn:
+        for table in ROLLUP_TABLES:
+            closed = now_ms - grace_ms
+            _rollup_raw(conn, table, minute_ms, closed - closed % minute_ms)
+            _rollup_tier(conn, table, minute, hour, hour_ms, closed - closed % hour_ms)
+
+            # Never prune rows that are not yet covered by the next tier.
+            minute_done = _watermark(conn, tier_table(table, minute), minute_ms) or 0
+            hour_done = _watermark(conn, tier_table(table, hour), hour_ms) or 0
+            if raw_retention_ms > 0:
+                conn.execute(f"DELETE FROM {table} WHERE ts_ms < ?",
+                             (min(now_ms - raw_retention_ms, minute_done),))
+            if minute_retention_ms > 0:
+                conn.execute(f"DELETE FROM {tier_table(table, minute)} WHERE bucket_ms + ? <= ?",
+                             (minute_ms, min(now_ms - minute_retention_ms, hour_done)))
+
+        for table in MERGED_TABLES:
+            for tier, width, retention_ms in ((minute, minute_ms, raw_retention_ms),
+                                              (hour, hour_ms, minute_retention_ms)):
+                if retention_ms > 0:
+                    cutoff = now_ms - retention_ms
+                    _merge(conn, table, tier, width, cutoff - cutoff % width)
+
+
+class Compactor(threading.Thread):
+    """Background thread running ``compact`` every ``interval`` seconds.
+
+    With ``stages``, every pass is timed as the ``compact`` stage.
+    """
+
+    def __init__(self, db_file: str, interval: float = 600.0,
+                 raw_retention_ms: int = 7 * DAY_MS, minute_retention_ms: int = 90 * DAY_MS,
+                 stages: StageTimer | None = None) -> None:
+        super().__init__(name="metrics-compactor", daemon=True)
+        self.db_file = db_file
+        self.interval = interval
+        self.raw_retention_ms = raw_retention_ms
+        self.minute_retention_ms = minute_retention_ms
+        self.stages = stages
+        self._stop_event = threading.Event()
+
+    def compact_once(self) -> None:
+        try:
+            with self.stages.stage('compact') if self.stages else nullcontext():
+                compact(self.db_file, self.raw_retention_ms, self.minute_retention_ms)
+        except sqlite3.Error as e:
+            print(f"Compaction failed: {e}")
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.compact_once()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll up and prune a metrics SQLite file.")
+    parser.add_argument("sqlite_db", help="Path to the SQLite file")
+    parser.add_argument("--raw-retention-days", type=float, default=7.0,
+                        help="Days of raw samples to keep (0 keeps all)")
+    parser.add_argument("--minute-retention-days", type=float, default=90.0,
+                        help="Days of per-minute aggregates to keep (0 keeps all)")
+    args = parser.parse_args()
+    migrate(args.sqlite_db)
+    compact(args.sqlite_db, int(args.raw_retention_days * DAY_MS), int(args.minute_retention_days * DAY_MS))
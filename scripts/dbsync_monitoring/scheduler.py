@@ -0,0 +1,82 @@
+"""Fixed-rate asyncio scheduler for the metric collectors."""
+import asyncio
+import math
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Tick:
+    """When a collection actually ran, how far behind its schedule, and how
+    many ticks were dropped before it because the previous one overran."""
+    ts: float
+    lateness: float
+    skipped: int
+
+    @property
+    def ts_ms(self) -> int:
+        return int(self.ts * 1000)
+
+    @property
+    def lateness_ms(self) -> int:
+        return int(self.lateness * 1000)
+
+
+@dataclass
+class Source:
+    """A blocking collector run every ``interval`` seconds."""
+    name: str
+    interval: float
+    collect: Callable[[Tick], None]
+
+
+class Scheduler:
+    """Run every source on its own fixed cadence.
+
+    Due times are anchored to the start of the run (``start + n * interval``)
+    rather than to the end of the previous collection, so a slow collection
+    does not shift every later sample. Ticks that are missed entirely are
+    skipped and counted. Collectors run in a thread pool, one task per
+    source, so a slow Postgres query never delays process sampling.
+    """
+
+    def __init__(self, sources: list[Source]) -> None:
+        self.sources = sources
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop: asyncio.Event | None = None
+
+    async def _run_source(self, source: Source, executor: ThreadPoolExecutor, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        n = skipped = 0
+        while not stop.is_set():
+            due = start + n * source.interval
+            delay = due - loop.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(stop.wait(), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+            tick = Tick(ts=time.time(), lateness=loop.time() - due, skipped=skipped)
+            try:
+                await loop.run_in_executor(executor, source.collect, tick)
+            except Exception as e:
+                print(f"Collector {source.name} failed: {e}")
+            # Next due time on the original grid, past any ticks the collection overran.
+            next_n = max(n + 1, math.floor((loop.time() - start) / source.interval) + 1)
+            skipped = next_n - n - 1
+            n = next_n
+
+    async def run(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        with ThreadPoolExecutor(max_workers=len(self.sources), thread_name_prefix="collector") as executor:
+            await asyncio.gather(*(self._run_source(s, executor, self._stop) for s in self.sources))
+
+    def stop(self) -> None:
+        """Stop all sources; safe to call from any thread."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
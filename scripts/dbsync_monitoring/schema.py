@@ -0,0 +1,359 @@
+"""Versioned schema migrations for the metrics SQLite databases.
+
+The schema version is kept in ``PRAGMA user_version``; each migration step
+runs in its own transaction together with the version bump, so an
+interrupted upgrade leaves the file at the previous version. Timestamps
+are stored as ``ts_ms``: Unix time in milliseconds (UTC).
+"""
+import argparse
+import sqlite3
+from collections.abc import Callable, Sequence
+
+Migration = Callable[[sqlite3.Connection], None]
+
+# ISO text written by datetime.now().isoformat() in local time -> Unix ms.
+ISO_TO_TS_MS = "CAST(ROUND((julianday({col}, 'utc') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _create_legacy_process_tables(conn: sqlite3.Connection) -> None:
+    """Tables as created by the first releases of db-sync-process-monitor.py."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS memory_metrics
+                    (slot_no INTEGER, rss REAL, vms REAL, uss REAL,
+                     pss REAL, swap REAL, shared REAL, version TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS cpu_metrics
+                    (slot_no INTEGER, cpu_percent REAL, user_time REAL,
+                     system_time REAL, children_user REAL, children_system REAL,
+                     iowait REAL, ctx_switches INTEGER, interrupts INTEGER,
+                     version TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS db_sync_version
+                    (timestamp TEXT, version TEXT)''')
+
+
+def _normalize_process_tables(conn: sqlite3.Connection) -> None:
+    """Move version strings to a dimension table and add integer timestamps and indexes."""
+    conn.execute('''CREATE TABLE versions
+                    (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)''')
+    conn.execute('''INSERT OR IGNORE INTO versions (name)
+                    SELECT version FROM db_sync_version WHERE version IS NOT NULL
+                    GROUP BY version ORDER BY MIN(timestamp)''')
+    for table in ('memory_metrics', 'cpu_metrics'):
+        conn.execute(f'''INSERT OR IGNORE INTO versions (name)
+                         SELECT DISTINCT version FROM {table} WHERE version IS NOT NULL''')
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+
+    conn.execute('''CREATE TABLE memory_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, rss REAL, vms REAL, uss REAL,
+                     pss REAL, swap REAL, shared REAL)''')
+    # Rows written before this migration carry no timestamp, so ts_ms stays NULL for them.
+    conn.execute('''INSERT INTO memory_metrics
+                    SELECT NULL, v.id, m.slot_no, m.rss, m.vms, m.uss, m.pss, m.swap, m.shared
+                    FROM memory_metrics_old m LEFT JOIN versions v ON v.name = m.version
+                    ORDER BY m.rowid''')
+    conn.execute('''CREATE TABLE cpu_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, cpu_percent REAL, user_time REAL,
+                     system_time REAL, children_user REAL, children_system REAL,
+                     iowait REAL, ctx_switches INTEGER, interrupts INTEGER)''')
+    conn.execute('''INSERT INTO cpu_metrics
+                    SELECT NULL, v.id, c.slot_no, c.cpu_percent, c.user_time, c.system_time,
+                           c.children_user, c.children_system, c.iowait, c.ctx_switches, c.interrupts
+                    FROM cpu_metrics_old c LEFT JOIN versions v ON v.name = c.version
+                    ORDER BY c.rowid''')
+
+    conn.execute("ALTER TABLE db_sync_version RENAME TO db_sync_version_old")
+    conn.execute('''CREATE TABLE db_sync_version
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id))''')
+    conn.execute(f'''INSERT INTO db_sync_version
+                     SELECT {ISO_TO_TS_MS.format(col="d.timestamp")}, v.id
+                     FROM db_sync_version_old d LEFT JOIN versions v ON v.name = d.version
+                     ORDER BY d.rowid''')
+
+    for table in ('memory_metrics', 'cpu_metrics', 'db_sync_version'):
+        conn.execute(f"DROP TABLE {table}_old")
+    conn.execute("CREATE INDEX memory_metrics_version_slot ON memory_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX memory_metrics_ts ON memory_metrics (ts_ms)")
+    conn.execute("CREATE INDEX cpu_metrics_version_slot ON cpu_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX cpu_metrics_ts ON cpu_metrics (ts_ms)")
+    conn.execute("CREATE INDEX db_sync_version_version_ts ON db_sync_version (version_id, ts_ms)")
+
+
+def _create_legacy_simple_tables(conn: sqlite3.Connection) -> None:
+    """Tables as created by the first releases of simple-db-sync-monitor.py."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS memory_metrics
+                    (timestamp TEXT, rss REAL, vms REAL, uss REAL,
+                     pss REAL, swap REAL, shared REAL, process TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS cpu_metrics
+                    (timestamp TEXT, cpu_percent REAL, user_time REAL,
+                     system_time REAL, children_user REAL, children_system REAL,
+                     iowait REAL, ctx_switches INTEGER, interrupts INTEGER,
+                     process TEXT)''')
+
+
+def _normalize_simple_tables(conn: sqlite3.Connection) -> None:
+    """Replace ISO text timestamps with indexed integer ones."""
+    for table in ('memory_metrics', 'cpu_metrics'):
+        conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute('''CREATE TABLE memory_metrics
+                    (ts_ms INTEGER NOT NULL, rss REAL, vms REAL, uss REAL,
+                     pss REAL, swap REAL, shared REAL, process TEXT)''')
+    conn.execute(f'''INSERT INTO memory_metrics
+                     SELECT {ISO_TO_TS_MS.format(col="timestamp")}, rss, vms, uss, pss, swap, shared, process
+                     FROM memory_metrics_old WHERE timestamp IS NOT NULL ORDER BY rowid''')
+    conn.execute('''CREATE TABLE cpu_metrics
+                    (ts_ms INTEGER NOT NULL, cpu_percent REAL, user_time REAL,
+                     system_time REAL, children_user REAL, children_system REAL,
+                     iowait REAL, ctx_switches INTEGER, interrupts INTEGER,
+                     process TEXT)''')
+    conn.execute(f'''INSERT INTO cpu_metrics
+                     SELECT {ISO_TO_TS_MS.format(col="timestamp")}, cpu_percent, user_time, system_time,
+                            children_user, children_system, iowait, ctx_switches, interrupts, process
+                     FROM cpu_metrics_old WHERE timestamp IS NOT NULL ORDER BY rowid''')
+    for table in ('memory_metrics', 'cpu_metrics'):
+        conn.execute(f"DROP TABLE {table}_old")
+    conn.execute("CREATE INDEX memory_metrics_ts ON memory_metrics (ts_ms)")
+    conn.execute("CREATE INDEX cpu_metrics_ts ON cpu_metrics (ts_ms)")
+
+
+def _create_rollup_tables(conn: sqlite3.Connection) -> None:
+    """Per-minute and per-hour aggregates of the raw metric tables."""
+    metrics = {
+        'memory_metrics': ('rss', 'vms', 'uss', 'pss', 'swap', 'shared'),
+        'cpu_metrics': ('cpu_percent', 'user_time', 'system_time', 'children_user',
+                        'children_system', 'iowait', 'ctx_switches', 'interrupts'),
+    }
+    for table, columns in metrics.items():
+        aggregates = ", ".join(f"{c}_{agg} REAL" for c in columns for agg in ('min', 'max', 'mean', 'last'))
+        for tier in ('1m', '1h'):
+            conn.execute(f'''CREATE TABLE {table}_{tier}
+                             (bucket_ms INTEGER NOT NULL, version_id INTEGER NOT NULL REFERENCES versions (id),
+                              n INTEGER NOT NULL, slot_min INTEGER, slot_max INTEGER, slot_last INTEGER,
+                              {aggregates},
+                              PRIMARY KEY (version_id, bucket_ms))''')
+            conn.execute(f"CREATE INDEX {table}_{tier}_bucket ON {table}_{tier} (bucket_ms)")
+
+
+def _add_sample_lateness(conn: sqlite3.Connection) -> None:
+    """Record how late each scheduled sample ran."""
+    conn.execute("ALTER TABLE db_sync_version ADD COLUMN lateness_ms INTEGER")
+
+
+def _create_pg_stats_tables(conn: sqlite3.Connection) -> None:
+    """Per-interval deltas of Postgres server and per-table counters."""
+    conn.execute('''CREATE TABLE pg_server_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, interval_s REAL,
+                     xact_commit INTEGER, blks_read INTEGER, blks_hit INTEGER,
+                     tup_inserted INTEGER, tup_updated INTEGER, tup_deleted INTEGER,
+                     temp_bytes INTEGER, wal_bytes INTEGER, checkpoints INTEGER,
+                     buffers_checkpoint INTEGER, buffers_backend INTEGER,
+                     io_read_bytes INTEGER, io_write_bytes INTEGER, lock_waits INTEGER)''')
+    conn.execute("CREATE INDEX pg_server_metrics_version_slot ON pg_server_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX pg_server_metrics_ts ON pg_server_metrics (ts_ms)")
+    conn.execute('''CREATE TABLE pg_table_inserts
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, interval_s REAL, relname TEXT, inserts INTEGER)''')
+    conn.execute("CREATE INDEX pg_table_inserts_version_slot ON pg_table_inserts (version_id, slot_no)")
+
+
+def _create_sync_progress_table(conn: sqlite3.Connection) -> None:
+    """Chain tip at every probe, the input for throughput rates."""
+    conn.execute('''CREATE TABLE sync_progress
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, block_no INTEGER, tx_id INTEGER,
+                     tip_time_ms INTEGER, sync_percent REAL)''')
+    conn.execute("CREATE INDEX sync_progress_version_ts ON sync_progress (version_id, ts_ms)")
+
+
+def _create_role_metrics_table(conn: sqlite3.Connection) -> None:
+    """Per-role sums over db-sync, its children, Postgres and cardano-node."""
+    conn.execute('''CREATE TABLE role_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, interval_s REAL, role TEXT, n_procs INTEGER,
+                     cpu_percent REAL, cpu_time REAL, rss REAL, uss REAL, pss REAL,
+                     read_bytes INTEGER, write_bytes INTEGER)''')
+    conn.execute("CREATE INDEX role_metrics_version_slot ON role_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX role_metrics_ts ON role_metrics (ts_ms)")
+
+
+def _create_io_tables(conn: sqlite3.Connection) -> None:
+    """Per-interval I/O of the db-sync process and of the devices it uses."""
+    conn.execute('''CREATE TABLE io_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, interval_s REAL,
+                     read_bytes INTEGER, write_bytes INTEGER, read_count INTEGER, write_count INTEGER,
+                     read_chars INTEGER, write_chars INTEGER)''')
+    conn.execute("CREATE INDEX io_metrics_version_slot ON io_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX io_metrics_ts ON io_metrics (ts_ms)")
+    conn.execute('''CREATE TABLE disk_metrics
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, interval_s REAL, device TEXT, label TEXT,
+                     reads INTEGER, writes INTEGER, read_bytes INTEGER, write_bytes INTEGER, busy_ms INTEGER)''')
+    conn.execute("CREATE INDEX disk_metrics_version_slot ON disk_metrics (version_id, slot_no)")
+    conn.execute("CREATE INDEX disk_metrics_ts ON disk_metrics (ts_ms)")
+
+
+def _create_collector_stats_table(conn: sqlite3.Connection) -> None:
+    """Per-interval latency summary of each collection stage of the monitor itself."""
+    conn.execute('''CREATE TABLE collector_stats
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     interval_s REAL, stage TEXT, count INTEGER, total_ms REAL,
+                     p50_ms REAL, p95_ms REAL, p99_ms REAL, max_ms REAL)''')
+    conn.execute("CREATE INDEX collector_stats_version_ts ON collector_stats (version_id, ts_ms)")
+
+
+def _create_relation_sizes_table(conn: sqlite3.Connection) -> None:
+    """Size history of every table, index and TOAST relation of the db-sync database."""
+    conn.execute('''CREATE TABLE relation_sizes
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, epoch_no INTEGER, tx_id INTEGER, exact INTEGER,
+                     relname TEXT, kind TEXT, table_name TEXT, bytes INTEGER, reltuples INTEGER)''')
+    conn.execute("CREATE INDEX relation_sizes_version_ts ON relation_sizes (version_id, ts_ms)")
+
+
+def _create_events_table(conn: sqlite3.Connection) -> None:
+    """Leaks, stalls, rollbacks and throughput changes detected while collecting."""
+    conn.execute('''CREATE TABLE events
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     slot_no INTEGER, kind TEXT, value REAL, message TEXT)''')
+    conn.execute("CREATE INDEX events_version_ts ON events (version_id, ts_ms)")
+
+
+def _add_runs_and_phases(conn: sqlite3.Connection) -> None:
+    """db-sync runs (one per process) and the phase of every sample: sync, replay, stall or down."""
+    conn.execute('''CREATE TABLE runs
+                    (id INTEGER PRIMARY KEY, version_id INTEGER REFERENCES versions (id),
+                     pid INTEGER, create_time_ms INTEGER, first_ts_ms INTEGER,
+                     UNIQUE (version_id, pid, create_time_ms))''')
+    conn.execute('''CREATE TABLE phases
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     run_id INTEGER REFERENCES runs (id), phase TEXT, slot_no INTEGER)''')
+    conn.execute("CREATE INDEX phases_version_ts ON phases (version_id, ts_ms)")
+    for table in ('memory_metrics', 'cpu_metrics', 'io_metrics', 'sync_progress'):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN run_id INTEGER")
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN phase TEXT")
+
+
+def _create_merge_watermarks(conn: sqlite3.Connection) -> None:
+    """How far each table compacted in place has been merged into each tier."""
+    conn.execute('''CREATE TABLE merge_watermarks
+                    (table_name TEXT NOT NULL, tier TEXT NOT NULL, until_ms INTEGER NOT NULL,
+                     PRIMARY KEY (table_name, tier))''')
+
+
+def _index_pg_table_inserts_ts(conn: sqlite3.Connection) -> None:
+    """Time index for merging old per-table inserts."""
+    conn.execute("CREATE INDEX pg_table_inserts_ts ON pg_table_inserts (ts_ms)")
+
+
+def _index_db_sync_version_ts(conn: sqlite3.Connection) -> None:
+    """Time index for merging old samples; the existing index leads with version_id."""
+    conn.execute("CREATE INDEX db_sync_version_ts ON db_sync_version (ts_ms)")
+
+
+def _index_sync_progress_ts(conn: sqlite3.Connection) -> None:
+    """Time index for merging old tip probes."""
+    conn.execute("CREATE INDEX sync_progress_ts ON sync_progress (ts_ms)")
+
+
+def _number_runs_per_version(conn: sqlite3.Connection) -> None:
+    """Key runs on (version_id, id), so monitors of different versions sharing a file never hand out the same id."""
+    conn.execute('''CREATE TABLE runs_new
+                    (version_id INTEGER REFERENCES versions (id), id INTEGER,
+                     pid INTEGER, create_time_ms INTEGER, first_ts_ms INTEGER,
+                     PRIMARY KEY (version_id, id), UNIQUE (version_id, pid, create_time_ms))''')
+    conn.execute("INSERT INTO runs_new SELECT version_id, id, pid, create_time_ms, first_ts_ms FROM runs")
+    conn.execute('''CREATE TABLE phases_new
+                    (ts_ms INTEGER, version_id INTEGER REFERENCES versions (id),
+                     run_id INTEGER, phase TEXT, slot_no INTEGER,
+                     FOREIGN KEY (version_id, run_id) REFERENCES runs (version_id, id))''')
+    conn.execute("INSERT INTO phases_new SELECT ts_ms, version_id, run_id, phase, slot_no FROM phases ORDER BY rowid")
+    conn.execute("DROP TABLE phases")
+    conn.execute("DROP TABLE runs")
+    conn.execute("ALTER TABLE runs_new RENAME TO runs")
+    conn.execute("ALTER TABLE phases_new RENAME TO phases")
+    conn.execute("CREATE INDEX phases_version_ts ON phases (version_id, ts_ms)")
+
+
+def _index_relation_sizes_ts(conn: sqlite3.Connection) -> None:
+    """Time index for merging old size snapshots."""
+    conn.execute("CREATE INDEX relation_sizes_ts ON relation_sizes (ts_ms)")
+
+
+def _index_collector_stats_ts(conn: sqlite3.Connection) -> None:
+    """Time index for merging old collector latency summaries."""
+    conn.execute("CREATE INDEX collector_stats_ts ON collector_stats (ts_ms)")
+
+
+PROCESS_MONITOR_MIGRATIONS: list[Migration] = [
+    _create_legacy_process_tables,
+    _normalize_process_tables,
+    _create_rollup_tables,
+    _add_sample_lateness,
+    _create_pg_stats_tables,
+    _create_sync_progress_table,
+    _create_role_metrics_table,
+    _create_io_tables,
+    _create_collector_stats_table,
+    _create_relation_sizes_table,
+    _create_events_table,
+    _add_runs_and_phases,
+    _create_merge_watermarks,
+    _index_pg_table_inserts_ts,
+    _index_db_sync_version_ts,
+    _index_sync_progress_ts,
+    _number_runs_per_version,
+    _index_relation_sizes_ts,
+    _index_collector_stats_ts,
+]
+
+SIMPLE_MONITOR_MIGRATIONS: list[Migration] = [
+    _create_legacy_simple_tables,
+    _normalize_simple_tables,
+]
+
+
+def migrate(db_file: str, migrations: Sequence[Migration] = PROCESS_MONITOR_MIGRATIONS) -> int:
+    """Apply pending migrations to ``db_file`` and return its schema version."""
+    conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+    try:
+        version = int(conn.execute("PRAGMA user_version").fetchone()[0])
+        for target, step in enumerate(migrations[version:], start=version + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            version = target
+        return version
+    finally:
+        conn.close()
+
+
+def known_runs(db_file: str, version: int) -> tuple[dict[tuple[int, int], int], int]:
+    """Ids of the registered runs of ``version`` by (pid, create_time_ms), and the largest of them."""
+    with sqlite3.connect(db_file, timeout=30) as conn:
+        rows = conn.execute("SELECT pid, create_time_ms, id FROM runs WHERE version_id = ?", (version,)).fetchall()
+        last = conn.execute("SELECT MAX(id) FROM runs WHERE version_id = ?", (version,)).fetchone()[0]
+    return {(int(pid), int(ms)): int(run) for pid, ms, run in rows}, int(last or 0)
+
+
+def version_id(db_file: str, name: str) -> int:
+    """Return the id of ``name`` in the versions table, registering it if needed."""
+    with sqlite3.connect(db_file, timeout=30) as conn:
+        conn.execute("INSERT OR IGNORE INTO versions (name) VALUES (?)", (name,))
+        row = conn.execute("SELECT id FROM versions WHERE name = ?", (name,)).fetchone()
+    return int(row[0])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upgrade a metrics SQLite file to the latest schema in place.")
+    parser.add_argument("sqlite_db", help="Path to the SQLite file")
+    parser.add_argument("--simple", action="store_true",
+                        help="File was written by simple-db-sync-monitor.py")
+    args = parser.parse_args()
+    migrations = SIMPLE_MONITOR_MIGRATIONS if args.simple else PROCESS_MONITOR_MIGRATIONS
+    print(f"{args.sqlite_db}: schema version {migrate(args.sqlite_db, migrations)}")
@@ -0,0 +1,101 @@
+"""Latency histograms of the collector's stages (process scan, Postgres queries, /proc reads, SQLite writes)."""
+import bisect
+import threading
+import time
+from types import TracebackType
+
+# Bucket upper bounds in seconds; a last, unbounded bucket catches everything slower.
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observed durations per bucket of ``BUCKETS``, plus their sum and maximum."""
+
+    __slots__ = ('count', 'counts', 'max', 'total')
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def copy(self) -> 'Histogram':
+        other = Histogram()
+        other.counts = self.counts.copy()
+        other.count, other.total, other.max = self.count, self.total, self.max
+        return other
+
+    def quantile(self, q: float) -> float | None:
+        """Estimate of the ``q`` quantile, interpolated linearly inside its bucket."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+
+class _Stage:
+    __slots__ = ('name', 'start', 'timer')
+
+    def __init__(self, timer: 'StageTimer', name: str) -> None:
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc: BaseException | None,
+                 tb: TracebackType | None) -> None:
+        self.timer.observe(self.name, time.perf_counter() - self.start)
+
+
+class StageTimer:
+    """Per-stage histograms since start and since the last ``take_interval()``.
+
+    ``with timer.stage('memory'): ...`` times one stage run; collectors in
+    different threads may share one timer.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cumulative: dict[str, Histogram] = {}
+        self._interval: dict[str, Histogram] = {}
+        self._interval_start = time.monotonic()
+
+    def stage(self, name: str) -> _Stage:
+        return _Stage(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        with self._lock:
+            for histograms in (self._cumulative, self._interval):
+                hist = histograms.get(name)
+                if hist is None:
+                    hist = histograms[name] = Histogram()
+                hist.observe(seconds)
+
+    def snapshot(self) -> dict[str, Histogram]:
+        """Copies of the histograms since start."""
+        with self._lock:
+            return {name: hist.copy() for name, hist in self._cumulative.items()}
+
+    def take_interval(self) -> tuple[float, dict[str, Histogram]]:
+        """Seconds since the previous call and the histograms of that interval, which start over."""
+        with self._lock:
+            now = time.monotonic()
+            interval, self._interval_start = now - self._interval_start, now
+            histograms, self._interval = self._interval, {}
+        return interval, histograms
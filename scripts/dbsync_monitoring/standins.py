@@ -0,0 +1,105 @@
+"""Synthetic stand-ins for cardano-db-sync and its Postgres tip, for benchmarking the monitor.
+
+The process stand-in runs as ``python -m dbsync_monitoring.standins``: it
+holds a configurable amount of touched memory, optionally growing, burns a
+fraction of one core and maps many small regions so ``smaps`` is as long as
+a real db-sync's.
+"""
+import argparse
+import mmap
+import os
+import subprocess
+import sys
+import time
+from typing import Any
+
+from dbsync_monitoring.pg_session import PgSession
+from dbsync_monitoring.proc_sampler import MB
+from dbsync_monitoring.tip import GENESIS_SQL, TIP_SQL
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StandInTipSession(PgSession):
+    """Answers the tip probe's queries from a chain advancing ``slots_per_s`` slots per second.
+
+    Every query sleeps ``latency_ms`` in place of the Postgres round trip;
+    anything other than the genesis and tip queries returns no rows.
+    """
+
+    def __init__(self, slots_per_s: float = 50.0, behind_s: float = 90 * 86400, latency_ms: float = 1.0,
+                 blocks_per_slot: float = 0.05, tx_per_block: float = 10.0, epoch_slots: int = 432_000) -> None:
+        super().__init__(host='stand-in', port=0, user='bench', dbname='bench')
+        self.slots_per_s = slots_per_s
+        self.latency_ms = latency_ms
+        self.blocks_per_slot = blocks_per_slot
+        self.tx_per_block = tx_per_block
+        self.epoch_slots = epoch_slots
+        self.started = time.time()
+        # Genesis far enough back that the chain is still behind wall-clock time when the run starts.
+        self.genesis = self.started - behind_s
+
+    def _execute(self, sql: str, params: Any, fetch_all: bool) -> Any:
+        with self._lock:
+            time.sleep(self.latency_ms / 1000)
+            now = time.time()
+            if sql == GENESIS_SQL:
+                row: tuple[Any, ...] | None = (self.genesis,)
+            elif sql == TIP_SQL:
+                slot = int((now - self.started) * self.slots_per_s)
+                block = int(slot * self.blocks_per_slot)
+                tip_time = self.genesis + slot
+                row = (slot, block, slot // self.epoch_slots, int(block * self.tx_per_block), tip_time,
+                       100 * (tip_time - self.genesis) / (now - self.genesis))
+            else:
+                row = None
+            if fetch_all:
+                return [row] if row else []
+            return row
+
+
+def start_standin_process(tag: str, rss_mb: float = 512.0, growth_mb_per_min: float = 0.0,
+                          cpu: float = 0.5, mappings: int = 2000) -> subprocess.Popen[bytes]:
+    """Start a stand-in whose command line contains ``tag``, for ``ProcessTracker(tag)``."""
+    return subprocess.Popen(
+        [sys.executable, '-m', 'dbsync_monitoring.standins', '--tag', tag, '--rss-mb', str(rss_mb),
+         '--growth-mb-per-min', str(growth_mb_per_min), '--cpu', str(cpu), '--mappings', str(mappings)],
+        cwd=SCRIPTS_DIR
+    )
+
+
+def run_standin(rss_mb: float, growth_mb_per_min: float, cpu: float, mappings: int, period: float = 0.1) -> None:
+    """Hold ``rss_mb`` of resident memory, grow it and keep ``cpu`` of one core busy until killed."""
+    page = mmap.PAGESIZE
+    # Alternating protections keep the kernel from merging neighbouring regions into one mapping.
+    _regions = [mmap.mmap(-1, page, prot=mmap.PROT_READ | (mmap.PROT_WRITE if i % 2 else 0))
+                for i in range(mappings)]
+    heap = [bytearray(b'\x01') * int(rss_mb * MB)]
+    grow_per_period = growth_mb_per_min * MB * period / 60
+    pending = 0.0
+    duty = min(max(cpu, 0.0), 1.0) * period
+    while True:
+        start = time.monotonic()
+        while time.monotonic() - start < duty:
+            pass
+        pending += grow_per_period
+        if pending >= page:
+            heap.append(bytearray(b'\x01') * int(pending))
+            pending -= int(pending)
+        time.sleep(max(0.0, period - (time.monotonic() - start)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic stand-in for a cardano-db-sync process.")
+    parser.add_argument("--tag", required=True,
+                        help="Marker in the command line the monitor's process tracker matches")
+    parser.add_argument("--rss-mb", type=float, default=512.0,
+                        help="Resident memory held from the start")
+    parser.add_argument("--growth-mb-per-min", type=float, default=0.0,
+                        help="Resident memory added per minute")
+    parser.add_argument("--cpu", type=float, default=0.5,
+                        help="Fraction of one core kept busy")
+    parser.add_argument("--mappings", type=int, default=2000,
+                        help="Extra memory mappings, to make smaps as long as a real db-sync's")
+    args = parser.parse_args()
+    run_standin(args.rss_mb, args.growth_mb_per_min, args.cpu, args.mappings)
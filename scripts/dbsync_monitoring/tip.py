@@ -0,0 +1,76 @@
+"""Single round-trip probe of the db-sync chain tip."""
+from dataclasses import dataclass
+
+from dbsync_monitoring.pg_session import PgSession
+
+GENESIS_SQL = """
+  SELECT EXTRACT(EPOCH FROM (time AT TIME ZONE 'UTC'))
+  FROM block
+  ORDER BY id
+  LIMIT 1;
+"""
+
+# Walks the primary key backwards instead of aggregating the whole block table.
+TIP_SQL = """
+  SELECT
+    slot_no,
+    block_no,
+    epoch_no,
+    (SELECT id FROM tx ORDER BY id DESC LIMIT 1) AS tx_id,
+    EXTRACT(EPOCH FROM (time AT TIME ZONE 'UTC')) AS tip_time,
+    100 * (EXTRACT(EPOCH FROM (time AT TIME ZONE 'UTC')) - %(genesis)s)
+        / NULLIF(EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC')) - %(genesis)s, 0) AS sync_percent
+  FROM block
+  WHERE block_no IS NOT NULL
+  ORDER BY id DESC
+  LIMIT 1;
+"""
+
+
+@dataclass(frozen=True)
+class Tip:
+    slot_no: int | None
+    block_no: int
+    epoch_no: int | None
+    tx_id: int | None
+    tip_time: float
+    sync_percent: float | None
+
+
+class TipProbe:
+    """Read slot, block and epoch number, newest tx id, tip time and sync percent in one query.
+
+    tx ids are assigned sequentially, so the newest one serves as a running
+    transaction count for throughput.
+
+    The genesis block time never changes, so it is read once and passed to
+    every later probe as a parameter.
+    """
+
+    def __init__(self, session: PgSession) -> None:
+        self.session = session
+        self.genesis_time: float | None = None
+
+    def _genesis(self) -> float | None:
+        if self.genesis_time is None:
+            row = self.session.fetchone(GENESIS_SQL)
+            if row and row[0] is not None:
+                self.genesis_time = float(row[0])
+        return self.genesis_time
+
+    def probe(self) -> Tip | None:
+        genesis = self._genesis()
+        if genesis is None:
+            return None
+        row = self.session.fetchone(TIP_SQL, {'genesis': genesis})
+        if not row:
+            return None
+        slot_no, block_no, epoch_no, tx_id, tip_time, sync_percent = row
+        return Tip(
+            slot_no=slot_no,
+            block_no=block_no,
+            epoch_no=epoch_no,
+            tx_id=tx_id,
+            tip_time=float(tip_time),
+            sync_percent=float(sync_percent) if sync_percent is not None else None,
+        )
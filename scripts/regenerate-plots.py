@@ -1,97 +1,235 @@
 #!/usr/bin/env python3
 import argparse
 import os
-import sqlite3
 from dataclasses import dataclass
 
 import pandas as pd
-import plotly.graph_objs as go
 from pandas import DataFrame
 from plotly.graph_objs import Figure
 from plotly.subplots import make_subplots
 
+from dbsync_monitoring.compare import (
+    DEFAULT_SLOT_RANGES,
+    EPOCH_SLOTS,
+    align,
+    deltas,
+    phase_seconds,
+    range_deltas,
+    slot_grid,
+    summarize,
+    write_reports,
+)
+from dbsync_monitoring.downsample import DEFAULT_MAX_POINTS, Method
+from dbsync_monitoring.plotting import annotate_events, line_trace
+from dbsync_monitoring.queries import (
+    load_cpu_time,
+    load_disks,
+    load_events,
+    load_io,
+    load_metrics,
+    load_peak_rss,
+    load_pg_stats,
+    load_phases,
+    load_rates,
+    load_roles,
+    load_sizes,
+    load_versions,
+    size_growth,
+    with_phases,
+)
+from dbsync_monitoring.rates import DEFAULT_HALFLIFE_S
+
 
 @dataclass
 class Args:
     sqlite_db: str
     output_folder: str
     dbname: str
+    max_points: int
+    downsample: Method
+    webgl: bool
+    rate_halflife: float
+    growth_epochs: int
+    slot_ranges: int
+    milestone_slots: list[int]
+    epoch_slots: int
 
-def load_versions(sqlite_file: str) -> list[str]:
-    """Return list of distinct versions in the SQLite DB."""
-    with sqlite3.connect(sqlite_file) as conn:
-        df = pd.read_sql_query(
-            "SELECT DISTINCT version FROM db_sync_version ORDER BY timestamp DESC",
-            conn
-        )
-    return [str(v) for v in df["version"].tolist()]
-
-
-def load_metrics(sqlite_file: str, versions: list[str]) -> tuple[DataFrame, DataFrame]:
-    """Load memory and CPU metrics for selected versions."""
-    placeholders = ",".join("?" for _ in versions)
-    qm = f"""
-      SELECT slot_no, rss, version
-      FROM memory_metrics
-      WHERE version IN ({placeholders})
-      ORDER BY slot_no
-    """
-    qc = f"""
-      SELECT slot_no, cpu_percent, version
-      FROM cpu_metrics
-      WHERE version IN ({placeholders})
-      ORDER BY slot_no
-    """
-    with sqlite3.connect(sqlite_file) as conn:
-        mem_df = pd.read_sql_query(qm, conn, params=versions)
-        cpu_df = pd.read_sql_query(qc, conn, params=versions)
-    return mem_df, cpu_df
+@dataclass
+class Panel:
+    title: str
+    y_title: str
+    df: DataFrame
+    column: str
+    label: str
 
+def plot_and_save(mem_df: DataFrame, cpu_df: DataFrame, versions: list[str], output_folder: str, dbname: str,
+                  max_points: int = DEFAULT_MAX_POINTS, method: Method = "lttb", webgl: bool = False,
+                  pg_df: DataFrame | None = None, rates_df: DataFrame | None = None,
+                  cost_df: DataFrame | None = None, stack_df: DataFrame | None = None,
+                  io_df: DataFrame | None = None, disk_df: DataFrame | None = None,
+                  size_df: DataFrame | None = None, delta_df: DataFrame | None = None,
+                  events_df: DataFrame | None = None, replay_mem_df: DataFrame | None = None,
+                  replay_cpu_df: DataFrame | None = None, replay_rates_df: DataFrame | None = None,
+                  replay_cost_df: DataFrame | None = None) -> None:
+    """Build a combined memory+CPU subplot and save as HTML.
+
+    Sync throughput and CPU-cost panels are added when ``rates_df`` and
+    ``cost_df`` have data, Postgres inserts/s and WAL MB/s panels when
+    ``pg_df`` does, and whole-stack CPU/PSS/disk panels when ``stack_df``
+    (the ``total`` role of db-sync, Postgres and cardano-node) does.
+    ``io_df`` adds db-sync's own disk MB/s and syscalls/s, ``disk_df`` MB/s,
+    IOPS and utilisation of every recorded device. ``size_df`` adds the
+    estimated database size. ``delta_df`` (``slot_no``, ``rss_delta``,
+    ``cpu_delta`` per version on a common slot grid) adds the difference of
+    every version to the first one. Events detected by the collector
+    (``events_df``) are marked at their slot in every panel. Samples taken
+    while db-sync replayed slots it had already synced are plotted in their
+    own panels from ``replay_mem_df``, ``replay_cpu_df``, ``replay_rates_df``
+    and ``replay_cost_df``.
+    Every trace is downsampled to at most ``max_points`` points.
+    """
+    panels = [
+        Panel("Memory (RSS) by Slot", "RSS (MB)", mem_df, "rss", "Mem"),
+        Panel("CPU % by Slot", "CPU (%)", cpu_df, "cpu_percent", "CPU"),
+    ]
+    if replay_mem_df is not None and not replay_mem_df.empty:
+        panels.append(Panel("Memory (RSS) during Replay by Slot", "RSS (MB)", replay_mem_df, "rss", "Replay Mem"))
+    if replay_cpu_df is not None and not replay_cpu_df.empty:
+        panels.append(Panel("CPU % during Replay by Slot", "CPU (%)", replay_cpu_df, "cpu_percent", "Replay CPU"))
+    if rates_df is not None and not rates_df.empty:
+        panels += [
+            Panel("Sync Throughput by Slot", "Slots/s", rates_df, "slots_per_s", "Slots/s"),
+            Panel("Transactions/s by Slot", "Tx/s", rates_df, "tx_per_s", "Tx/s"),
+        ]
+    if cost_df is not None and not cost_df.empty:
+        panels.append(Panel("CPU Cost by Slot", "CPU-s per 1000 slots", cost_df, "cpu_s_per_1k_slots", "CPU-s/1k"))
+    if replay_rates_df is not None and not replay_rates_df.empty:
+        panels.append(Panel("Replay Throughput by Slot", "Slots/s", replay_rates_df, "slots_per_s", "Replay Slots/s"))
+    if replay_cost_df is not None and not replay_cost_df.empty:
+        panels.append(Panel("CPU Cost during Replay by Slot", "CPU-s per 1000 slots", replay_cost_df,
+                            "cpu_s_per_1k_slots", "Replay CPU-s/1k"))
+    if stack_df is not None and not stack_df.empty:
+        panels += [
+            Panel("Whole-Stack CPU % by Slot", "CPU (%)", stack_df, "cpu_percent", "Stack CPU"),
+            Panel("Whole-Stack PSS by Slot", "PSS (MB)", stack_df, "pss", "Stack PSS"),
+            Panel("Whole-Stack Disk I/O by Slot", "MB/s", stack_df, "io_mb_per_s", "Stack I/O"),
+        ]
+    if io_df is not None and not io_df.empty:
+        io_df = io_df.assign(mb_per_s=io_df["read_mb_per_s"] + io_df["write_mb_per_s"],
+                             ops_per_s=io_df["read_ops_per_s"] + io_df["write_ops_per_s"])
+        panels += [
+            Panel("db-sync Disk Read+Write by Slot", "MB/s", io_df, "mb_per_s", "db-sync MB/s"),
+            Panel("db-sync Read+Write Syscalls by Slot", "Syscalls/s", io_df, "ops_per_s", "db-sync syscalls/s"),
+        ]
+    if disk_df is not None and not disk_df.empty:
+        for label, d in disk_df.groupby("label", sort=True):
+            panels += [
+                Panel(f"Device {label}: Throughput by Slot", "MB/s", d, "mb_per_s", f"{label} MB/s"),
+                Panel(f"Device {label}: IOPS by Slot", "IOPS", d, "iops", f"{label} IOPS"),
+                Panel(f"Device {label}: Utilisation by Slot", "Busy (%)", d, "util_percent", f"{label} busy %"),
+            ]
+    if size_df is not None and not size_df.empty:
+        panels.append(Panel("Database Size by Slot", "Size (GB)", size_df, "gb", "DB size"))
+    if delta_df is not None and not delta_df.empty:
+        panels += [
+            Panel(f"RSS Difference to {versions[0]} by Slot", "RSS (MB)", delta_df, "rss_delta", "RSS diff"),
+            Panel(f"CPU % Difference to {versions[0]} by Slot", "CPU (%)", delta_df, "cpu_delta", "CPU diff"),
+        ]
+    if pg_df is not None and not pg_df.empty:
+        panels += [
+            Panel("Postgres Inserts/s by Slot", "Rows/s", pg_df, "inserts_per_s", "Inserts/s"),
+            Panel("Postgres WAL MB/s by Slot", "WAL (MB/s)", pg_df, "wal_mb_per_s", "WAL MB/s"),
+        ]
 
-def plot_and_save(mem_df: DataFrame, cpu_df: DataFrame, versions: list[str], output_folder: str, dbname: str) -> None:
-    """Build a combined memory+CPU subplot and save as HTML."""
     fig: Figure = make_subplots(
-        rows=2, cols=1,
+        rows=len(panels), cols=1,
         shared_xaxes=True,
-        vertical_spacing=0.1,
-        subplot_titles=["Memory (RSS) by Slot", "CPU % by Slot"],
-        row_heights=[0.5, 0.5]
+        vertical_spacing=0.1 if len(panels) <= 2 else 0.05,
+        subplot_titles=[p.title for p in panels],
+        row_heights=[1 / len(panels)] * len(panels)
     )
 
-    # Memory traces
-    for v in versions:
-        d = mem_df[mem_df["version"] == v]
-        fig.add_trace(
-            go.Scatter(x=d["slot_no"], y=d["rss"],
-                       mode="lines", name=f"Mem - {v}"),
-            row=1, col=1
-        )
-
-    # CPU traces
-    for v in versions:
-        d = cpu_df[cpu_df["version"] == v]
-        fig.add_trace(
-            go.Scatter(x=d["slot_no"], y=d["cpu_percent"],
-                       mode="lines", name=f"CPU - {v}"),
-            row=2, col=1
-        )
+    for row, panel in enumerate(panels, start=1):
+        by_version = dict(tuple(panel.df.groupby("version", sort=False)))
+        for v in versions:
+            d = by_version.get(v)
+            if d is None:
+                continue
+            fig.add_trace(
+                line_trace(d["slot_no"], d[panel.column], f"{panel.label} - {v}", max_points, method, webgl),
+                row=row, col=1
+            )
+        fig.update_xaxes(title_text="Slot Number", row=row, col=1)
+        fig.update_yaxes(title_text=panel.y_title, row=row, col=1)
+    if events_df is not None and not events_df.empty:
+        annotate_events(fig, events_df)
 
     fig.update_layout(
         title_text=f"dbsync_{dbname} - Memory & CPU Comparison",
-        xaxis_title="Slot Number",
-        yaxis_title="RSS (MB)",
-        xaxis2_title="Slot Number",
-        yaxis2_title="CPU (%)",
+        height=max(450, 300 * len(panels)),
         legend_title="Version"
     )
 
     os.makedirs(output_folder, exist_ok=True)
-    safe = "_".join(v.replace(" ", "").replace("/", "-") for v in versions)
-    out_path = os.path.join(output_folder, f"comparison_{dbname}_{safe}.html")
+    out_path = f"{output_stem(output_folder, dbname, versions)}.html"
     fig.write_html(out_path)
     print(f"Saved comparison HTML to {out_path}")
 
 
+def output_stem(output_folder: str, dbname: str, versions: list[str]) -> str:
+    """Path without extension shared by the HTML and the summary files of one comparison."""
+    safe = "_".join(v.replace(" ", "").replace("/", "-") for v in versions)
+    return os.path.join(output_folder, f"comparison_{dbname}_{safe}")
+
+
+def compare_versions(mem_df: DataFrame, cpu_df: DataFrame, cpu_time_df: DataFrame, peaks: dict[str, float],
+                     replay_peaks: dict[str, float], phases_df: DataFrame, versions: list[str], stem: str, slot_ranges: int, milestones: list[int],
+                     epoch_slots: int) -> DataFrame:
+    """Write summary and per-slot-range tables next to the HTML and return per-slot deltas for plotting."""
+    sampled = [v for v in versions if v in set(mem_df["version"])]
+    baseline = sampled[0] if sampled else versions[0]
+    for v in versions:
+        if v not in sampled:
+            print(f"No samples of {v}, left out of the comparison")
+    if baseline != versions[0]:
+        print(f"Using {baseline} as the baseline")
+    grid = slot_grid(pd.concat([mem_df[["slot_no", "version"]], cpu_df[["slot_no", "version"]]]))
+    aligned = {"rss": align(mem_df, "rss", grid), "cpu_percent": align(cpu_df, "cpu_percent", grid)}
+    summary = (summarize(mem_df, cpu_df, cpu_time_df, peaks, milestones, epoch_slots, replay_peaks)
+               .sort_values("version", key=lambda s: s.map(versions.index), ignore_index=True))
+    ends = mem_df.groupby("version")["ts_ms"].max().to_dict()
+    summary = summary.merge(phase_seconds(phases_df, ends), on="version", how="left")
+    ranges = range_deltas(aligned, baseline, slot_ranges) if len(grid) > 1 else range_deltas({}, baseline)
+    for path in write_reports(stem, baseline, summary, ranges):
+        print(f"Saved {path}")
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(summary.to_string(index=False, float_format=lambda x: f"{x:.1f}"))
+    if len(sampled) < 2 or len(grid) < 2:
+        return pd.DataFrame(columns=["slot_no", "version", "rss_delta", "cpu_delta"])
+    rss = deltas(aligned["rss"], baseline).rename(columns={"delta": "rss_delta"})
+    cpu = deltas(aligned["cpu_percent"], baseline).rename(columns={"delta": "cpu_delta"})
+    return rss.assign(cpu_delta=cpu["cpu_delta"])
+
+
+def print_growth_report(growth: DataFrame, epochs: int, top: int = 15) -> None:
+    """Mean growth per epoch and per 1000 tx of the fastest growing tables over the last ``epochs`` epochs."""
+    for version, g in growth.groupby("version", sort=False):
+        recent = g[g["epoch_no"] > g["epoch_no"].max() - epochs].dropna(subset=["bytes_per_epoch"])
+        if recent.empty:
+            continue
+        per_table = recent.groupby("table_name").agg(
+            size=("bytes", "last"), per_epoch=("bytes_per_epoch", "mean"), per_1k_tx=("bytes_per_1k_tx", "mean")
+        ).sort_values("per_epoch", ascending=False)
+        total = per_table["per_epoch"].sum()
+        print(f"Growth of {version} over epochs {int(recent['epoch_no'].min())}-{int(recent['epoch_no'].max())}: "
+              f"{total / 1024**3:.2f} GB per epoch")
+        print(f"  {'table':30s} {'size GB':>10s} {'MB/epoch':>10s} {'share':>7s} {'KB/1k tx':>10s}")
+        for table, r in per_table.head(top).iterrows():
+            share = 100 * r["per_epoch"] / total if total > 0 else 0.0
+            print(f"  {table:30s} {r['size'] / 1024**3:10.2f} {r['per_epoch'] / 1024**2:10.1f} {share:6.1f}% "
+                  f"{r['per_1k_tx'] / 1024:10.1f}")
+
+
 def parse_args() -> Args:
     parser = argparse.ArgumentParser(
         description="Regenerate comparison graphs from an existing dbsync SQLite file."
@@ -102,11 +240,35 @@ def parse_args() -> Args:
                         help="Directory to write HTML graphs into")
     parser.add_argument("--dbname", required=True,
                         help="The original Postgres DB name (for filename prefix)")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help="Max points per trace after downsampling (0 keeps every sample)")
+    parser.add_argument("--downsample", choices=["lttb", "minmax"], default="lttb",
+                        help="Downsampling method: LTTB or per-bucket min/max envelope")
+    parser.add_argument("--webgl", action="store_true",
+                        help="Render traces with WebGL (Scattergl)")
+    parser.add_argument("--rate-halflife", type=float, default=DEFAULT_HALFLIFE_S,
+                        help="Half-life in seconds of the EWMA smoothing sync rates")
+    parser.add_argument("--growth-epochs", type=int, default=5,
+                        help="Epochs averaged in the table growth report")
+    parser.add_argument("--slot-ranges", type=int, default=DEFAULT_SLOT_RANGES,
+                        help="Equal slot ranges over which versions are compared in the summary tables")
+    parser.add_argument("--milestone-slots", default="",
+                        help="Comma-separated slots; the summary reports how long each version took to reach them")
+    parser.add_argument("--epoch-slots", type=int, default=EPOCH_SLOTS,
+                        help="Slots per epoch used for CPU seconds per epoch")
     parsed = parser.parse_args()
     return Args(
         sqlite_db=parsed.sqlite_db,
         output_folder=parsed.output_folder,
-        dbname=parsed.dbname
+        dbname=parsed.dbname,
+        max_points=parsed.max_points,
+        downsample=parsed.downsample,
+        webgl=parsed.webgl,
+        rate_halflife=parsed.rate_halflife,
+        growth_epochs=parsed.growth_epochs,
+        slot_ranges=parsed.slot_ranges,
+        milestone_slots=[int(x) for x in parsed.milestone_slots.split(",") if x.strip()],
+        epoch_slots=parsed.epoch_slots
     )
 
 
@@ -129,8 +291,31 @@ def main() -> None:
         print("Invalid selection. Exiting.")
         return
 
-    mem_df, cpu_df = load_metrics(args.sqlite_db, chosen)
-    plot_and_save(mem_df, cpu_df, chosen, args.output_folder, args.dbname)
+    mem_df, cpu_df = load_metrics(args.sqlite_db, chosen, args.max_points)
+    phases_df = load_phases(args.sqlite_db, chosen)
+    mem_df, cpu_df = with_phases(mem_df, phases_df), with_phases(cpu_df, phases_df)
+    replay_mem_df, replay_cpu_df = mem_df[mem_df["phase"] == "replay"], cpu_df[cpu_df["phase"] == "replay"]
+    mem_df, cpu_df = mem_df[mem_df["phase"] != "replay"], cpu_df[cpu_df["phase"] != "replay"]
+    pg_df = load_pg_stats(args.sqlite_db, chosen)
+    rates_df, cost_df = load_rates(args.sqlite_db, chosen, args.max_points, args.rate_halflife)
+    replay_rates_df, replay_cost_df = rates_df[rates_df["phase"] == "replay"], cost_df[cost_df["phase"] == "replay"]
+    rates_df, cost_df = rates_df[rates_df["phase"] != "replay"], cost_df[cost_df["phase"] != "replay"]
+    stack_df = load_roles(args.sqlite_db, chosen)
+    io_df = load_io(args.sqlite_db, chosen)
+    disk_df = load_disks(args.sqlite_db, chosen)
+    sizes_df = load_sizes(args.sqlite_db, chosen)
+    size_df = (sizes_df.groupby(["version", "ts_ms", "slot_no"], as_index=False)["bytes"].sum()
+               .assign(gb=lambda d: d["bytes"] / 1024**3))
+    print_growth_report(size_growth(sizes_df), args.growth_epochs)
+    delta_df = compare_versions(mem_df, cpu_df, load_cpu_time(args.sqlite_db, chosen, args.max_points),
+                                load_peak_rss(args.sqlite_db, chosen),
+                                load_peak_rss(args.sqlite_db, chosen, replay=True), phases_df, chosen,
+                                output_stem(args.output_folder, args.dbname, chosen),
+                                args.slot_ranges, args.milestone_slots, args.epoch_slots)
+    plot_and_save(mem_df, cpu_df, chosen, args.output_folder, args.dbname,
+                  args.max_points, args.downsample, args.webgl, pg_df, rates_df, cost_df, stack_df,
+                  io_df, disk_df, size_df, delta_df, load_events(args.sqlite_db, chosen),
+                  replay_mem_df, replay_cpu_df, replay_rates_df, replay_cost_df)
 
 
 if __name__ == "__main__":
@@ -3,87 +3,183 @@ import sqlite3
 import time
 from datetime import datetime
 from threading import Thread
+from typing import Any
 
 import matplotlib.dates as mdates
 import matplotlib.pyplot as plt
-import pandas as pd
+import numpy as np
 import psutil
 from psutil import Process
 
+from dbsync_monitoring.metrics_writer import MetricsWriter
+from dbsync_monitoring.proc_sampler import Sampler, make_sampler
+from dbsync_monitoring.process_tracker import ProcessTracker
+from dbsync_monitoring.ring_buffer import FloatArray, RingBuffer
+from dbsync_monitoring.schema import SIMPLE_MONITOR_MIGRATIONS, migrate
+
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+SAMPLE_INTERVAL = 10
+PLOT_HOURS = 24
+RECENT_COLUMNS = ('ts_ms', 'rss', 'uss', 'cpu_percent', 'iowait')
+PLOT_FILE = 'cardano_db_sync_metrics_from_simple_monitoring.png'
+MS_PER_DAY = 86_400_000
+
+
+class PlotWindow:
+    """Columns of plotted samples: appended at the end, trimmed by moving the start.
+
+    Storage doubles when full, so appends cost O(new rows) amortised and
+    views handed to line artists are never written to afterwards.
+    """
+
+    def __init__(self, n_columns: int, capacity: int = 1024) -> None:
+        self._data: FloatArray = np.empty((n_columns, capacity))
+        self._start = 0
+        self._end = 0
+
+    def append(self, block: FloatArray) -> None:
+        n = block.shape[1]
+        if self._end + n > self._data.shape[1]:
+            live = self._data[:, self._start:self._end]
+            grown = np.empty((self._data.shape[0], max(self._data.shape[1], 2 * (live.shape[1] + n))))
+            grown[:, :live.shape[1]] = live
+            self._data, self._start, self._end = grown, 0, live.shape[1]
+        self._data[:, self._end:self._end + n] = block
+        self._end += n
+
+    def trim(self, row: int, before: float) -> None:
+        """Drop leading samples whose ``row`` value is below ``before``."""
+        self._start += int(np.searchsorted(self._data[row, self._start:self._end], before))
+
+    def view(self) -> FloatArray:
+        window: FloatArray = self._data[:, self._start:self._end]
+        return window
+
+
+class LivePlot:
+    """Matplotlib figure of the last ``hours`` of samples, updated in place.
+
+    Each refresh copies only samples newer than the last one plotted out of
+    the in-memory buffer and points the existing line artists at the window.
+    """
+
+    def __init__(self, hours: int) -> None:
+        self.hours = hours
+        self.window = PlotWindow(len(RECENT_COLUMNS))
+        self.last_ts_ms = -np.inf
+        self.fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 12))
+
+        # Memory plot
+        self.lines = {
+            'rss': ax1.plot([], [], label='RSS', color='blue')[0],
+            'uss': ax1.plot([], [], label='USS', color='green')[0],
+        }
+        ax1.set_ylabel('Memory (MB)')
+        ax1.set_title(f'cardano-db-sync Resource Usage (Last {hours} hours)')
+        ax1.legend()
+        ax1.grid(True)
+
+        # CPU percentage plot
+        self.lines['cpu_percent'] = ax2.plot([], [], label='CPU %', color='red')[0]
+        self.lines['iowait'] = ax2.plot([], [], label='I/O Wait', color='orange')[0]
+        ax2.set_ylabel('CPU Usage (%)')
+        ax2.legend()
+        ax2.grid(True)
+
+        # Format x-axes
+        self.axes = (ax1, ax2)
+        for ax in self.axes:
+            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M', tz=LOCAL_TZ))
+            ax.xaxis.set_major_locator(mdates.HourLocator(interval=max(1, hours // 6)))
+        self.fig.tight_layout()
+
+    def update(self, recent: RingBuffer) -> bool:
+        """Append new samples and trim old ones; ``False`` if there is too little to draw."""
+        ts = recent.positions['ts_ms']
+        new = recent.after('ts_ms', self.last_ts_ms)
+        if new.shape[1]:
+            self.last_ts_ms = float(new[ts, -1])
+            block = new.copy()
+            block[ts] /= MS_PER_DAY  # matplotlib date numbers: days since 1970
+            self.window.append(block)
+
+        now = time.time() * 1000 / MS_PER_DAY
+        self.window.trim(ts, now - self.hours / 24)
+        data = self.window.view()
+        if data.shape[1] < 2:
+            return False
+
+        for name, line in self.lines.items():
+            line.set_data(data[ts], data[recent.positions[name]])
+        for ax in self.axes:
+            ax.set_xlim(now - self.hours / 24, now)
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+        self.fig.canvas.draw_idle()
+        return True
+
 
 class CardanoMonitor:
     def __init__(self) -> None:
         self.running: bool = True
         self.db_file: str = 'simple_monitoring_sqlite.db'
+        self.process_tracker: ProcessTracker = ProcessTracker()
+        self._sampler: Sampler | None = None
+        self._sampler_proc: Process | None = None
+        self.recent: RingBuffer = RingBuffer(RECENT_COLUMNS, PLOT_HOURS * 3600 // SAMPLE_INTERVAL)
+        self.live_plot: LivePlot | None = None
         self.init_db()
+        self.load_recent()
+        self.writer: MetricsWriter = MetricsWriter(self.db_file)
 
     def init_db(self) -> None:
+        migrate(self.db_file, SIMPLE_MONITOR_MIGRATIONS)
+
+    def load_recent(self) -> None:
+        """Seed the in-memory buffer with the plotted window from earlier runs; the only SQLite read."""
+        since_ms = int((time.time() - PLOT_HOURS * 3600) * 1000)
         with sqlite3.connect(self.db_file) as conn:
-            c = conn.cursor()
-            # Create tables if they don't exist
-            c.execute('''CREATE TABLE IF NOT EXISTS memory_metrics
-                         (timestamp TEXT, rss REAL, vms REAL, uss REAL, 
-                          pss REAL, swap REAL, shared REAL, process TEXT)''')
-            c.execute('''CREATE TABLE IF NOT EXISTS cpu_metrics
-                         (timestamp TEXT, cpu_percent REAL, user_time REAL,
-                          system_time REAL, children_user REAL, children_system REAL,
-                          iowait REAL, ctx_switches INTEGER, interrupts INTEGER,
-                          process TEXT)''')
-            conn.commit()
+            rows = conn.execute(
+                """SELECT m.ts_ms, m.rss, m.uss, c.cpu_percent, c.iowait
+                   FROM memory_metrics m LEFT JOIN cpu_metrics c ON c.ts_ms = m.ts_ms
+                   WHERE m.ts_ms >= ?
+                   ORDER BY m.ts_ms""",
+                (since_ms,)
+            ).fetchall()
+        if rows:
+            history = np.array(rows, dtype=np.float64)
+            self.recent.extend(dict(zip(RECENT_COLUMNS, history.T, strict=True)))
 
     def get_process(self) -> Process | None:
-        for proc in psutil.process_iter(['name', 'cmdline']):
-            if 'cardano-db-sync' in ' '.join(proc.info.get('cmdline') or []):
-                return proc
-        return None
-
-    def get_memory_details(self, process: Process) -> dict[str, float | None] | None:
-        try:
-            mem_info = process.memory_info()
-            mem_full = process.memory_full_info()
-            return {
-                'rss': mem_info.rss / 1024 / 1024,  # MB
-                'vms': mem_info.vms / 1024 / 1024,
-                'uss': mem_full.uss / 1024 / 1024 if hasattr(mem_full, 'uss') else None,
-                'pss': mem_full.pss / 1024 / 1024 if hasattr(mem_full, 'pss') else None,
-                'swap': mem_full.swap / 1024 / 1024 if hasattr(mem_full, 'swap') else None,
-                'shared': mem_info.shared / 1024 / 1024
-            }
-        except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError):
-            return None
-
-    def get_cpu_details(self, process: Process) -> dict[str, float | None] | None:
-        try:
-            cpu_times = process.cpu_times()
-            cpu_percent = process.cpu_percent(interval=None)  # Use pre-primed counter
-            cpu_count = psutil.cpu_count() or 1  # Avoid division by zero
-
-            with process.oneshot():
-                num_ctx_switches = process.num_ctx_switches()
-
-            return {
-                'cpu_percent': cpu_percent,
-                'cpu_percent_normalized': cpu_percent / cpu_count,
-                'user_time': cpu_times.user,
-                'system_time': cpu_times.system,
-                'children_user': getattr(cpu_times, 'children_user', 0.0),
-                'children_system': getattr(cpu_times, 'children_system', 0.0),
-                'iowait': getattr(cpu_times, 'iowait', None),
-                'ctx_switches': num_ctx_switches.voluntary + num_ctx_switches.involuntary,
-                'interrupts': None  # or remove this field entirely
-            }
-
-        except (psutil.NoSuchProcess, psutil.AccessDenied, AttributeError) as e:
-            print(f"Error collecting CPU data: {e}")
+        return self.process_tracker.get()
+
+    def get_sampler(self, process: Process) -> Sampler:
+        if self._sampler is None or self._sampler_proc is not process:
+            if self._sampler is not None:
+                self._sampler.close()
+            self._sampler = make_sampler(process)
+            self._sampler_proc = process
+        return self._sampler
+
+    def get_memory_details(self, process: Process) -> dict[str, float] | None:
+        return self.get_sampler(process).memory()
+
+    def get_cpu_details(self, process: Process) -> dict[str, Any] | None:
+        cpu = self.get_sampler(process).cpu()
+        if cpu is None:
+            print(f"Error collecting CPU data for PID {process.pid}")
             return None
+        cpu_count = psutil.cpu_count() or 1  # Avoid division by zero
+        cpu['cpu_percent_normalized'] = cpu['cpu_percent'] / cpu_count
+        return cpu
 
     def log_metrics(self) -> None:
-        proc = self.get_process()
-        if proc:
-            proc.cpu_percent(interval=None)  # Prime it once before the loop
+        self.get_process()  # First lookup primes cpu_percent
 
         while self.running:
-            timestamp = datetime.now().isoformat()
+            now = datetime.now()
+            timestamp = now.isoformat()
+            ts_ms = int(now.timestamp() * 1000)
             proc = self.get_process()
 
             if proc:
@@ -94,90 +190,38 @@ class CardanoMonitor:
                 cpu_data = self.get_cpu_details(proc)
 
                 if mem_data:
-                    with sqlite3.connect(self.db_file) as conn:
-                        c = conn.cursor()
-                        c.execute('''INSERT INTO memory_metrics 
-                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                                  (timestamp, mem_data['rss'], mem_data['vms'],
-                                   mem_data.get('uss'), mem_data.get('pss'),
-                                   mem_data.get('swap'), mem_data['shared'],
-                                   'cardano-db-sync'))
-                        conn.commit()
+                    self.writer.write('memory_metrics', {
+                        'ts_ms': ts_ms, 'rss': mem_data['rss'], 'vms': mem_data['vms'],
+                        'uss': mem_data.get('uss'), 'pss': mem_data.get('pss'),
+                        'swap': mem_data.get('swap'), 'shared': mem_data['shared'],
+                        'process': 'cardano-db-sync'
+                    })
 
                 if cpu_data:
-                    with sqlite3.connect(self.db_file) as conn:
-                        c = conn.cursor()
-                        c.execute('''INSERT INTO cpu_metrics 
-                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                                  (timestamp, cpu_data['cpu_percent'],
-                                   cpu_data['user_time'], cpu_data['system_time'],
-                                   cpu_data['children_user'], cpu_data['children_system'],
-                                   cpu_data['iowait'], cpu_data['ctx_switches'],
-                                   cpu_data['interrupts'], 'cardano-db-sync'))
-                        conn.commit()
+                    self.writer.write('cpu_metrics', {
+                        'ts_ms': ts_ms, 'cpu_percent': cpu_data['cpu_percent'],
+                        'user_time': cpu_data['user_time'], 'system_time': cpu_data['system_time'],
+                        'children_user': cpu_data['children_user'], 'children_system': cpu_data['children_system'],
+                        'iowait': cpu_data['iowait'], 'ctx_switches': cpu_data['ctx_switches'],
+                        'interrupts': cpu_data['interrupts'], 'process': 'cardano-db-sync'
+                    })
+
+                self.recent.append({'ts_ms': ts_ms, **(mem_data or {}), **(cpu_data or {})})
 
                 print(f"{timestamp} - CPU: {cpu_data['cpu_percent'] if cpu_data else 'N/A'}% | "
                       f"RSS: {mem_data['rss'] if mem_data else 'N/A'}MB")
-            time.sleep(10)
+            time.sleep(SAMPLE_INTERVAL)
 
-    def plot_metrics(self, hours: int = 24) -> None:
-        with sqlite3.connect(self.db_file) as conn:
-            # Memory data
-            mem_df = pd.read_sql_query(
-                f"""SELECT timestamp, rss, vms, uss, pss, swap, shared 
-                    FROM memory_metrics 
-                    WHERE datetime(timestamp) >= datetime('now', '-{hours} hours')""",
-                conn
-            )
-
-            # CPU data
-            cpu_df = pd.read_sql_query(
-                f"""SELECT timestamp, cpu_percent, user_time, system_time, iowait,
-                           ctx_switches, interrupts
-                    FROM cpu_metrics 
-                    WHERE datetime(timestamp) >= datetime('now', '-{hours} hours')""",
-                conn
-            )
-
-        if mem_df.empty or cpu_df.empty:
+    def plot_metrics(self) -> None:
+        if self.live_plot is None:
+            self.live_plot = LivePlot(PLOT_HOURS)
+        if not self.live_plot.update(self.recent):
             print("Not enough data to visualize")
             return
-
-        # Convert timestamps
-        for df in [mem_df, cpu_df]:
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
-            df.set_index('timestamp', inplace=True)
-
-        # Create figure with subplots
-        fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(14, 12))
-
-        # Memory plot
-        ax1.plot(mem_df.index, mem_df['rss'], label='RSS', color='blue')
-        if 'uss' in mem_df and not mem_df['uss'].isnull().all():
-            ax1.plot(mem_df.index, mem_df['uss'], label='USS', color='green')
-        ax1.set_ylabel('Memory (MB)')
-        ax1.set_title(f'cardano-db-sync Resource Usage (Last {hours} hours)')
-        ax1.legend()
-        ax1.grid(True)
-
-        # CPU percentage plot
-        ax2.plot(cpu_df.index, cpu_df['cpu_percent'], label='CPU %', color='red')
-        if 'iowait' in cpu_df and not cpu_df['iowait'].isnull().all():
-            ax2.plot(cpu_df.index, cpu_df['iowait'], label='I/O Wait', color='orange')
-        ax2.set_ylabel('CPU Usage (%)')
-        ax2.legend()
-        ax2.grid(True)
-
-        # Format x-axes
-        for ax in [ax1, ax2]:
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-            ax.xaxis.set_major_locator(mdates.HourLocator(interval=max(1, hours // 6)))
-
-        plt.tight_layout()
-        plt.savefig('cardano_db_sync_metrics_from_simple_monitoring.png')
-        plt.show()
+        self.live_plot.fig.savefig(PLOT_FILE)
 
     def run(self) -> None:
+        self.writer.start()
         monitor_thread = Thread(target=self.log_metrics)
         monitor_thread.daemon = True
         monitor_thread.start()
@@ -185,9 +229,10 @@ class CardanoMonitor:
         try:
             while True:
                 self.plot_metrics()
-                time.sleep(60)  # Update plot every minute
+                plt.pause(60)  # Update plot every minute
         except KeyboardInterrupt:
             self.running = False
+            self.writer.close()
             print("Monitoring stopped")
 
 